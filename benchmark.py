@@ -0,0 +1,796 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import ctypes
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from libbash import ctypes_bash_command as c_bash
+from libbash.api import (
+    ast_to_bash_string,
+    ast_to_json,
+    ast_to_json_stream,
+    json_to_ast,
+    bash_to_ast,
+    bash_to_ast_from_bytes,
+    iter_bash_to_ast,
+    parse_session,
+)
+from libbash.bash_command import (
+    Command,
+    CommandType,
+    CommandView,
+    ConnectionType,
+    WordDesc,
+    WordDescView,
+    word_table,
+)
+from libbash.serialize import _LIST, _NODE, _SCHEMA, ast_to_bytes, bytes_to_ast
+from libbash.spans import SpanIndex
+from test import get_test_files
+
+
+def get_rss() -> int:
+    """
+    Gets the resident set size of this process
+    :return: the resident set size in bytes
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # not linux, fall back to the peak resident set size which is
+        # in kilobytes on linux but in bytes on macos
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def count_nodes(ast: list[Command]) -> int:
+    """
+    Counts the nodes of an AST
+    :param ast: The AST, a list of Command objects
+    :return: the number of nodes, words and value unions included
+    """
+    count = 0
+    stack: list = list(ast)
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        count += 1
+        for name, kind, _ in _SCHEMA[type(node)]:
+            if kind == _NODE:
+                stack.append(getattr(node, name))
+            elif kind == _LIST:
+                stack.extend(getattr(node, name))
+    return count
+
+
+def benchmark_ast_memory():
+    """
+    This benchmark measures how much memory the python ASTs of the test files
+    in the bash-5.2/tests directory take up per node.
+    """
+
+    test_files = get_test_files()
+
+    tracemalloc.start()
+    asts = []
+    for test_file in test_files:
+        try:
+            asts.append(bash_to_ast(test_file))
+        except RuntimeError:
+            pass
+    ast_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes = sum(count_nodes(ast) for ast in asts)
+    print(
+        f"{len(asts)} ASTs, {nodes} nodes, {ast_bytes / (1 << 20):.1f} MiB, "
+        f"{ast_bytes / nodes:.1f} bytes per node"
+    )
+
+
+def benchmark_memory_regression(
+    parses: int = 10000,
+    warmup_parses: int = 1000,
+    samples: int = 20,
+    max_growth_per_parse: int = 256,
+):
+    """
+    This benchmark parses the test files in the bash-5.2/tests directory over and
+    over, thousands of times, and makes sure the memory used by the process stays
+    flat once warmed up, which it wouldn't if the command trees allocated by bash
+    were leaked. The growth is measured per parse, as the slope of the resident
+    set size over the parses, so even a leak of a few KB per parse shows.
+    :param parses: how many scripts to parse after warming up
+    :param warmup_parses: how many scripts to parse before measuring
+    :param samples: how many times to measure the resident set size
+    :param max_growth_per_parse: how many bytes the resident set size may grow
+    by per parse, which leaves room for the allocator
+    """
+
+    test_files = []
+    for test_file in get_test_files():
+        try:
+            bash_to_ast(test_file)
+            test_files.append(test_file)
+        except RuntimeError:
+            pass
+    next_file = itertools.cycle(test_files).__next__
+
+    for _ in range(warmup_parses):
+        bash_to_ast(next_file())
+
+    counts = []
+    rss = []
+    per_sample = max(parses // samples, 1)
+    for i in range(samples):
+        for _ in range(per_sample):
+            bash_to_ast(next_file())
+        counts.append((i + 1) * per_sample)
+        rss.append(get_rss())
+        print(f"{counts[-1]}/{parses} parses: rss {rss[-1] / (1 << 20):.1f} MiB")
+
+    # the least squares slope of the resident set size over the parses
+    mean_count = sum(counts) / len(counts)
+    mean_rss = sum(rss) / len(rss)
+    growth = sum(
+        (count - mean_count) * (size - mean_rss) for count, size in zip(counts, rss)
+    ) / max(sum((count - mean_count) ** 2 for count in counts), 1)
+    print(
+        f"Parsed {counts[-1]} scripts, rss grew by "
+        f"{(rss[-1] - rss[0]) / (1 << 20):.1f} MiB, {growth:.1f} bytes per parse"
+    )
+    # a leak grows with every parse
+    assert growth < max_growth_per_parse
+
+
+def benchmark_subtree_dedup():
+    """
+    This benchmark collects every command, at every depth, of the ASTs of the
+    test files in the bash-5.2/tests directory into a set, and then compares
+    each AST with a second parse of the same file, once with the fingerprints
+    cached and once without.
+    """
+
+    test_files = get_test_files()
+    asts = []
+    for test_file in test_files:
+        try:
+            asts.append((bash_to_ast(test_file), bash_to_ast(test_file)))
+        except RuntimeError:
+            pass
+
+    def iter_commands(ast):
+        stack: list = list(ast)
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if isinstance(node, Command):
+                yield node
+            for name, kind, _ in _SCHEMA[type(node)]:
+                if kind == _NODE:
+                    stack.append(getattr(node, name))
+                elif kind == _LIST:
+                    stack.extend(getattr(node, name))
+
+    start = time.perf_counter()
+    for ast, ast2 in asts:
+        assert ast == ast2
+    uncached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    commands = [command for ast, _ in asts for command in iter_commands(ast)]
+    unique = set(commands)
+    hashed = time.perf_counter() - start
+    for _, ast2 in asts:
+        for command in ast2:
+            hash(command)
+
+    start = time.perf_counter()
+    for ast, ast2 in asts:
+        assert ast == ast2
+    cached = time.perf_counter() - start
+
+    print(
+        f"{len(commands)} commands, {len(unique)} unique, hashed in {hashed:.3f}s, "
+        f"equality {uncached:.3f}s without fingerprints, {cached:.3f}s with"
+    )
+
+
+def benchmark_word_interning():
+    """
+    This benchmark parses the test files in the bash-5.2/tests directory with the
+    words interned in the word table and without, and compares how much memory
+    the ASTs take up each way, the table included.
+    """
+
+    test_files = get_test_files()
+    max_words = word_table.max_words
+
+    def parse_test_files() -> tuple[list, int]:
+        word_table.clear()
+        tracemalloc.start()
+        asts = []
+        for test_file in test_files:
+            try:
+                asts.append(bash_to_ast(test_file))
+            except RuntimeError:
+                pass
+        ast_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return asts, ast_bytes
+
+    try:
+        # a table without room hands every word back as it is
+        word_table.max_words = 0
+        asts, plain_bytes = parse_test_files()
+        del asts
+    finally:
+        word_table.max_words = max_words
+    asts, interned_bytes = parse_test_files()
+
+    print(
+        f"{len(asts)} ASTs, {len(word_table)} distinct words, "
+        f"{word_table.evictions} evicted, "
+        f"{plain_bytes / (1 << 20):.1f} MiB without interning, "
+        f"{interned_bytes / (1 << 20):.1f} MiB interned, "
+        f"{(plain_bytes - interned_bytes) / (1 << 20):.1f} MiB saved"
+    )
+    assert interned_bytes <= plain_bytes
+
+
+def benchmark_unparse_backends(passes: int = 5):
+    """
+    This benchmark prints the ASTs of the test files in the bash-5.2/tests directory
+    back into bash source code with both backends, and makes sure they agree.
+    :param passes: how many times to print the ASTs with each backend
+    """
+
+    test_files = get_test_files()
+    asts = []
+    for test_file in test_files:
+        try:
+            asts.append(bash_to_ast(test_file))
+        except RuntimeError:
+            pass
+
+    timings = {}
+    for backend in ("ctypes", "python"):
+        start = time.perf_counter()
+        for _ in range(passes):
+            outputs = [ast_to_bash_string(ast, backend=backend) for ast in asts]
+        timings[backend] = (time.perf_counter() - start) / passes
+        if backend == "ctypes":
+            expected = outputs
+        else:
+            assert outputs == expected
+
+    print(
+        f"Printed {len(asts)} ASTs, ctypes backend {timings['ctypes']:.3f}s, "
+        f"python backend {timings['python']:.3f}s"
+    )
+
+
+def benchmark_large_commands(words: int = 100000):
+    """
+    This benchmark converts commands with very long word, redirect and case
+    clause lists back into c structs and bash source code, the linked lists of
+    the c structs must be built without recursing once per element.
+    :param words: the number of words of the longest command
+    """
+    scripts = {
+        "words": b"rm " + b" ".join(b"file%d" % i for i in range(words)) + b"\n",
+        "redirects": b"echo " + b" ".join(b"2>f%d" % i for i in range(words // 10)) + b"\n",
+        "clauses": b"case $x in\n"
+        + b"".join(b"p%d) echo %d ;;\n" % (i, i) for i in range(words // 10))
+        + b"esac\n",
+    }
+
+    for name, script in scripts.items():
+        ast = bash_to_ast_from_bytes(script)
+
+        start = time.perf_counter()
+        for command in ast:
+            command._to_ctypes()
+        to_ctypes = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bash = ast_to_bash_string(ast)
+        ctypes_backend = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assert ast_to_bash_string(ast, backend="python") == bash
+        python_backend = time.perf_counter() - start
+
+        assert bash_to_ast_from_bytes(bash) == ast
+        print(
+            f"{name}: {len(script)} bytes, _to_ctypes {to_ctypes:.3f}s, "
+            f"ctypes backend {ctypes_backend:.3f}s, python backend {python_backend:.3f}s"
+        )
+
+
+def c_connection_chain(statements: int) -> c_bash.command:
+    """
+    Builds the command struct of a list of statements the way bash's parser does,
+    as connections nested as deep as there are statements, ((a; b); c)
+    :param statements: the number of statements
+    :return: the command struct
+    """
+    word = c_bash.word_desc()
+    word.word = b"true"
+    words = c_bash.word_list()
+    words.word = ctypes.pointer(word)
+    simple = c_bash.simple_com()
+    simple.words = ctypes.pointer(words)
+    statement = c_bash.command()
+    statement.type = CommandType.CM_SIMPLE.value
+    statement.value.Simple = ctypes.pointer(simple)
+
+    # every statement is the same struct, only the connections take up memory
+    chain = statement
+    for _ in range(statements - 1):
+        connection = c_bash.connection()
+        connection.first = ctypes.pointer(chain)
+        connection.second = ctypes.pointer(statement)
+        connection.connector = ConnectionType.SEMICOLON.value
+        chain = c_bash.command()
+        chain.type = CommandType.CM_CONNECTION.value
+        chain.value.Connection = ctypes.pointer(connection)
+    return chain
+
+
+def benchmark_deep_connections(statements: int = 1000000):
+    """
+    This benchmark converts a list of a million statements, whose connections are
+    nested a million deep, from c structs into python and back, and compares,
+    hashes and prints it, all without raising the recursion limit. The structs
+    are built here rather than parsed, bash itself frees and prints them
+    recursively in c.
+    :param statements: the number of statements
+    """
+    timings = {}
+
+    def timed(name, function):
+        start = time.perf_counter()
+        result = function()
+        timings[name] = time.perf_counter() - start
+        return result
+
+    # each result is dropped as soon as it has been checked, a million
+    # statements take up a few gigabytes in every form
+    c_chain = c_connection_chain(statements)
+    ast = [timed("build", lambda: Command(c_chain))]
+    ast2 = [Command(c_chain)]
+    del c_chain
+    assert timed("equality", lambda: ast == ast2)
+    del ast2
+    timed("hash", lambda: hash(ast[0]))
+    timed("json", lambda: ast_to_json(ast))
+    sequence = timed("flatten", lambda: ast[0].value.connection.flatten())
+    assert len(sequence) == statements
+    del sequence
+    timed("flat json", lambda: ast_to_json(ast, flatten_connections=True))
+    timed("_to_ctypes", lambda: ast[0]._to_ctypes())
+    bash = timed("print", lambda: ast_to_bash_string(ast, backend="python"))
+    assert bash == b"; ".join([b"true"] * statements) + b"\n"
+
+    print(
+        f"{statements} statements, "
+        + ", ".join(f"{name} {timing:.3f}s" for name, timing in timings.items())
+    )
+
+
+def benchmark_lazy_parsing(passes: int = 5):
+    """
+    This benchmark parses the test files in the bash-5.2/tests directory and only
+    looks at the top-level commands and the first word of the simple ones among
+    them, once with the ASTs built right away and once with lazy ASTs.
+    :param passes: how many times to parse the test files each way
+    """
+
+    test_files = get_test_files()
+
+    def first_words(ast):
+        words = []
+        for command in ast:
+            if command.type == CommandType.CM_SIMPLE:
+                # a simple command can consist of just redirects
+                simple_words = command.value.simple_com.words
+                words.append(simple_words[0].word if simple_words else None)
+            else:
+                words.append(command.type)
+        return words
+
+    timings = {}
+    for lazy in (False, True):
+        start = time.perf_counter()
+        for _ in range(passes):
+            outputs = []
+            for test_file in test_files:
+                try:
+                    ast = bash_to_ast(test_file, lazy=lazy)
+                except RuntimeError:
+                    continue
+                outputs.append(first_words(ast))
+                if lazy:
+                    ast.close()
+        timings[lazy] = (time.perf_counter() - start) / passes
+        if not lazy:
+            expected = outputs
+        else:
+            assert outputs == expected
+
+    print(
+        f"Top-level commands of {len(expected)} scripts, "
+        f"eager {timings[False]:.3f}s, lazy {timings[True]:.3f}s"
+    )
+
+
+def program_names(ast: list) -> list[bytes]:
+    """
+    Collects the program names of the simple commands of an AST, at every depth
+    :param ast: a list of Command objects, or of views of them
+    :return: the first word of each simple command that has words
+    """
+    names = []
+    stack: list = list(ast)
+    while stack:
+        node = stack.pop()
+        if node is None or isinstance(node, (WordDesc, WordDescView)):
+            continue
+        if isinstance(node, (Command, CommandView)):
+            if node.type == CommandType.CM_SIMPLE:
+                words = node.value.simple_com.words
+                if words:
+                    names.append(words[0].word)
+            else:
+                stack.append(node.value.node)
+            continue
+        # views have the attributes of the nodes they mirror
+        for name, kind, _ in _SCHEMA[getattr(node, "_node_class", type(node))]:
+            if kind == _NODE:
+                stack.append(getattr(node, name))
+            elif kind == _LIST:
+                stack.extend(getattr(node, name))
+    return names
+
+
+def benchmark_parse_session(passes: int = 5):
+    """
+    This benchmark collects the program names of the test files in the
+    bash-5.2/tests directory, once from ASTs and once from read-only views of
+    the c structs in a parse session, which aren't copied.
+    :param passes: how many times to parse the test files each way
+    """
+
+    test_files = get_test_files()
+
+    start = time.perf_counter()
+    for _ in range(passes):
+        expected = []
+        for test_file in test_files:
+            try:
+                expected.append(program_names(bash_to_ast(test_file)))
+            except RuntimeError:
+                continue
+    copied = (time.perf_counter() - start) / passes
+
+    start = time.perf_counter()
+    for _ in range(passes):
+        outputs = []
+        for test_file in test_files:
+            try:
+                with parse_session(test_file) as views:
+                    outputs.append(program_names(views))
+            except RuntimeError:
+                continue
+    viewed = (time.perf_counter() - start) / passes
+
+    assert outputs == expected
+    print(
+        f"Program names of {len(expected)} scripts, "
+        f"from ASTs {copied:.3f}s, from views {viewed:.3f}s"
+    )
+
+
+def benchmark_streaming(statements: int = 200000):
+    """
+    This benchmark parses a generated script of many top-level commands, once all
+    at once and once one command at a time, and measures how long it takes to get
+    the first command and how much memory each way takes at its peak.
+    :param statements: the number of top-level commands of the script
+    """
+    TMP_FILE = "/tmp/libbash_streaming.sh"
+    with open(TMP_FILE, "wb") as f:
+        for i in range(statements):
+            f.write(b"if test -f file%d; then echo %d; fi\n" % (i, i))
+
+    results = {}
+    for name in ("bash_to_ast", "iter_bash_to_ast"):
+        tracemalloc.start()
+        start = time.perf_counter()
+        if name == "bash_to_ast":
+            commands = iter(bash_to_ast(TMP_FILE, with_linno_info=True))
+        else:
+            commands = iter_bash_to_ast(TMP_FILE, with_linno_info=True)
+        next(commands)
+        first = time.perf_counter() - start
+        count = 1 + sum(1 for _ in commands)
+        total = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert count == statements
+        results[name] = (first, total, peak)
+    os.remove(TMP_FILE)
+
+    print(
+        f"{statements} commands, "
+        + ", ".join(
+            f"{name} first {first:.3f}s all {total:.3f}s "
+            f"peak {peak / (1 << 20):.1f} MiB"
+            for name, (first, total, peak) in results.items()
+        )
+    )
+
+
+def benchmark_line_slicing(statements: int = 200000):
+    """
+    This benchmark parses a generated script with the source of each command,
+    sliced as bytes and as memoryviews of the memory mapped file, and measures
+    how much memory each way takes at its peak.
+    :param statements: the number of top-level commands of the script
+    """
+    TMP_FILE = "/tmp/libbash_lines.sh"
+    with open(TMP_FILE, "wb") as f:
+        for i in range(statements):
+            f.write(b"echo %d > file%d\n" % (i, i))
+
+    results = {}
+    for source_as_memoryview in (False, True):
+        tracemalloc.start()
+        start = time.perf_counter()
+        ast = bash_to_ast(
+            TMP_FILE, with_linno_info=True, source_as_memoryview=source_as_memoryview
+        )
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[source_as_memoryview] = (elapsed, peak, ast)
+
+    (_, _, ast), (_, _, ast2) = results[False], results[True]
+    assert all(view == source for (_, source, _, _), (_, view, _, _) in zip(ast, ast2))
+    del ast, ast2
+    os.remove(TMP_FILE)
+
+    print(
+        f"{statements} commands with their source, "
+        + ", ".join(
+            f"{'memoryview' if as_view else 'bytes'} {elapsed:.3f}s "
+            f"peak {peak / (1 << 20):.1f} MiB"
+            for as_view, (elapsed, peak, _) in results.items()
+        )
+    )
+
+
+def benchmark_span_index(lookups: int = 100000):
+    """
+    This benchmark indexes the spans of the nodes of the test files in the
+    bash-5.2/tests directory, and looks up the innermost node at random offsets.
+    :param lookups: the number of offsets looked up in each file
+    """
+
+    test_files = get_test_files()
+
+    start = time.perf_counter()
+    indexes = []
+    for test_file in test_files:
+        try:
+            indexes.append(SpanIndex.from_file(test_file))
+        except RuntimeError:
+            pass
+    built = time.perf_counter() - start
+
+    random.seed(0)
+    start = time.perf_counter()
+    for spans in indexes:
+        size = len(spans.lines.source)
+        for _ in range(lookups):
+            spans.node_at(random.randrange(size + 1))
+    looked_up = time.perf_counter() - start
+
+    print(
+        f"Indexed {sum(len(spans) for spans in indexes)} nodes of {len(indexes)} "
+        f"scripts in {built:.3f}s, {lookups * len(indexes)} lookups {looked_up:.3f}s"
+    )
+
+
+def benchmark_json_stream(statements: int = 100000):
+    """
+    This benchmark writes the AST of a generated script as JSON text, once with
+    json.dumps of the output of ast_to_json and once with ast_to_json_stream,
+    and measures how long each way takes and how much memory it takes at its peak.
+    :param statements: the number of top-level commands of the script
+    """
+    TMP_FILE = "/tmp/libbash_json.json"
+    bash = b"".join(
+        b"if test -f file%d; then cat file%d > out%d 2>&1; fi\n" % (i, i, i)
+        for i in range(statements)
+    )
+    ast = bash_to_ast_from_bytes(bash)
+
+    results = {}
+    for name in ("json.dumps", "ast_to_json_stream"):
+        tracemalloc.start()
+        start = time.perf_counter()
+        with open(TMP_FILE, "w") as f:
+            if name == "json.dumps":
+                f.write(json.dumps(ast_to_json(ast)))
+            else:
+                ast_to_json_stream(ast, f)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = (elapsed, peak, os.path.getsize(TMP_FILE))
+    os.remove(TMP_FILE)
+    assert results["json.dumps"][2] == results["ast_to_json_stream"][2]
+
+    print(
+        f"{statements} commands as JSON, "
+        + ", ".join(
+            f"{name} {elapsed:.3f}s peak {peak / (1 << 20):.1f} MiB"
+            for name, (elapsed, peak, _) in results.items()
+        )
+    )
+
+
+def benchmark_json_to_ast(passes: int = 5):
+    """
+    This benchmark loads the ASTs of the test files in the bash-5.2/tests directory
+    from their JSON text, and compares it with parsing the files again.
+    :param passes: how many times to load the ASTs each way
+    """
+
+    test_files = get_test_files()
+    parsed = {}
+    for test_file in test_files:
+        try:
+            parsed[test_file] = json.dumps(ast_to_json(bash_to_ast(test_file)))
+        except RuntimeError:
+            pass
+
+    start = time.perf_counter()
+    for _ in range(passes):
+        for test_file in parsed:
+            bash_to_ast(test_file)
+    parse_time = (time.perf_counter() - start) / passes
+
+    start = time.perf_counter()
+    for _ in range(passes):
+        for text in parsed.values():
+            json_to_ast(json.loads(text))
+    load_time = (time.perf_counter() - start) / passes
+
+    print(
+        f"Loaded {len(parsed)} ASTs, bash_to_ast {parse_time:.3f}s, "
+        f"json.loads and json_to_ast {load_time:.3f}s"
+    )
+
+
+def benchmark_json_flags(passes: int = 5):
+    """
+    This benchmark converts the ASTs of the test files in the bash-5.2/tests
+    directory to JSON with ast_to_json, with the flags written as names and as
+    ints, and measures how long each takes.
+    :param passes: how many times to convert the ASTs each way
+    """
+
+    test_files = get_test_files()
+    asts = []
+    for test_file in test_files:
+        try:
+            asts.append(bash_to_ast(test_file))
+        except RuntimeError:
+            pass
+
+    times = {}
+    for flags_as_int in (False, True):
+        start = time.perf_counter()
+        for _ in range(passes):
+            for ast in asts:
+                ast_to_json(ast, flags_as_int=flags_as_int)
+        times[flags_as_int] = (time.perf_counter() - start) / passes
+
+    print(
+        f"Converted {len(asts)} ASTs to JSON, flags as names {times[False]:.3f}s, "
+        f"flags as ints {times[True]:.3f}s"
+    )
+
+
+def benchmark_ast_bytes(passes: int = 5):
+    """
+    This benchmark serializes the ASTs of the test files in the bash-5.2/tests
+    directory into the binary format and back, and compares the size and time with
+    writing them as JSON text and loading them back from it.
+    :param passes: how many times to serialize and load the ASTs each way
+    """
+
+    test_files = get_test_files()
+    asts = []
+    for test_file in test_files:
+        try:
+            asts.append(bash_to_ast(test_file))
+        except RuntimeError:
+            pass
+
+    results = {}
+    for name, dump, load in (
+        ("json", lambda ast: json.dumps(ast_to_json(ast)), json.loads),
+        ("binary", ast_to_bytes, None),
+    ):
+        start = time.perf_counter()
+        for _ in range(passes):
+            dumped = [dump(ast) for ast in asts]
+        dump_time = (time.perf_counter() - start) / passes
+
+        start = time.perf_counter()
+        for _ in range(passes):
+            if load is None:
+                loaded = [bytes_to_ast(data) for data in dumped]
+            else:
+                loaded = [json_to_ast(load(data)) for data in dumped]
+        load_time = (time.perf_counter() - start) / passes
+        assert len(loaded) == len(asts)
+
+        size = sum(len(data) for data in dumped)
+        results[name] = (size, dump_time, load_time)
+
+    print(
+        f"Serialized {len(asts)} ASTs, "
+        + ", ".join(
+            f"{name} {size / (1 << 20):.1f} MiB dump {dump_time:.3f}s "
+            f"load {load_time:.3f}s"
+            for name, (size, dump_time, load_time) in results.items()
+        )
+    )
+
+
+def run_benchmarks():
+    """
+    Runs all the benchmarks in this file
+    """
+    print("Running benchmarks...")
+    try:
+        benchmark_ast_memory()
+        benchmark_memory_regression()
+        benchmark_subtree_dedup()
+        benchmark_word_interning()
+        benchmark_unparse_backends()
+        benchmark_large_commands()
+        benchmark_deep_connections()
+        benchmark_lazy_parsing()
+        benchmark_parse_session()
+        benchmark_streaming()
+        benchmark_line_slicing()
+        benchmark_span_index()
+        benchmark_json_stream()
+        benchmark_json_to_ast()
+        benchmark_json_flags()
+        benchmark_ast_bytes()
+    except AssertionError:
+        print("Benchmark failed!")
+        sys.exit(1)
+    print("All benchmarks passed!")
+
+
+if __name__ == "__main__":
+    run_benchmarks()
@@ -1 +1,28 @@
-from .api import ast_to_json, bash_to_ast, ast_to_bash
+from .api import (
+    ast_to_json,
+    ast_to_json_stream,
+    iter_ast_to_json,
+    json_to_ast,
+    bash_to_ast,
+    bash_to_ast_from_bytes,
+    bash_to_ast_from_string,
+    iter_bash_to_ast,
+    ast_to_bash,
+    ast_to_bash_string,
+    ast_to_bash_stream,
+    iter_ast_to_bash,
+    reset_bash,
+    LazyAst,
+    ParseSession,
+    parse_session,
+)
+from .lines import LineIndex
+from .serialize import (
+    ast_to_bytes,
+    ast_to_bytes_file,
+    bytes_file_to_ast,
+    bytes_to_ast,
+)
+from .parallel import parse_many
+from .spans import SpanIndex
+from .cache import MemoryCache, ParseCache
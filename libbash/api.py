@@ -1,16 +1,29 @@
 from __future__ import annotations
 
 from .bash_command import *
+from .bash_command.command import _Worklist
+from .json_writer import _JsonWriter
+from .lines import LineIndex
+from .unparse import _CommandPrinter
 import ctypes
 import os
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import itertools
+import threading
+import weakref
 
-from typing import Any
+from typing import Any, BinaryIO, Callable, Iterator, Optional, TextIO, Union
 
 # current location + ../../bash-5.2/bash.so
 BASH_FILE_PATH = os.path.join(os.path.dirname(__file__), "bash-5.2", "bash.so")
 
 
-def _setup_bash() -> ctypes.CDLL:
+def _load_bash() -> ctypes.CDLL:
+    """
+    Loads bash.so, compiling the bash source first if the shared object is missing.
+    :return: the loaded bash shared object
+    """
     if not os.path.isfile(BASH_FILE_PATH):
         # run configure and make clean all
         # this will compile the bash source code into a shared object file
@@ -27,59 +40,612 @@ def _setup_bash() -> ctypes.CDLL:
         raise Exception("Bash file not found at path: " + BASH_FILE_PATH)
 
     try:
-        bash = ctypes.CDLL(BASH_FILE_PATH)
+        return ctypes.CDLL(BASH_FILE_PATH)
     except OSError:
         raise Exception("Bash shared object file not found at path: " + BASH_FILE_PATH)
 
-    # tell python arg types and return type of the initialize_shell_libbash
-    bash.initialize_shell_libbash.argtypes = []
-    bash.initialize_shell_libbash.restype = ctypes.c_int
 
-    # call the function
-    init_result: ctypes.c_int = bash.initialize_shell_libbash()
-    if init_result != 0:
-        raise Exception("Bash initialization failed")
+class _Bash:
+    """
+    a process-wide handle to bash.so, the function prototypes and the
+    global variables used by the api are bound once when the handle is created
+    """
+
+    lib: ctypes.CDLL
+    line_number: ctypes.c_int  # aliases the line_number global in bash
+    global_command: ctypes._Pointer[c_bash.command]  # aliases global_command
+    eof_reached: ctypes.c_int  # aliases the EOF_Reached global in bash
+    # whether the parser is in the middle of a script, which it is between the
+    # commands yielded by iter_bash_to_ast
+    parsing: bool
+
+    def __init__(self):
+        self.lib = _load_bash()
+        self.parsing = False
+
+        # tell python arg types and return types of the functions we call
+        self.lib.initialize_shell_libbash.argtypes = []
+        self.lib.initialize_shell_libbash.restype = ctypes.c_int
+
+        self.lib.set_bash_file.argtypes = [ctypes.c_char_p]
+        self.lib.set_bash_file.restype = ctypes.c_int
+
+        self.lib.read_command_safe.argtypes = []
+        self.lib.read_command_safe.restype = ctypes.c_int
+
+        # this function closes the file, the function is written by bash, not us
+        self.lib.unset_bash_input.argtypes = [ctypes.c_int]
+        self.lib.unset_bash_input.restype = None
 
-    return bash
+        # parse.y, makes the parser read from a string instead of a file
+        self.lib.with_input_from_string.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
+        self.lib.with_input_from_string.restype = None
 
+        self.lib.make_command_string.argtypes = [ctypes.POINTER(c_bash.command)]
+        self.lib.make_command_string.restype = ctypes.c_char_p
 
-def ast_to_bash(ast: list[Command], write_to: str):
+        # dispose_cmd.c, frees a command tree allocated by the parser
+        self.lib.dispose_command.argtypes = [ctypes.POINTER(c_bash.command)]
+        self.lib.dispose_command.restype = None
+
+        # these alias the globals themselves, so reading them always
+        # gives the current value
+        self.line_number = ctypes.c_int.in_dll(self.lib, "line_number")
+        self.global_command = ctypes.POINTER(c_bash.command).in_dll(
+            self.lib, "global_command"
+        )
+        self.eof_reached = ctypes.c_int.in_dll(self.lib, "EOF_Reached")
+        # the same global as a plain address, so it can be set to null
+        self._global_command_address = ctypes.c_void_p.in_dll(
+            self.lib, "global_command"
+        )
+
+        self.initialize()
+
+    def initialize(self):
+        """
+        (Re)initializes the shell state inside bash.so
+        """
+        init_result: int = self.lib.initialize_shell_libbash()
+        if init_result != 0:
+            raise Exception("Bash initialization failed")
+
+    def start_parsing(self):
+        """
+        Marks the parser as in the middle of a script, the parser keeps its input
+        in globals so only one script can be parsed at a time
+        """
+        if self.parsing:
+            raise RuntimeError(
+                "Bash is in the middle of parsing another script, finish or close "
+                "the iterator returned by iter_bash_to_ast first"
+            )
+        self.parsing = True
+
+    def dispose_global_command(self):
+        """
+        Frees the command tree the parser left in global_command, this must only
+        be done once it has been converted into python objects
+        """
+        if self.global_command:
+            self.lib.dispose_command(self.global_command)
+            self._global_command_address.value = None
+
+    def take_global_command(self) -> ctypes._Pointer[c_bash.command]:
+        """
+        Takes the command tree the parser left in global_command, the parser
+        no longer refers to it and it must be freed with dispose_command
+        :return: a pointer to the command tree
+        """
+        command = ctypes.cast(
+            self._global_command_address.value, ctypes.POINTER(c_bash.command)
+        )
+        self._global_command_address.value = None
+        return command
+
+
+_bash: Optional[_Bash] = None
+_bash_lock = threading.Lock()
+
+
+def _get_bash() -> _Bash:
     """
-    Converts the AST of a bash script back into the bash source code.
+    :return: the process-wide bash handle, loading and initializing bash.so
+    the first time it is called
+    """
+    global _bash
+    if _bash is None:
+        with _bash_lock:
+            if _bash is None:
+                _bash = _Bash()
+    return _bash
+
+
+def reset_bash():
+    """
+    Reinitializes the shell state inside bash.so. The shared object is
+    only loaded and configured once per process, use this if the shell state
+    genuinely needs to be reset, for example after bash.so reported an error.
+    """
+    _get_bash().initialize()
+
+
+def _dispose_commands(bash: _Bash, commands: list[ctypes._Pointer[c_bash.command]]):
+    """
+    Frees command trees taken from the parser
+    :param bash: the bash handle
+    :param commands: pointers to the command trees, the list is emptied
+    """
+    while commands:
+        bash.lib.dispose_command(commands.pop())
+
+
+class ParseSession:
+    """
+    Owns the command trees bash allocated while parsing a script, so that the
+    lazy commands built from them can read their fields when first accessed.
+    The trees are freed when the session is closed, or else once neither the
+    session nor any command still to be read from them is referenced.
+    """
+
+    __slots__ = ("closed", "_commands", "_finalizer", "__weakref__")
+
+    closed: bool  # whether the command trees have been freed
+    _commands: list[ctypes._Pointer[c_bash.command]]  # the command trees
+    _finalizer: weakref.finalize  # frees the command trees
+
+    def __init__(self, bash: _Bash):
+        """
+        :param bash: the bash handle the command trees are taken from
+        """
+        self.closed = False
+        self._commands = []
+        self._finalizer = weakref.finalize(
+            self, _dispose_commands, bash, self._commands
+        )
+        # the memory goes back to the system at exit anyway
+        self._finalizer.atexit = False
+
+    def take_global_command(self, bash: _Bash) -> c_bash.command:
+        """
+        Takes ownership of the command tree the parser left in global_command
+        :param bash: the bash handle
+        :return: the command struct, valid until the session is closed
+        """
+        command = bash.take_global_command()
+        self._commands.append(command)
+        return command.contents
+
+    def close(self):
+        """
+        Frees the command trees, the lazy commands that haven't been read yet
+        raise a RuntimeError when accessed afterwards
+        """
+        self.closed = True
+        self._finalizer()
+
+    def __enter__(self) -> ParseSession:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LazyAst(list):
+    """
+    The AST returned by the parsing functions when lazy is true, a list of
+    commands that only read their redirects and value from the c structs when
+    they are first accessed. The c structs are freed when the AST is closed,
+    ideally with a with statement, or when it and its commands are released.
+    """
+
+    __slots__ = ("session",)
+
+    session: ParseSession  # owns the c structs the commands are read from
+
+    def __init__(self, session: ParseSession):
+        """
+        :param session: the parse session owning the c structs
+        """
+        super().__init__()
+        self.session = session
+
+    def close(self):
+        """
+        Frees the c structs, see ParseSession.close
+        """
+        self.session.close()
+
+    def __enter__(self) -> LazyAst:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# the ways commands can be printed back into bash source code
+_BACKENDS = ("ctypes", "python")
+
+
+def _iter_ast_to_bash_ctypes(ast: list[Command]) -> Iterator[bytes]:
+    """
+    Prints each command with make_command_string in bash.so, after converting
+    it back into c structs.
     :param ast: The AST of the bash script
-    will be called before parsing the bash file. By default this is set to false, but
-    if the bash source hasn't been compiled yet, this flag will be ignored.
-    :return: The bash source code
+    :return: an iterator of the bash source code of each command
     """
-    bash = _setup_bash()
+    bash = _get_bash().lib
+
+    for comm in ast:
+        # make_command_string returns a buffer owned by bash, ctypes copies it
+        # into a new bytes object so it is safe to keep around
+        yield bash.make_command_string(comm._to_ctypes()) + b"\n"
 
-    # specify arg types and return type of make_command_string function
-    bash.make_command_string.argtypes = [ctypes.POINTER(c_bash.command)]
-    bash.make_command_string.restype = ctypes.c_char_p
 
-    bash_str = bytes()
+def _iter_ast_to_bash_python(ast: list[Command]) -> Iterator[bytes]:
+    """
+    Prints each command with a python port of make_command_string, straight
+    from the Command objects.
+    :param ast: The AST of the bash script
+    :return: an iterator of the bash source code of each command
+    """
+    printer = _CommandPrinter()
 
     for comm in ast:
-        command_string = bash.make_command_string(comm._to_ctypes())
-        bash_str += command_string
-        bash_str += "\n".encode("utf-8")
+        yield printer.make_command_string(comm) + b"\n"
 
+
+def iter_ast_to_bash(ast: list[Command], backend: str = "ctypes") -> Iterator[bytes]:
+    """
+    Converts the AST of a bash script back into the bash source code, one
+    command at a time.
+    :param ast: The AST of the bash script
+    :param backend: "ctypes" to print the commands with bash.so, or "python" to
+    print them in python, which gives the same output without building c structs
+    :return: an iterator of the bash source code of each command, as bytes
+    ending in a newline
+    """
+    if backend == "ctypes":
+        return _iter_ast_to_bash_ctypes(ast)
+    elif backend == "python":
+        return _iter_ast_to_bash_python(ast)
+    else:
+        raise ValueError(
+            f"Unknown backend {backend!r}, expected one of {', '.join(_BACKENDS)}"
+        )
+
+
+def ast_to_bash_string(ast: list[Command], backend: str = "ctypes") -> bytes:
+    """
+    Converts the AST of a bash script back into the bash source code.
+    :param ast: The AST of the bash script
+    :param backend: "ctypes" or "python", see iter_ast_to_bash
+    :return: The bash source code, as bytes since scripts need not be valid utf-8
+    """
+    # joining once is linear, appending to bytes in a loop would be quadratic
+    return b"".join(iter_ast_to_bash(ast, backend))
+
+
+def ast_to_bash_stream(ast: list[Command], fileobj: BinaryIO, backend: str = "ctypes"):
+    """
+    Converts the AST of a bash script back into the bash source code,
+    writing each command to the file object as soon as it is converted.
+    :param ast: The AST of the bash script
+    :param fileobj: a file object opened for writing bytes
+    :param backend: "ctypes" or "python", see iter_ast_to_bash
+    """
+    for command_string in iter_ast_to_bash(ast, backend):
+        fileobj.write(command_string)
+
+
+def ast_to_bash(ast: list[Command], write_to: str, backend: str = "ctypes"):
+    """
+    Converts the AST of a bash script back into the bash source code.
+    :param ast: The AST of the bash script
+    :param write_to: The path of the file the bash source code is written to
+    :param backend: "ctypes" or "python", see iter_ast_to_bash
+    """
+    # check the backend before truncating the file
+    command_strings = iter_ast_to_bash(ast, backend)
     with open(write_to, "wb") as f:
         # don't decode the bytes, just write them to the file
-        f.write(bash_str)
+        for command_string in command_strings:
+            f.write(command_string)
 
 
-def ast_to_json(ast: list[Command]) -> list[dict[str, Any]]:
+def ast_to_json(
+    ast: list[Command], flatten_connections: bool = False, flags_as_int: bool = False
+) -> list[dict[str, Any]]:
     """
     Converts the AST to a JSON style object.
     :param ast: The AST, a list of Command objects.
+    :param flatten_connections: Whether to write each chain of connections, such
+    as a; b; c, as one sequence of commands and connectors, see Connection.flatten.
+    The JSON style object is then as shallow as the commands are nested.
+    :param flags_as_int: Whether to write each set of flags as its integer value,
+    the bits bash sets, rather than as a list of the names of the flags
     :return: A JSON style object, a list of dicts from str to JSON style object.
     """
-    return [command._to_json() for command in ast]
+    if not flatten_connections and not flags_as_int:
+        return [command._to_json() for command in ast]
+    worklist = _Worklist(
+        flatten_connections=flatten_connections, flags_as_int=flags_as_int
+    )
+    json = [command._to_json(worklist) for command in ast]
+    worklist.run()
+    return json
+
+
+def json_to_ast(json: list[dict[str, Any]]) -> list[Command]:
+    """
+    Converts the JSON style object of an AST back into the AST, the inverse of
+    ast_to_json, so a stored AST can be loaded without parsing the script again.
+    :param json: A JSON style object, as ast_to_json returns it or as json.load
+    reads it back, with or without flattened connections. The flags may be
+    given by name, as flags or as ints.
+    :return: The AST, a list of Command objects.
+    """
+    worklist = _Worklist()
+    ast = [Command.from_json(command, worklist) for command in json]
+    worklist.run()
+    return ast
+
+
+def iter_ast_to_json(
+    ast: list[Command],
+    flatten_connections: bool = False,
+    ndjson: bool = False,
+    flags_as_int: bool = False,
+) -> Iterator[str]:
+    """
+    Converts the AST to JSON text, one chunk at a time, without building the JSON
+    style object of ast_to_json first.
+    :param ast: The AST, a list of Command objects.
+    :param flatten_connections: Whether to write chains of connections as
+    sequences, see ast_to_json
+    :param ndjson: If true, each command is written on a line of its own (newline
+    delimited JSON) rather than all of them as one JSON list
+    :param flags_as_int: Whether to write flags as ints, see ast_to_json
+    :return: an iterator of chunks of the JSON text, joined they are the same as
+    json.dumps(ast_to_json(ast, flatten_connections, flags_as_int)), or the same
+    as json.dumps of each command followed by a newline with ndjson
+    """
+    return _JsonWriter(flatten_connections, flags_as_int).iter_json(ast, ndjson)
+
+
+def ast_to_json_stream(
+    ast: list[Command],
+    fileobj: TextIO,
+    flatten_connections: bool = False,
+    ndjson: bool = False,
+    flags_as_int: bool = False,
+):
+    """
+    Converts the AST to JSON text, writing it to the file object chunk by chunk.
+    :param ast: The AST, a list of Command objects.
+    :param fileobj: a file object opened for writing text
+    :param flatten_connections: Whether to write chains of connections as
+    sequences, see ast_to_json
+    :param ndjson: Whether to write each command on a line of its own, see
+    iter_ast_to_json
+    :param flags_as_int: Whether to write flags as ints, see ast_to_json
+    """
+    for chunk in iter_ast_to_json(ast, flatten_connections, ndjson, flags_as_int):
+        fileobj.write(chunk)
+
+
+def _build_global_command(bash: _Bash) -> Command:
+    """
+    Reads the command the parser left in global_command, the python objects
+    don't point into the c tree so it is freed straight away
+    :param bash: the bash handle
+    :return: the command
+    """
+    try:
+        return Command(bash.global_command.contents)
+    finally:
+        bash.dispose_global_command()
+
+
+def _read_commands(
+    bash: _Bash,
+    slice_lines: Optional[Callable[[int, int], bytes]],
+    lazy: bool = False,
+) -> list[Command] | list[tuple[Command, bytes, int, int]]:
+    """
+    Reads commands from the input bash is currently set up to read from
+    until EOF is reached.
+    :param bash: the bash handle, with its input already set
+    :param slice_lines: the function slicing the source of a command by line
+    numbers, if the line numbers of the commands are to be returned
+    :param lazy: If true, a LazyAst of lazy commands will be returned
+    :return: The AST of the bash script
+    """
+    if not lazy:
+        return _read_commands_into(bash, slice_lines, [], _build_global_command)
+
+    session = ParseSession(bash)
+    worklist = _Worklist(session=session)
+
+    def build_lazy_command(bash: _Bash) -> Command:
+        # the lazy command reads from the c tree, the session frees it
+        return Command(session.take_global_command(bash), worklist)
+
+    try:
+        return _read_commands_into(
+            bash, slice_lines, LazyAst(session), build_lazy_command
+        )
+    except BaseException:
+        session.close()
+        raise
+
+
+def _read_commands_into(
+    bash: _Bash,
+    slice_lines: Optional[Callable[[int, int], bytes]],
+    command_list: list,
+    read_command: Callable[[_Bash], Any],
+) -> list:
+    """
+    Reads commands from the input bash is currently set up to read from
+    until EOF is reached.
+    :param bash: the bash handle, with its input already set
+    :param slice_lines: see _iter_commands
+    :param command_list: the list to add the commands to
+    :param read_command: the function reading each command from global_command,
+    see _iter_commands
+    :return: command_list
+    """
+    command_list.extend(_iter_commands(bash, read_command, slice_lines))
+    return command_list
+
+
+def _iter_commands(
+    bash: _Bash,
+    read_command: Callable[[_Bash], Any],
+    slice_lines: Optional[Callable[[int, int], bytes]],
+) -> Iterator:
+    """
+    Reads commands from the input bash is currently set up to read from until
+    EOF is reached, yielding each one as soon as it is read.
+    :param bash: the bash handle, with its input already set and marked as parsing
+    :param read_command: the function reading each command from global_command,
+    it must leave global_command freed or taken
+    :param slice_lines: the function slicing the source of a command from the
+    line it starts on up to the line it stops at, if the line numbers of the
+    commands are to be returned
+    :return: an iterator of the commands, or of tuples of each command, its
+    source and line numbers
+    """
+    reading = True
+    try:
+        while True:
+            # call the function
+            linno_before: int = bash.line_number.value
+            read_result: int = bash.lib.read_command_safe()
+            linno_after: int = bash.line_number.value
+            if read_result != 0:
+                reading = False
+                bash.lib.unset_bash_input(0)
+                # the parser may be left in a bad state, start fresh next time
+                bash.initialize()
+                raise RuntimeError(
+                    "Bash read command failed, shell script may be invalid"
+                )
+
+            # global_command is null
+            if not bash.global_command:
+                if bash.eof_reached.value:
+                    reading = False
+                    bash.lib.unset_bash_input(0)
+                    break
+                else:
+                    # newline probably
+                    continue
+
+            command = read_command(bash)
+
+            if slice_lines is not None:
+                command_string = slice_lines(linno_before, linno_after)
+                yield (command, command_string, linno_before, linno_after)
+            else:
+                yield command
+    finally:
+        if reading:
+            # stopped halfway through the script, the iterator was closed or
+            # reading the command failed, drop the rest of the input
+            if bash.global_command:
+                bash.dispose_global_command()
+            bash.lib.unset_bash_input(0)
+            bash.initialize()
+        bash.parsing = False
+
+
+class _LineReader:
+    """
+    Slices the source of each command out of a file as the commands are read, the
+    commands come in order so only the lines from the start of the last command
+    on are kept in memory
+    """
+
+    __slots__ = ("file", "lines", "first")
+
+    file: BinaryIO  # the file, read one line at a time
+    lines: deque[bytes]  # the lines read but not dropped yet
+    first: int  # the index of the first line in lines
+
+    def __init__(self, file: BinaryIO):
+        """
+        :param file: the file, opened for reading bytes
+        """
+        self.file = file
+        self.lines = deque()
+        self.first = 0
+
+    def slice_lines(self, linno_before: int, linno_after: int) -> bytes:
+        """
+        :param linno_before: the first line to include
+        :param linno_after: the line to stop at
+        :return: the same as LineIndex.slice on the whole file
+        """
+        lines = self.lines
+        while self.first + len(lines) < linno_after:
+            line = self.file.readline()
+            if not line:
+                break
+            lines.append(line)
+        while lines and self.first < linno_before:
+            lines.popleft()
+            self.first += 1
+        if self.first < linno_before:
+            # past the end of the file
+            return b""
+        return b"".join(itertools.islice(lines, 0, max(linno_after - linno_before, 0)))
+
+
+def _set_input_file(bash: _Bash, bash_file: str):
+    """
+    Sets bash up to read commands from a file
+    :param bash: the bash handle, which is marked as parsing
+    :param bash_file: The path to the bash file to parse
+    """
+    bash.start_parsing()
+    # bash isn't initialized again before each parse, so the line number and
+    # end of file flag left over from the previous script are reset here
+    bash.line_number.value = 0
+    bash.eof_reached.value = 0
+    # call the function
+    set_result: int = bash.lib.set_bash_file(bash_file.encode("utf-8"))
+    if set_result < 0:
+        bash.parsing = False
+        raise IOError("Setting bash file failed")
+
+
+def _set_input_bytes(bash: _Bash, data: bytes) -> bytes:
+    """
+    Sets bash up to read commands from bash source code held in memory
+    :param bash: the bash handle, which is marked as parsing
+    :param data: The bash source code
+    :return: the buffer bash reads from, it must be kept alive until bash is
+    done reading from it
+    """
+    bash.start_parsing()
+    # bash drops null bytes when reading a script, it would stop at the first
+    # one when reading from a string so we drop them up front, the line
+    # slices are still taken from the original data
+    buffer = data.replace(b"\0", b"") if b"\0" in data else data
+
+    bash.line_number.value = 0
+    bash.eof_reached.value = 0
+    bash.lib.with_input_from_string(buffer, b"libbash")
+    return buffer
 
 
 def bash_to_ast(
-    bash_file: str, with_linno_info: bool = False
+    bash_file: str,
+    with_linno_info: bool = False,
+    lazy: bool = False,
+    source_as_memoryview: bool = False,
 ) -> list[Command] | list[tuple[Command, bytes, int, int]]:
     """
     Extracts the AST from the bash source code.
@@ -89,63 +655,127 @@ def bash_to_ast(
     will be called before parsing the bash file. By default this is set to false, but
     if the bash source hasn't been compiled yet, this flag will be ignored.
     :param with_linno_info: If true, the line numbers of the commands will be returned
+    :param lazy: If true, the commands only read their redirects and value, and
+    the commands in it, from the c structs when first accessed. A LazyAst is
+    returned, which should be closed once done with to free the c structs
+    :param source_as_memoryview: If true, the source of each command is returned
+    as a memoryview of the memory mapped file instead of as bytes, so the source
+    isn't copied
     :return: The AST of the bash script
     """
-    bash = _setup_bash()
+    bash = _get_bash()
 
-    # tell python arg types and return type of the set_bash_file function
-    bash.set_bash_file.argtypes = [ctypes.c_char_p]
-    bash.set_bash_file.restype = ctypes.c_int
+    slice_lines = None
+    if with_linno_info:
+        # the file is memory mapped rather than read into memory
+        lines = LineIndex.from_file(bash_file)
+        slice_lines = lines.view if source_as_memoryview else lines.slice
 
-    # call the function
-    set_result: int = bash.set_bash_file(bash_file.encode("utf-8"))
-    if set_result < 0:
-        raise IOError("Setting bash file failed")
+    _set_input_file(bash, bash_file)
+    return _read_commands(bash, slice_lines, lazy)
 
-    # tell python arg types and return type of the read_command_safe function
-    bash.read_command_safe.argtypes = []
-    bash.read_command_safe.restype = ctypes.c_int
-
-    # this function closes the file, the function is written by bash, not us
-    bash.unset_bash_input.argtypes = [ctypes.c_int]
-
-    command_list = []
-
-    with open(bash_file, "rb") as f:
-        lines = f.readlines()
-
-    while True:
-        # call the function
-        linno_before: int = ctypes.c_int.in_dll(bash, "line_number").value
-        read_result: ctypes.c_int = bash.read_command_safe()
-        linno_after: int = ctypes.c_int.in_dll(bash, "line_number").value
-        if read_result != 0:
-            bash.unset_bash_input(0)
-            raise RuntimeError("Bash read command failed, shell script may be invalid")
-
-        # read the global_command variable
-        global_command: ctypes._Pointer[c_bash.command] = ctypes.POINTER(
-            c_bash.command
-        ).in_dll(bash, "global_command")
-
-        # global_command is null
-        if not global_command:
-            eof_reached: ctypes.c_int = ctypes.c_int.in_dll(bash, "EOF_Reached")
-            if eof_reached:
-                bash.unset_bash_input(0)
-                break
-            else:
-                # newline probably
-                continue
 
-        # read the command
-        command = Command(global_command.contents)
+def bash_to_ast_from_bytes(
+    data: bytes,
+    with_linno_info: bool = False,
+    lazy: bool = False,
+    source_as_memoryview: bool = False,
+) -> list[Command] | list[tuple[Command, bytes, int, int]]:
+    """
+    Extracts the AST from bash source code held in memory, the parser reads
+    straight from the buffer so nothing is written to disk.
+
+    :param data: The bash source code
+    :param with_linno_info: If true, the line numbers of the commands will be returned,
+    the source of each command is sliced from data
+    :param lazy: If true, the commands only read their redirects and value, and
+    the commands in it, from the c structs when first accessed. A LazyAst is
+    returned, which should be closed once done with to free the c structs
+    :param source_as_memoryview: If true, the source of each command is returned
+    as a memoryview of data instead of as bytes, so the source isn't copied
+    :return: The AST of the bash script
+    """
+    bash = _get_bash()
 
-        # add the command to the list
-        if with_linno_info:
-            command_string = b"".join(lines[linno_before:linno_after])
-            command_list.append((command, command_string, linno_before, linno_after))
+    data = bytes(data)
+    slice_lines = None
+    if with_linno_info:
+        lines = LineIndex(data)
+        slice_lines = lines.view if source_as_memoryview else lines.slice
+
+    # bash keeps pointing into buffer while parsing, buffer must outlive the parse
+    buffer = _set_input_bytes(bash, data)
+    return _read_commands(bash, slice_lines, lazy)
+
+
+def bash_to_ast_from_string(
+    script: str, with_linno_info: bool = False, lazy: bool = False
+) -> list[Command] | list[tuple[Command, bytes, int, int]]:
+    """
+    Extracts the AST from bash source code held in a string.
+
+    :param script: The bash source code
+    :param with_linno_info: If true, the line numbers of the commands will be returned
+    :param lazy: If true, a LazyAst is returned, see bash_to_ast
+    :return: The AST of the bash script
+    """
+    return bash_to_ast_from_bytes(script.encode("utf-8"), with_linno_info, lazy)
+
+
+@contextmanager
+def parse_session(script: Union[str, bytes]) -> Iterator[list[CommandView]]:
+    """
+    Parses a script into read-only views of the c structs bash allocated, which
+    have the same attributes as the Command classes but read them from the structs
+    when accessed instead of copying them. The structs are freed when the with
+    statement exits, the views can't be read afterwards.
+
+    :param script: The path to the bash file to parse, or the bash source code
+    as bytes
+    :return: a context manager giving the list of top-level command views
+    """
+    bash = _get_bash()
+
+    with ParseSession(bash) as session:
+
+        def view_command(bash: _Bash) -> CommandView:
+            return CommandView(session.take_global_command(bash), session)
+
+        if isinstance(script, str):
+            _set_input_file(bash, script)
+            yield _read_commands_into(bash, None, [], view_command)
         else:
-            command_list.append(command)
+            # bash keeps pointing into buffer while parsing
+            buffer = _set_input_bytes(bash, bytes(script))
+            yield _read_commands_into(bash, None, [], view_command)
 
-    return command_list
+
+def iter_bash_to_ast(
+    script: Union[str, bytes], with_linno_info: bool = False
+) -> Iterator[Command] | Iterator[tuple[Command, bytes, int, int]]:
+    """
+    Extracts the AST from the bash source code one top-level command at a time,
+    each command is yielded as soon as bash has parsed it. A script read from a
+    file is never held in memory as a whole, not even with with_linno_info.
+    Bash can only parse one script at a time, no other script can be parsed
+    until the iterator is exhausted or closed.
+
+    :param script: The path to the bash file to parse, or the bash source code
+    as bytes
+    :param with_linno_info: If true, tuples of each command, its source and line
+    numbers are yielded, as returned by bash_to_ast
+    :return: an iterator of the commands
+    """
+    bash = _get_bash()
+
+    if isinstance(script, str):
+        with open(script, "rb") if with_linno_info else nullcontext() as f:
+            slice_lines = _LineReader(f).slice_lines if with_linno_info else None
+            _set_input_file(bash, script)
+            yield from _iter_commands(bash, _build_global_command, slice_lines)
+    else:
+        data = bytes(script)
+        slice_lines = LineIndex(data).slice if with_linno_info else None
+        # bash keeps pointing into buffer while parsing
+        buffer = _set_input_bytes(bash, data)
+        yield from _iter_commands(bash, _build_global_command, slice_lines)
@@ -1,2 +1,4 @@
 from .command import *
 from .flags import *
+from .view import *
+from .words import WordTable, word_table
@@ -1,26 +1,524 @@
 from __future__ import annotations
 
-from typing import Union, Optional
+from typing import Callable, Union, Optional
 from .. import ctypes_bash_command as c_bash
 import ctypes
+import hashlib
+from enum import Enum
 from .flags import *
 from .util import *
+from .words import word_table
 
 
-class WordDesc:
+def _flag_list_view(bits_attribute: str, flag_type: type) -> property:
+    """
+    :param bits_attribute: the name of the attribute the flags are stored in
+    :param flag_type: the flag enum
+    :return: a property that reads and writes the flags as a list, nodes store
+    their flags as a single flag value but used to store lists of them
+    """
+
+    def get(self) -> list:
+        return flag_list_from_int(flag_type, getattr(self, bits_attribute))
+
+    def set(self, flags: Union[list, int]):
+        if not isinstance(flags, int):
+            flags = int_from_flag_list(flags)
+        setattr(self, bits_attribute, flag_bits_from_int(flag_type, flags))
+
+    return property(get, set)
+
+
+def _fingerprint_of(
+    node: Optional["_Node"], digest: Callable[["_Node"], bytes]
+) -> Optional[bytes]:
+    """
+    :param node: a node or None
+    :param digest: gives the fingerprint of a node
+    :return: the fingerprint of the node, or None
+    """
+    return None if node is None else digest(node)
+
+
+def _ordered_fingerprints(
+    nodes: list["_Node"], digest: Callable[["_Node"], bytes]
+) -> tuple[bytes, ...]:
+    """
+    :param nodes: a list of nodes whose order matters
+    :param digest: gives the fingerprint of a node
+    :return: the fingerprints of the nodes
+    """
+    return tuple(digest(node) for node in nodes)
+
+
+def _unordered_fingerprints(
+    nodes: list["_Node"], digest: Callable[["_Node"], bytes]
+) -> tuple[bytes, ...]:
+    """
+    :param nodes: a list of nodes whose order doesn't matter to __eq__
+    :param digest: gives the fingerprint of a node
+    :return: the fingerprints of the nodes, sorted so the order doesn't matter
+    """
+    return tuple(sorted(digest(node) for node in nodes))
+
+
+def _enum_value(value: Union[Enum, int]) -> int:
+    """
+    :param value: an enum member, or the int it is equal to
+    :return: the int
+    """
+    return value.value if isinstance(value, Enum) else value
+
+
+class _Worklist:
+    """
+    the conversions of a tree still to be done. Converting a node converts its
+    fields right away, except for the commands and conditional expressions below
+    it, which can nest arbitrarily deep: an empty result is handed out for each
+    of them and filled in once the worklist gets to it. This keeps how deep a
+    tree can be limited by memory rather than by the recursion limit
+    """
+
+    __slots__ = ("pending", "flatten_connections", "flags_as_int", "session")
+
+    pending: list[tuple]  # the functions filling in results and their arguments
+    # whether _to_json flattens connections into sequences
+    flatten_connections: bool
+    # whether _to_json writes flags as their integer value rather than names
+    flags_as_int: bool
+    # the parse session owning the structs commands are built from, if the
+    # commands are lazy and only read their fields when they are first accessed
+    session: Optional[object]
+
+    def __init__(
+        self,
+        flatten_connections: bool = False,
+        session: Optional[object] = None,
+        flags_as_int: bool = False,
+    ):
+        """
+        :param flatten_connections: whether _to_json flattens connections into
+        sequences, see Connection.flatten
+        :param session: the parse session owning the structs, to build lazy
+        commands, see Command._build
+        :param flags_as_int: whether _to_json writes each set of flags as one int
+        """
+        self.pending = []
+        self.flatten_connections = flatten_connections
+        self.flags_as_int = flags_as_int
+        self.session = session
+
+    def defer(self, fill, *args):
+        """
+        :param fill: the function filling in a result, it is called with args and
+        this worklist
+        :param args: the arguments to call fill with
+        """
+        self.pending.append((fill, args))
+
+    def run(self):
+        """
+        does the deferred conversions, including the ones they defer in turn
+        """
+        pending = self.pending
+        while pending:
+            fill, args = pending.pop()
+            fill(*args, self)
+
+
+def _convert(fill, arg, worklist: Optional[_Worklist]):
+    """
+    :param fill: the method converting a node, called with arg and a worklist
+    :param arg: the struct to convert from, or the empty result to fill in
+    :param worklist: the worklist of the tree being converted, or None to
+    convert the node and everything below it right away
+    :return: arg
+    """
+    if worklist is not None:
+        fill(arg, worklist)
+    else:
+        worklist = _Worklist()
+        fill(arg, worklist)
+        worklist.run()
+    return arg
+
+
+def _child_node(cls: type, c_struct, worklist: Optional[_Worklist]):
+    """
+    :param cls: Command or CondCom
+    :param c_struct: the struct to build the node from
+    :param worklist: the worklist of the tree being built, or None
+    :return: the node, built once the worklist gets to it
+    """
+    if worklist is None:
+        return cls(c_struct)
+    node = cls.__new__(cls)
+    worklist.defer(node._build, c_struct)
+    return node
+
+
+def _child_ctypes(node: "_Node", c_type: type, worklist: Optional[_Worklist]):
+    """
+    :param node: a Command or CondCom
+    :param c_type: the struct the node is converted into
+    :param worklist: the worklist of the tree being converted, or None
+    :return: the struct, filled in once the worklist gets to it
+    """
+    if worklist is None:
+        return node._to_ctypes()
+    c_struct = c_type()
+    worklist.defer(node._build_ctypes, c_struct)
+    return c_struct
+
+
+def _child_json(node: "_Node", worklist: Optional[_Worklist]) -> dict:
+    """
+    :param node: a Command or CondCom
+    :param worklist: the worklist of the tree being converted, or None
+    :return: the dictionary representation of the node, filled in once the
+    worklist gets to it
+    """
+    if worklist is None:
+        return node._to_json()
+    json: dict = {}
+    worklist.defer(node._build_json, json)
+    return json
+
+
+def _child_from_json(cls: type, json: Optional[dict], worklist: Optional[_Worklist]):
+    """
+    :param cls: Command or CondCom
+    :param json: the dictionary representation of the node, or None
+    :param worklist: the worklist of the tree being built, or None
+    :return: the node, built once the worklist gets to it, or None
+    """
+    if json is None:
+        return None
+    if worklist is None:
+        return cls.from_json(json)
+    node = cls.__new__(cls)
+    worklist.defer(node._build_from_json, json)
+    return node
+
+
+def _flags_json(
+    flag_bits: IntFlag, worklist: Optional[_Worklist]
+) -> Union[list[str], int]:
+    """
+    :param flag_bits: the flags of a node
+    :param worklist: the worklist of the tree being converted, or None
+    :return: the names of the flags, or their integer value if the worklist
+    writes flags as ints
+    """
+    if worklist is not None and worklist.flags_as_int:
+        return int(flag_bits)
+    return flag_names_from_int(type(flag_bits), flag_bits)
+
+
+def _nodes(*nodes: Optional["_Node"]) -> list["_Node"]:
+    """
+    :param nodes: nodes or None
+    :return: the nodes that aren't None
+    """
+    return [node for node in nodes if node is not None]
+
+
+def _nodes_equal(node: "_Node", other: object) -> bool:
+    """
+    compares two trees with an explicit stack of the pairs of nodes still to
+    be compared, rather than recursing once per level
+    :param node: the first node
+    :param other: the other node
+    :return: whether the nodes are equal
+    """
+    pairs: list[tuple] = [(node, other)]
+    while pairs:
+        node, other = pairs.pop()
+        if node is other:
+            continue
+        if node is None:
+            return False
+        if not node._equal_fields(other, pairs):
+            return False
+    return True
+
+
+class _FrozenList(list):
+    """
+    the lists of a node once it is fingerprinted, which can't be changed in place
+    """
+
+    __slots__ = ()
+
+    def _frozen(self, *args, **kwargs):
+        raise TypeError(
+            "The lists of a node can't be changed once it is fingerprinted or "
+            "hashed, change a copy of the node instead"
+        )
+
+    append = extend = insert = remove = pop = clear = sort = reverse = _frozen
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _frozen
+
+    def __reduce__(self):
+        # copies and unpickled lists are plain lists that can be changed
+        return list, (list(self),)
+
+
+# the names of the slots of each node class and its bases, filled in as needed
+_SLOT_NAMES: dict[type, tuple[str, ...]] = {}
+
+
+def _slot_names(cls: type) -> tuple[str, ...]:
+    """
+    :param cls: a node class
+    :return: the names of the slots of the class and its bases, but the fingerprint
+    """
+    names = _SLOT_NAMES.get(cls)
+    if names is None:
+        names = _SLOT_NAMES[cls] = tuple(
+            name
+            for base in cls.__mro__
+            for name in base.__dict__.get("__slots__", ())
+            if name != "_fingerprint"
+        )
+    return names
+
+
+def _digest_tree(root: "_Node", known: dict[int, tuple]) -> bytes:
+    """
+    computes the fingerprint of a node bottom-up, with an explicit stack of the
+    nodes below it, without caching it
+    :param root: the node
+    :param known: the fingerprints computed so far of the nodes that had none
+    cached, by the id of the node, as pairs of the node and its fingerprint
+    :return: the fingerprint of the node
+    """
+
+    def digest(node: _Node) -> bytes:
+        fingerprint = node._fingerprint
+        if fingerprint is not None:
+            return fingerprint
+        computed = known.get(id(node))
+        if computed is not None:
+            return computed[1]
+
+        stack: list[_Node] = [node]
+        while stack:
+            top = stack[-1]
+            if id(top) in known:
+                stack.pop()
+                continue
+            children = [
+                child
+                for child in top._child_nodes()
+                if child._fingerprint is None and id(child) not in known
+            ]
+            if children:
+                stack.extend(children)
+                continue
+            stack.pop()
+            # the fields are bytes, str, ints, None and tuples of them,
+            # whose repr is unambiguous
+            fields = repr((type(top).__name__, top._fingerprint_fields(digest)))
+            known[id(top)] = (
+                top,
+                hashlib.blake2b(fields.encode("utf-8"), digest_size=16).digest(),
+            )
+        return known[id(node)][1]
+
+    return digest(root)
+
+
+def _digest(node: "_Node") -> bytes:
+    """
+    :param node: a node
+    :return: the fingerprint of the node, computed without caching it on the node
+    or the nodes below it, so they can still be changed
+    """
+    return _digest_tree(node, {})
+
+
+class _Node:
+    """
+    the base of the node classes, gives each node a structural fingerprint,
+    a 128 bit digest of the fields compared by __eq__. The fingerprint is
+    computed bottom-up the first time it is asked for, by fingerprint or hash,
+    and then cached. From then on the node and the nodes below it are frozen,
+    setting their fields or changing their lists raises an error, so the
+    cached fingerprints are never stale. Deep copies of a node, with
+    copy.deepcopy or pickle, aren't frozen
+    """
+
+    __slots__ = ("_fingerprint",)
+
+    _fingerprint: Optional[bytes]  # None until the node is fingerprinted
+
+    def __new__(cls, *args, **kwargs):
+        # set here rather than in __init__, so nodes created without calling
+        # __init__ when deserializing have it too
+        node = super().__new__(cls)
+        object.__setattr__(node, "_fingerprint", None)
+        return node
+
+    def __setattr__(self, name: str, value: object, _set=object.__setattr__):
+        """
+        sets a field, unless the node is frozen
+        :param name: the name of the field
+        :param value: the value of the field
+        :param _set: object.__setattr__, bound once since every field goes through
+        here
+        """
+        if self._fingerprint is not None:
+            self._frozen(name)
+        _set(self, name, value)
+
+    def __delattr__(self, name: str):
+        """
+        deletes a field, unless the node is frozen
+        :param name: the name of the field
+        """
+        if self._fingerprint is not None:
+            self._frozen(name)
+        object.__delattr__(self, name)
+
+    def _frozen(self, name: str):
+        """
+        :param name: the name of the field being changed
+        """
+        raise AttributeError(
+            f"Can't change {name} of a {type(self).__name__} once it is "
+            "fingerprinted or hashed, change a copy of the node instead"
+        )
+
+    def __getstate__(self) -> dict:
+        """
+        :return: the fields of the node for copy and pickle, without the
+        fingerprint so the copies can be changed
+        """
+        state = {}
+        for name in _slot_names(type(self)):
+            try:
+                value = object.__getattribute__(self, name)
+            except AttributeError:
+                continue
+            state[name] = list(value) if type(value) is _FrozenList else value
+        return state
+
+    def __setstate__(self, state: dict):
+        """
+        :param state: the fields of the node, as __getstate__ returns them
+        """
+        object.__setattr__(self, "_fingerprint", None)
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints, by default the fields in the order of __slots__
+        """
+        fields = []
+        for name in type(self).__slots__:
+            value = getattr(self, name)
+            if isinstance(value, _Node):
+                value = digest(value)
+            elif isinstance(value, list):
+                value = _ordered_fingerprints(value, digest)
+            elif isinstance(value, Enum):
+                value = value.value
+            fields.append(value)
+        return tuple(fields)
+
+    def _child_nodes(self) -> list["_Node"]:
+        """
+        :return: the nodes below this one that can nest arbitrarily deep
+        """
+        return []
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other node
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the nodes are equal, the nodes that can
+        nest arbitrarily deep are added to pairs rather than compared
+        """
+        return self == other
+
+    def fingerprint(self) -> bytes:
+        """
+        :return: the structural fingerprint of the node, nodes that are equal
+        have the same fingerprint. The node and the nodes below it are frozen
+        """
+        fingerprint = self._fingerprint
+        if fingerprint is not None:
+            return fingerprint
+        known: dict[int, tuple] = {}
+        fingerprint = _digest_tree(self, known)
+        for node, node_fingerprint in known.values():
+            node._freeze(node_fingerprint)
+        return fingerprint
+
+    def _freeze(self, fingerprint: bytes):
+        """
+        caches the fingerprint of the node and freezes its lists
+        :param fingerprint: the fingerprint of the node
+        """
+        for name in _slot_names(type(self)):
+            try:
+                value = object.__getattribute__(self, name)
+            except AttributeError:
+                continue
+            if type(value) is list:
+                object.__setattr__(self, name, _FrozenList(value))
+        object.__setattr__(self, "_fingerprint", fingerprint)
+
+    def _fingerprints_differ(self, other: "_Node") -> bool:
+        """
+        :param other: the other node
+        :return: whether the fingerprints of both nodes are cached and differ, in
+        which case the nodes differ. Fingerprints aren't computed here, comparing
+        two nodes once is cheaper without them, and equal fingerprints still leave
+        the fields to be compared
+        """
+        fingerprint = self._fingerprint
+        if fingerprint is None:
+            return False
+        other_fingerprint = other._fingerprint
+        return other_fingerprint is not None and fingerprint != other_fingerprint
+
+
+class WordDesc(_Node):
     """
     describes a word
     """
 
+    __slots__ = ("word", "flag_bits")
+
     word: bytes  # the word
-    flags: list[WordDescFlag]
+    flag_bits: WordDescFlag
+    flags: list[WordDescFlag] = _flag_list_view("flag_bits", WordDescFlag)
 
     def __init__(self, word: c_bash.word_desc):
         """
         :param word: the word description
         """
-        self.word = word.word
-        self.flags = word_desc_flag_list_from_int(word.flags)
+        # equal words share the bytes object of the word table
+        self.word = word_table.intern(word.word)
+        self.flag_bits = flag_bits_from_int(WordDescFlag, word.flags)
+
+    @classmethod
+    def from_json(cls, json: dict) -> WordDesc:
+        """
+        :param json: the dictionary representation of the word description, as
+        _to_json returns it. Words that weren't valid utf-8 were written with
+        replacement characters and can't be read back as they were
+        :return: the word description
+        """
+        word = cls.__new__(cls)
+        word.word = word_table.intern(json["word"].encode("utf-8"))
+        word.flag_bits = flag_bits_from_json(WordDescFlag, json["flags"])
+        return word
 
     def __eq__(self, other: object) -> bool:
         """
@@ -28,21 +526,44 @@ class WordDesc:
         :return: whether the two word descriptions are equal, the
         flags lists need not be in the same order
         """
+        if self is other:
+            return True
         if not isinstance(other, WordDesc):
             return False
+        if self._fingerprints_differ(other):
+            return False
         if self.word != other.word:
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self.flag_bits != other.flag_bits:
             return False
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (self.word, int(self.flag_bits))
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str]]:
         """
+        :param worklist: the worklist of the tree being converted, for how flags
+        are written, if any
         :return: a dictionary representation of the word description
         """
         return {
             "word": self.word.decode("utf-8", errors="replace"),
-            "flags": [x._to_json() for x in self.flags],
+            "flags": _flags_json(self.flag_bits, worklist),
         }
 
     def _to_ctypes(self) -> c_bash.word_desc:
@@ -51,7 +572,7 @@ class WordDesc:
         """
         c_word_desc = c_bash.word_desc()
         c_word_desc.word = self.word
-        c_word_desc.flags = int_from_word_desc_flag_list(self.flags)
+        c_word_desc.flags = self.flag_bits
         return c_word_desc
 
 
@@ -76,19 +597,24 @@ def c_word_list_from_word_desc_list(
     :param word_desc_list: the list of word descriptions
     :return: a pointer to the first word description in the list
     """
-    if len(word_desc_list) == 0:
-        return ctypes.POINTER(c_bash.word_list)()
-    c_word_list = c_bash.word_list()
-    c_word_list.word = ctypes.POINTER(c_bash.word_desc)(word_desc_list[0]._to_ctypes())
-    c_word_list.next = c_word_list_from_word_desc_list(word_desc_list[1:])
-    return ctypes.POINTER(c_bash.word_list)(c_word_list)
-
-
-class RedirecteeUnion:
+    # the list is built from its end, so each cell can point to the one after it
+    # without recursing, each pointer keeps the rest of the list alive
+    c_word_list_head = ctypes.POINTER(c_bash.word_list)()
+    for word_desc in reversed(word_desc_list):
+        c_word_list = c_bash.word_list()
+        c_word_list.word = ctypes.POINTER(c_bash.word_desc)(word_desc._to_ctypes())
+        c_word_list.next = c_word_list_head
+        c_word_list_head = ctypes.POINTER(c_bash.word_list)(c_word_list)
+    return c_word_list_head
+
+
+class RedirecteeUnion(_Node):
     """
     a redirectee, either a file descriptor or a file name
     """
 
+    __slots__ = ("dest", "filename")
+
     # use only if R_DUPLICATING_INPUT or R_DUPLICATING_OUTPUT
     dest: Optional[int]
     # use otherwise
@@ -102,27 +628,68 @@ class RedirecteeUnion:
         self.dest = dest if dest is not None else None
         self.filename = WordDesc(filename) if filename else None
 
+    @classmethod
+    def from_json(cls, json: dict) -> RedirecteeUnion:
+        """
+        :param json: the dictionary representation of the redirectee union, as
+        _to_json returns it
+        :return: the redirectee union
+        """
+        redirectee = cls.__new__(cls)
+        redirectee.dest = json.get("dest")
+        redirectee.filename = (
+            WordDesc.from_json(json["filename"])
+            if json.get("filename") is not None
+            else None
+        )
+        if redirectee.dest is None and redirectee.filename is None:
+            raise Exception("invalid redirectee")
+        return redirectee
+
     def __eq__(self, other: object) -> bool:
         """
         :param other: the other redirectee union
         :return: whether the two redirectee unions are equal
         """
+        if self is other:
+            return True
         if not isinstance(other, RedirecteeUnion):
             return False
+        if self._fingerprints_differ(other):
+            return False
         if self.dest != other.dest:
             return False
         if self.filename != other.filename:
             return False
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
         """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (self.dest, _fingerprint_of(self.filename, digest))
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
+        """
+        :param worklist: the worklist of the tree being converted, for how flags
+        are written, if any
         :return: a dictionary representation of the redirectee union
         """
         if self.dest is not None:
             return {"dest": self.dest}
         elif self.filename is not None:
-            return {"filename": self.filename._to_json()}
+            return {"filename": self.filename._to_json(worklist)}
         else:
             raise Exception("invalid redirectee")
 
@@ -140,14 +707,25 @@ class RedirecteeUnion:
         return c_redirectee
 
 
-class Redirect:
+class Redirect(_Node):
     """
     describes a redirection such as >, >>, <, <<
     """
 
+    __slots__ = (
+        "redirector",
+        "rflag_bits",
+        "flag_bits",
+        "instruction",
+        "redirectee",
+        "here_doc_eof",
+    )
+
     redirector: RedirecteeUnion  # the thing being redirected
-    rflags: list[RedirectFlag]  # flags for redirection
-    flags: list[OFlag]
+    rflag_bits: RedirectFlag  # flags for redirection
+    rflags: list[RedirectFlag] = _flag_list_view("rflag_bits", RedirectFlag)
+    flag_bits: OFlag
+    flags: list[OFlag] = _flag_list_view("flag_bits", OFlag)
     instruction: RInstruction  # the type of redirection
     redirectee: RedirecteeUnion  # the thing being redirected to
     here_doc_eof: Optional[str]  # the word that appeared in the << operator?
@@ -156,15 +734,15 @@ class Redirect:
         """
         :param redirect: the redirect struct
         """
-        self.rflags = redirect_flag_list_from_rflags(redirect.rflags)
-        self.flags = oflag_list_from_int(redirect.flags)
+        self.rflag_bits = flag_bits_from_int(RedirectFlag, redirect.rflags)
+        self.flag_bits = flag_bits_from_int(OFlag, redirect.flags)
         self.instruction = RInstruction(redirect.instruction)
         self.here_doc_eof = (
             redirect.here_doc_eof.decode("utf-8")
             if redirect.here_doc_eof is not None
             else None
         )
-        if RedirectFlag.REDIR_VARASSIGN in self.rflags:
+        if self.rflag_bits & RedirectFlag.REDIR_VARASSIGN:
             self.redirector = RedirecteeUnion(
                 None, redirect.redirector.filename.contents
             )
@@ -183,17 +761,44 @@ class Redirect:
                 None, redirect.redirectee.filename.contents
             )
 
+    @classmethod
+    def from_json(cls, json: dict) -> Redirect:
+        """
+        :param json: the dictionary representation of the redirect, as _to_json
+        returns it. n<&0- is written the same as closing n and is read back as that
+        :return: the redirect
+        """
+        redirect = cls.__new__(cls)
+        redirect.redirector = RedirecteeUnion.from_json(json["redirector"])
+        redirect.rflag_bits = flag_bits_from_json(RedirectFlag, json["rflags"])
+        redirect.flag_bits = flag_bits_from_json(OFlag, json["flags"])
+        redirect.instruction = enum_from_json(RInstruction, json["instruction"])
+        redirect.redirectee = RedirecteeUnion.from_json(json["redirectee"])
+        # closing a file descriptor and moving one, n<&m-, are both written as
+        # "<&-", bash closes with a redirectee of 0 and moves the one given
+        if (
+            redirect.instruction == RInstruction.R_CLOSE_THIS
+            and redirect.redirectee.dest
+        ):
+            redirect.instruction = RInstruction.R_MOVE_INPUT
+        redirect.here_doc_eof = json["here_doc_eof"]
+        return redirect
+
     def __eq__(self, other: object) -> bool:
         """
         :param other: the other redirect struct
         :return: whether the two redirect structs are equal,
         the flags lists need not be in the same order
         """
+        if self is other:
+            return True
         if not isinstance(other, Redirect):
             return False
-        if not list_same_elements(self.rflags, other.rflags):
+        if self._fingerprints_differ(other):
+            return False
+        if self.rflag_bits != other.rflag_bits:
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self.flag_bits != other.flag_bits:
             return False
         if self.instruction != other.instruction:
             return False
@@ -205,16 +810,42 @@ class Redirect:
             return False
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list, None]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
         """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.rflag_bits),
+            int(self.flag_bits),
+            _enum_value(self.instruction),
+            self.here_doc_eof,
+            _fingerprint_of(self.redirector, digest),
+            _fingerprint_of(self.redirectee, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list, None]]:
+        """
+        :param worklist: the worklist of the tree being converted, for how flags
+        are written, if any
         :return: a dictionary representation of the redirect struct
         """
         return {
-            "redirector": self.redirector._to_json(),
-            "rflags": [x._to_json() for x in self.rflags],
-            "flags": [x._to_json() for x in self.flags],
+            "redirector": self.redirector._to_json(worklist),
+            "rflags": _flags_json(self.rflag_bits, worklist),
+            "flags": _flags_json(self.flag_bits, worklist),
             "instruction": self.instruction._to_json(),
-            "redirectee": self.redirectee._to_json(),
+            "redirectee": self.redirectee._to_json(worklist),
             "here_doc_eof": self.here_doc_eof,
         }
 
@@ -232,8 +863,8 @@ class Redirect:
             )
         else:
             raise Exception("invalid redirector")
-        c_redirect.rflags = int_from_redirect_flag_list(self.rflags)
-        c_redirect.flags = int_from_oflag_list(self.flags)
+        c_redirect.rflags = self.rflag_bits
+        c_redirect.flags = self.flag_bits
         c_redirect.instruction = self.instruction.value
         c_redirect.redirectee = c_bash.REDIRECTEE()
         if self.redirectee.dest is not None:
@@ -271,48 +902,66 @@ def c_redirect_list_from_redirect_list(
     :param redirect_list: the list of redirects
     :return: a pointer to the first redirect in the list
     """
-    if len(redirect_list) == 0:
-        return ctypes.POINTER(c_bash.redirect)()
-    c_redirect = redirect_list[0]._to_ctypes()
-    c_redirect.next = c_redirect_list_from_redirect_list(redirect_list[1:])
-    return ctypes.POINTER(c_bash.redirect)(c_redirect)
+    # built from the end like c_word_list_from_word_desc_list
+    c_redirect_head = ctypes.POINTER(c_bash.redirect)()
+    for redirect in reversed(redirect_list):
+        c_redirect = redirect._to_ctypes()
+        c_redirect.next = c_redirect_head
+        c_redirect_head = ctypes.POINTER(c_bash.redirect)(c_redirect)
+    return c_redirect_head
 
 
 def c_redirect_from_redirect_list(
     redirect_list: list[Redirect],
 ) -> ctypes._Pointer[c_bash.redirect]:
     """
+    the same as c_redirect_list_from_redirect_list, kept for existing callers
     :param redirect_list: the list of redirects
     :return: a pointer to the first redirect in the list
     """
-    if len(redirect_list) == 0:
-        return ctypes.POINTER(c_bash.redirect)()
-    c_redirect = redirect_list[0]._to_ctypes()
-    c_redirect.next = c_redirect_from_redirect_list(redirect_list[1:])
-    return ctypes.POINTER(c_bash.redirect)(c_redirect)
+    return c_redirect_list_from_redirect_list(redirect_list)
 
 
-class ForCom:
+class ForCom(_Node):
     """
     a for command class
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "line", "name", "map_list", "action")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     line: int  # line number the command is on?
     name: WordDesc  # the variable name to get mapped over?
     map_list: list[WordDesc]  # the list of words to map over
     action: "Command"  # the action to take for each word in the map list
 
-    def __init__(self, for_c: c_bash.for_com):
+    def __init__(self, for_c: c_bash.for_com, worklist: Optional[_Worklist] = None):
         """
         :param for_c: the for command struct
-
+        :param worklist: the worklist building the commands below, if any
         """
-        self.flags = command_flag_list_from_int(for_c.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, for_c.flags)
         self.line = for_c.line
         self.name = WordDesc(for_c.name.contents)
         self.map_list = word_desc_list_from_word_list(for_c.map_list)
-        self.action = Command(for_c.action.contents)
+        self.action = _child_node(Command, for_c.action.contents, worklist)
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> ForCom:
+        """
+        :param json: the dictionary representation of the for command, as _to_json
+        returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the for command
+        """
+        for_c = cls.__new__(cls)
+        for_c.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        for_c.line = json["line"]
+        for_c.name = WordDesc.from_json(json["name"])
+        for_c.map_list = [WordDesc.from_json(x) for x in json["map_list"]]
+        for_c.action = _child_from_json(Command, json["action"], worklist)
+        return for_c
 
     def __eq__(self, other: object) -> bool:
         """
@@ -320,59 +969,127 @@ class ForCom:
         :return: whether the two for commands are equal, the
         flags lists need not be in the same order
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other for command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two for commands are equal, leaving
+        the actions to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, ForCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
             return False
-        if self.name != other.name:
+        if self.flag_bits != other.flag_bits:
             return False
-        if not list_same_elements(self.map_list, other.map_list):
+        if self.name != other.name:
             return False
-        if self.action != other.action:
+        if not list_same_elements(self.map_list, other.map_list, _digest):
             return False
+        pairs.append((self.action, other.action))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
         """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
+        """
+        :return: the action
+        """
+        return [self.action]
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            _fingerprint_of(self.name, digest),
+            _unordered_fingerprints(self.map_list, digest),
+            _fingerprint_of(self.action, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
+        """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the for command
         """
         return {
-            "flags": self.flags,
+            "flags": _flags_json(self.flag_bits, worklist),
             "line": self.line,
-            "name": self.name._to_json(),
-            "map_list": [x._to_json() for x in self.map_list],
-            "action": self.action._to_json(),
+            "name": self.name._to_json(worklist),
+            "map_list": [x._to_json(worklist) for x in self.map_list],
+            "action": _child_json(self.action, worklist),
         }
 
-    def _to_ctypes(self) -> c_bash.for_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.for_com:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c for_com struct representation of this for command
         """
         c_for = c_bash.for_com()
-        c_for.flags = int_from_command_flag_list(self.flags)
+        c_for.flags = self.flag_bits
         c_for.line = self.line
         c_for.name = ctypes.POINTER(c_bash.word_desc)(self.name._to_ctypes())
         c_for.map_list = c_word_list_from_word_desc_list(self.map_list)
-        c_for.action = ctypes.POINTER(c_bash.command)(self.action._to_ctypes())
+        c_for.action = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.action, c_bash.command, worklist)
+        )
         return c_for
 
 
-class Pattern:
+class Pattern(_Node):
     """
     represents a pattern in a case command
     """
 
+    __slots__ = ("patterns", "action", "flag_bits")
+
     patterns: list[WordDesc]  # the list of patterns to match against
     action: Optional["Command"]  # the action to take if the pattern matches
-    flags: list[PatternFlag]
+    flag_bits: PatternFlag
+    flags: list[PatternFlag] = _flag_list_view("flag_bits", PatternFlag)
 
-    def __init__(self, pattern: c_bash.pattern_list):
+    def __init__(
+        self, pattern: c_bash.pattern_list, worklist: Optional[_Worklist] = None
+    ):
         """
         :param pattern: the pattern struct
+        :param worklist: the worklist building the commands below, if any
         """
         self.patterns = word_desc_list_from_word_list(pattern.patterns)
-        self.action = Command(pattern.action.contents) if pattern.action else None
-        self.flags = pattern_flag_list_from_int(pattern.flags)
+        self.action = (
+            _child_node(Command, pattern.action.contents, worklist)
+            if pattern.action
+            else None
+        )
+        self.flag_bits = flag_bits_from_int(PatternFlag, pattern.flags)
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> Pattern:
+        """
+        :param json: the dictionary representation of the pattern, as _to_json
+        returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the pattern
+        """
+        pattern = cls.__new__(cls)
+        pattern.patterns = [WordDesc.from_json(x) for x in json["patterns"]]
+        pattern.action = _child_from_json(Command, json["action"], worklist)
+        pattern.flag_bits = flag_bits_from_json(PatternFlag, json["flags"])
+        return pattern
 
     def __eq__(self, other: object) -> bool:
         """
@@ -380,87 +1097,157 @@ class Pattern:
         :return: whether the two patterns are equal, the
         flags lists need not be in the same order
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other pattern
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two patterns are equal, leaving
+        the actions to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, Pattern):
             return False
-        if not list_same_elements(self.patterns, other.patterns):
+        if self._fingerprints_differ(other):
             return False
-        if self.action != other.action:
+        if not list_same_elements(self.patterns, other.patterns, _digest):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self.flag_bits != other.flag_bits:
             return False
+        pairs.append((self.action, other.action))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, dict, list, None]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
         """
+        :return: the action, if any
+        """
+        return _nodes(self.action)
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            _unordered_fingerprints(self.patterns, digest),
+            _fingerprint_of(self.action, digest),
+            int(self.flag_bits),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, dict, list, None]]:
+        """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the pattern
         """
         return {
-            "patterns": [x._to_json() for x in self.patterns],
-            "action": self.action._to_json() if self.action is not None else None,
-            "flags": self.flags,
+            "patterns": [x._to_json(worklist) for x in self.patterns],
+            "action": (
+                _child_json(self.action, worklist) if self.action is not None else None
+            ),
+            "flags": _flags_json(self.flag_bits, worklist),
         }
 
-    def _to_ctypes(self) -> c_bash.pattern_list:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.pattern_list:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c pattern_list struct representation of this pattern
         """
         c_pattern = c_bash.pattern_list()
         c_pattern.patterns = c_word_list_from_word_desc_list(self.patterns)
         c_pattern.action = (
-            ctypes.POINTER(c_bash.command)(self.action._to_ctypes())
+            ctypes.POINTER(c_bash.command)(
+                _child_ctypes(self.action, c_bash.command, worklist)
+            )
             if self.action is not None
             else None
         )
-        c_pattern.flags = int_from_pattern_flag_list(self.flags)
+        c_pattern.flags = self.flag_bits
         return c_pattern
 
 
 def pattern_list_from_pattern_list(
     pattern: ctypes._Pointer[c_bash.pattern_list],
+    worklist: Optional[_Worklist] = None,
 ) -> list[Pattern]:
     """
     :param pattern: the pattern list, as they are represented in c
+    :param worklist: the worklist building the commands below, if any
     :return: a list of patterns as they are represented in python
     """
     pattern_list = []
     while pattern:
-        pattern_list.append(Pattern(pattern.contents))
+        pattern_list.append(Pattern(pattern.contents, worklist))
         pattern = pattern.contents.next
     return pattern_list
 
 
 def c_pattern_list_from_pattern_list(
     pattern_list: list[Pattern],
+    worklist: Optional[_Worklist] = None,
 ) -> ctypes._Pointer[c_bash.pattern_list]:
     """
     :param pattern_list: the list of patterns, as they are represented in python
+    :param worklist: the worklist converting the commands below, if any
     :return: a pointer to the first pattern in the list, as they are represented in c
     """
-    if len(pattern_list) == 0:
-        return ctypes.POINTER(c_bash.pattern_list)()
-    c_pattern = pattern_list[0]._to_ctypes()
-    c_pattern.next = c_pattern_list_from_pattern_list(pattern_list[1:])
-    return ctypes.POINTER(c_bash.pattern_list)(c_pattern)
+    # built from the end like c_word_list_from_word_desc_list
+    c_pattern_head = ctypes.POINTER(c_bash.pattern_list)()
+    for pattern in reversed(pattern_list):
+        c_pattern = pattern._to_ctypes(worklist)
+        c_pattern.next = c_pattern_head
+        c_pattern_head = ctypes.POINTER(c_bash.pattern_list)(c_pattern)
+    return c_pattern_head
 
 
-class CaseCom:
+class CaseCom(_Node):
     """
     a case command class
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "line", "word", "clauses")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     line: int  # line number the command is on?
     word: WordDesc  # the thing to match against
     clauses: list[Pattern]  # the list of patterns to match against
 
-    def __init__(self, case_c: c_bash.case_com):
+    def __init__(self, case_c: c_bash.case_com, worklist: Optional[_Worklist] = None):
         """
         :param case_c: the case command struct
+        :param worklist: the worklist building the commands below, if any
         """
-        self.flags = command_flag_list_from_int(case_c.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, case_c.flags)
         self.line = case_c.line
         self.word = WordDesc(case_c.word.contents)
-        self.clauses = pattern_list_from_pattern_list(case_c.clauses)
+        self.clauses = pattern_list_from_pattern_list(case_c.clauses, worklist)
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> CaseCom:
+        """
+        :param json: the dictionary representation of the case command, as
+        _to_json returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the case command
+        """
+        case_c = cls.__new__(cls)
+        case_c.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        case_c.line = json["line"]
+        case_c.word = WordDesc.from_json(json["word"])
+        case_c.clauses = [Pattern.from_json(x, worklist) for x in json["clauses"]]
+        return case_c
 
     def __eq__(self, other: object) -> bool:
         """
@@ -468,55 +1255,127 @@ class CaseCom:
         :return: whether the two case commands are equal, the
         flags lists need not be in the same order
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other case command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two case commands are equal
+        """
+        if self is other:
+            return True
         if not isinstance(other, CaseCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
             return False
-        if self.word != other.word:
+        if self.flag_bits != other.flag_bits:
             return False
-        if not list_same_elements(self.clauses, other.clauses):
+        if self.word != other.word:
             return False
+        # the clauses need not be in the same order, comparing them with
+        # list_same_elements would recurse into their actions, so each clause is
+        # paired with a clause of the other command with the same fingerprint,
+        # computed without caching it, and the pairs are compared from pairs
+        if len(self.clauses) != len(other.clauses):
+            return False
+        known: dict[int, tuple] = {}
+        by_fingerprint: dict[bytes, list[Pattern]] = {}
+        for clause in other.clauses:
+            by_fingerprint.setdefault(_digest_tree(clause, known), []).append(clause)
+        for clause in self.clauses:
+            matches = by_fingerprint.get(_digest_tree(clause, known))
+            if not matches:
+                return False
+            pairs.append((clause, matches.pop()))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
+        """
+        :return: the clauses
         """
+        return self.clauses
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            _fingerprint_of(self.word, digest),
+            _unordered_fingerprints(self.clauses, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
+        """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the case command
         """
         return {
-            "flags": self.flags,
+            "flags": _flags_json(self.flag_bits, worklist),
             "line": self.line,
-            "word": self.word._to_json(),
-            "clauses": [x._to_json() for x in self.clauses],
+            "word": self.word._to_json(worklist),
+            "clauses": [x._to_json(worklist) for x in self.clauses],
         }
 
-    def _to_ctypes(self) -> c_bash.case_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.case_com:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c case_com struct representation of this case command
         """
         c_case = c_bash.case_com()
-        c_case.flags = int_from_command_flag_list(self.flags)
+        c_case.flags = self.flag_bits
         c_case.line = self.line
         c_case.word = ctypes.POINTER(c_bash.word_desc)(self.word._to_ctypes())
-        c_case.clauses = c_pattern_list_from_pattern_list(self.clauses)
+        c_case.clauses = c_pattern_list_from_pattern_list(self.clauses, worklist)
         return c_case
 
 
-class WhileCom:
+class WhileCom(_Node):
     """
     a while command class
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "test", "action")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     test: "Command"  # the thing to test
     action: "Command"  # the action to take while the test is true
 
-    def __init__(self, while_c: c_bash.while_com):
+    def __init__(self, while_c: c_bash.while_com, worklist: Optional[_Worklist] = None):
         """
         :param while_c: the while command struct
+        :param worklist: the worklist building the commands below, if any
         """
-        self.flags = command_flag_list_from_int(while_c.flags)
-        self.test = Command(while_c.test.contents)
-        self.action = Command(while_c.action.contents)
+        self.flag_bits = flag_bits_from_int(CommandFlag, while_c.flags)
+        self.test = _child_node(Command, while_c.test.contents, worklist)
+        self.action = _child_node(Command, while_c.action.contents, worklist)
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> WhileCom:
+        """
+        :param json: the dictionary representation of the while command, as
+        _to_json returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the while command
+        """
+        while_c = cls.__new__(cls)
+        while_c.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        while_c.test = _child_from_json(Command, json["test"], worklist)
+        while_c.action = _child_from_json(Command, json["action"], worklist)
+        return while_c
 
     def __eq__(self, other: object) -> bool:
         """
@@ -524,170 +1383,590 @@ class WhileCom:
         :return: whether the two while commands are equal, the
         flags lists need not be in the same order
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other while command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two while commands are equal, leaving
+        the tests and actions to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, WhileCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
             return False
-        if self.test != other.test:
-            return False
-        if self.action != other.action:
+        if self.flag_bits != other.flag_bits:
             return False
+        pairs.append((self.test, other.test))
+        pairs.append((self.action, other.action))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
+        """
+        :return: the test and the action
+        """
+        return [self.test, self.action]
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
         """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            _fingerprint_of(self.test, digest),
+            _fingerprint_of(self.action, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
+        """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the while command
         """
         return {
-            "flags": self.flags,
-            "test": self.test._to_json(),
-            "action": self.action._to_json(),
+            "flags": _flags_json(self.flag_bits, worklist),
+            "test": _child_json(self.test, worklist),
+            "action": _child_json(self.action, worklist),
         }
 
-    def _to_ctypes(self) -> c_bash.while_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.while_com:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c while_com struct representation of this while command
         """
         c_while = c_bash.while_com()
-        c_while.flags = int_from_command_flag_list(self.flags)
-        c_while.test = ctypes.POINTER(c_bash.command)(self.test._to_ctypes())
-        c_while.action = ctypes.POINTER(c_bash.command)(self.action._to_ctypes())
+        c_while.flags = self.flag_bits
+        c_while.test = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.test, c_bash.command, worklist)
+        )
+        c_while.action = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.action, c_bash.command, worklist)
+        )
         return c_while
 
 
-class IfCom:
+class IfCom(_Node):
     """
     an if command class
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "test", "true_case", "false_case")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     test: "Command"  # the thing to test
     true_case: "Command"  # the action to take if the test is true
     false_case: Optional["Command"]  # the action to take if the test is false
 
-    def __init__(self, if_c: c_bash.if_com):
+    def __init__(self, if_c: c_bash.if_com, worklist: Optional[_Worklist] = None):
         """
         :param if_c: the if command struct
+        :param worklist: the worklist building the commands below, if any
+        """
+        self.flag_bits = flag_bits_from_int(CommandFlag, if_c.flags)
+        self.test = _child_node(Command, if_c.test.contents, worklist)
+        self.true_case = _child_node(Command, if_c.true_case.contents, worklist)
+        self.false_case = (
+            _child_node(Command, if_c.false_case.contents, worklist)
+            if if_c.false_case
+            else None
+        )
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> IfCom:
+        """
+        :param json: the dictionary representation of the if command, as _to_json
+        returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the if command
         """
-        self.flags = command_flag_list_from_int(if_c.flags)
-        self.test = Command(if_c.test.contents)
-        self.true_case = Command(if_c.true_case.contents)
-        self.false_case = Command(if_c.false_case.contents) if if_c.false_case else None
+        if_c = cls.__new__(cls)
+        if_c.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        if_c.test = _child_from_json(Command, json["test"], worklist)
+        if_c.true_case = _child_from_json(Command, json["true_case"], worklist)
+        if_c.false_case = _child_from_json(Command, json["false_case"], worklist)
+        return if_c
 
     def __eq__(self, other: object) -> bool:
         """
         :param other: the other if command
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other if command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two if commands are equal, leaving
+        the tests and cases to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, IfCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
-            return False
-        if self.test != other.test:
-            return False
-        if self.true_case != other.true_case:
+        if self._fingerprints_differ(other):
             return False
-        if self.false_case != other.false_case:
+        if self.flag_bits != other.flag_bits:
             return False
+        pairs.append((self.test, other.test))
+        pairs.append((self.true_case, other.true_case))
+        pairs.append((self.false_case, other.false_case))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list, None]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
+        """
+        :return: the test, the true case and the false case, if any
         """
+        return _nodes(self.test, self.true_case, self.false_case)
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            _fingerprint_of(self.test, digest),
+            _fingerprint_of(self.true_case, digest),
+            _fingerprint_of(self.false_case, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list, None]]:
+        """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the if command
         """
         return {
-            "flags": self.flags,
-            "test": self.test._to_json(),
-            "true_case": self.true_case._to_json(),
+            "flags": _flags_json(self.flag_bits, worklist),
+            "test": _child_json(self.test, worklist),
+            "true_case": _child_json(self.true_case, worklist),
             "false_case": (
-                self.false_case._to_json() if self.false_case is not None else None
+                _child_json(self.false_case, worklist)
+                if self.false_case is not None
+                else None
             ),
         }
 
-    def _to_ctypes(self) -> c_bash.if_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.if_com:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c if_com struct representation of this if command
         """
         c_if = c_bash.if_com()
-        c_if.flags = int_from_command_flag_list(self.flags)
-        c_if.test = ctypes.POINTER(c_bash.command)(self.test._to_ctypes())
-        c_if.true_case = ctypes.POINTER(c_bash.command)(self.true_case._to_ctypes())
+        c_if.flags = self.flag_bits
+        c_if.test = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.test, c_bash.command, worklist)
+        )
+        c_if.true_case = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.true_case, c_bash.command, worklist)
+        )
         c_if.false_case = (
-            ctypes.POINTER(c_bash.command)(self.false_case._to_ctypes())
+            ctypes.POINTER(c_bash.command)(
+                _child_ctypes(self.false_case, c_bash.command, worklist)
+            )
             if self.false_case is not None
             else None
         )
         return c_if
 
 
-class Connection:
+class Connection(_Node):
     """
     represents connections
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "first", "second", "connector")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     first: "Command"  # the first command to run
     second: Optional["Command"]  # the second command to run
     connector: ConnectionType  # the type of connection
 
-    def __init__(self, connection: c_bash.connection):
+    def __init__(
+        self, connection: c_bash.connection, worklist: Optional[_Worklist] = None
+    ):
         """
         :param connection: the connection struct
+        :param worklist: the worklist building the commands below, if any
         """
-        self.flags = command_flag_list_from_int(connection.ignore)
-        self.first = Command(connection.first.contents)
-        self.second = Command(connection.second.contents) if connection.second else None
+        self.flag_bits = flag_bits_from_int(CommandFlag, connection.ignore)
+        self.first = _child_node(Command, connection.first.contents, worklist)
+        self.second = (
+            _child_node(Command, connection.second.contents, worklist)
+            if connection.second
+            else None
+        )
         self.connector = ConnectionType(connection.connector)
 
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> Connection:
+        """
+        :param json: the dictionary representation of the connection, as _to_json
+        returns it, or of the sequence it was flattened into
+        :param worklist: the worklist building the commands below, if any
+        :return: the connection
+        """
+        if "commands" in json:
+            return Sequence.from_json(json, worklist).to_connection()
+        connection = cls.__new__(cls)
+        connection.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        connection.first = _child_from_json(Command, json["first"], worklist)
+        connection.second = _child_from_json(Command, json["second"], worklist)
+        connection.connector = enum_from_json(ConnectionType, json["connector"])
+        return connection
+
     def __eq__(self, other: object) -> bool:
         """
         :param other: the other connection
         :return: whether the two connections are equal
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other connection
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two connections are equal, leaving
+        the commands to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, Connection):
             return False
-        if not list_same_elements(self.flags, other.flags):
-            return False
-        if self.first != other.first:
+        if self._fingerprints_differ(other):
             return False
-        if self.second != other.second:
+        if self.flag_bits != other.flag_bits:
             return False
         if self.connector != other.connector:
             return False
+        pairs.append((self.first, other.first))
+        pairs.append((self.second, other.second))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list, None]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
         """
-        :return: a dictionary representation of the connection
+        :return: the first and the second command, if any
         """
+        return _nodes(self.first, self.second)
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            _fingerprint_of(self.first, digest),
+            _fingerprint_of(self.second, digest),
+            _enum_value(self.connector),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list, None]]:
+        """
+        :param worklist: the worklist converting the commands below, if any
+        :return: a dictionary representation of the connection, or of the
+        sequence it flattens into if the worklist flattens connections
+        """
+        if worklist is not None and worklist.flatten_connections:
+            return self.flatten()._to_json(worklist)
         return {
-            "flags": [x._to_json() for x in self.flags],
-            "first": self.first._to_json(),
-            "second": self.second._to_json() if self.second is not None else None,
+            "flags": _flags_json(self.flag_bits, worklist),
+            "first": _child_json(self.first, worklist),
+            "second": (
+                _child_json(self.second, worklist) if self.second is not None else None
+            ),
             "connector": self.connector._to_json(),  # todo: figure out what this int means
         }
 
-    def _to_ctypes(self) -> c_bash.connection:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.connection:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c connection struct representation of this connection
         """
         c_connection = c_bash.connection()
-        c_connection.ignore = int_from_command_flag_list(self.flags)
-        c_connection.first = ctypes.POINTER(c_bash.command)(self.first._to_ctypes())
+        c_connection.ignore = self.flag_bits
+        c_connection.first = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.first, c_bash.command, worklist)
+        )
         c_connection.second = (
-            ctypes.POINTER(c_bash.command)(self.second._to_ctypes())
+            ctypes.POINTER(c_bash.command)(
+                _child_ctypes(self.second, c_bash.command, worklist)
+            )
             if self.second is not None
             else None
         )
         c_connection.connector = self.connector.value
         return c_connection
 
+    def flatten(self) -> "Sequence":
+        """
+        flattens the chain of connections this connection is the top of, such
+        as a; b; c, into a sequence of commands and the connectors between them.
+        Only the connections bash's parser nests on the same side are flattened,
+        the left for ; & newline && and ||, the right for |, and only those
+        whose connector has the same precedence and whose command has no flags
+        or redirections, so Sequence.to_connection gives back an equal tree.
+        The other connections are left as commands of the sequence
+        :return: the sequence
+        """
+        precedence = _CONNECTOR_PRECEDENCE[self.connector]
+        commands: list[Command] = []
+        connectors: list[ConnectionType] = []
+        connection = self
+        if self.connector in _RIGHT_NESTED_CONNECTORS:
+            # a | (b | c), walk down the second commands
+            while True:
+                commands.append(connection.first)
+                connectors.append(connection.connector)
+                second = connection.second
+                if _nested_connection(second, precedence, False):
+                    connection = second.value.node
+                    continue
+                if second is not None:
+                    commands.append(second)
+                break
+        else:
+            # (a; b); c, walk down the first commands, from the last command
+            while True:
+                if connection.second is not None:
+                    commands.append(connection.second)
+                connectors.append(connection.connector)
+                first = connection.first
+                # a connection without a second command can only end a sequence
+                if _nested_connection(first, precedence, True):
+                    connection = first.value.node
+                    continue
+                commands.append(first)
+                break
+            commands.reverse()
+            connectors.reverse()
+        return Sequence(commands, connectors, self.flag_bits)
+
+
+# connectors of the same precedence are flattened into the same sequence
+_CONNECTOR_PRECEDENCE = {
+    ConnectionType.SEMICOLON: 0,
+    ConnectionType.NEWLINE: 0,
+    ConnectionType.AMPERSAND: 0,
+    ConnectionType.AND_AND: 1,
+    ConnectionType.OR_OR: 1,
+    ConnectionType.PIPE: 2,
+}
+
+# the connectors bash's parser nests to the right, the others nest to the left
+_RIGHT_NESTED_CONNECTORS = (ConnectionType.PIPE,)
+
+
+def _nested_connection(
+    command: Optional["Command"], precedence: int, needs_second: bool
+) -> bool:
+    """
+    :param command: a command below a connection, or None
+    :param precedence: the precedence of the connector of the connection
+    :param needs_second: whether the connection of the command must have a
+    second command
+    :return: whether the command is a connection that can be flattened into the
+    same sequence, and rebuilt by Sequence.to_connection as it was
+    """
+    if command is None or command.type != CommandType.CM_CONNECTION:
+        return False
+    if command.flag_bits or command.redirects:
+        return False
+    connection = command.value.node
+    if connection.flag_bits:
+        return False
+    if needs_second and connection.second is None:
+        return False
+    return _CONNECTOR_PRECEDENCE[connection.connector] == precedence
+
+
+class Sequence:
+    """
+    a flat view of a chain of connections, made by Connection.flatten
+    """
+
+    __slots__ = ("commands", "connectors", "flag_bits")
+
+    commands: list["Command"]  # the commands, in order
+    # the connector after each command but the last, the last command is
+    # followed by one too if the sequence ends in a connector, such as a; b &
+    connectors: list[ConnectionType]
+    flag_bits: CommandFlag  # the flags of the top connection
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
+
+    def __init__(
+        self,
+        commands: list["Command"],
+        connectors: list[ConnectionType],
+        flag_bits: Union[CommandFlag, int] = 0,
+    ):
+        """
+        :param commands: the commands, in order
+        :param connectors: the connectors after the commands
+        :param flag_bits: the flags of the top connection
+        """
+        if len(connectors) not in (len(commands) - 1, len(commands)) or not connectors:
+            raise ValueError(
+                f"A sequence of {len(commands)} commands can't have "
+                f"{len(connectors)} connectors"
+            )
+        self.commands = commands
+        self.connectors = connectors
+        self.flag_bits = flag_bits_from_int(CommandFlag, int(flag_bits))
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> Sequence:
+        """
+        :param json: the dictionary representation of the sequence, as _to_json
+        returns it
+        :param worklist: the worklist building the commands, if any
+        :return: the sequence
+        """
+        return cls(
+            [_child_from_json(Command, x, worklist) for x in json["commands"]],
+            [enum_from_json(ConnectionType, x) for x in json["connectors"]],
+            flag_bits_from_json(CommandFlag, json["flags"]),
+        )
+
+    def __len__(self) -> int:
+        """
+        :return: the number of commands
+        """
+        return len(self.commands)
+
+    def __iter__(self):
+        """
+        :return: an iterator over the commands
+        """
+        return iter(self.commands)
+
+    def to_connection(self) -> Connection:
+        """
+        nests the commands back into connections the way bash's parser does,
+        the inverse of Connection.flatten
+        :return: the top connection
+        """
+        commands = self.commands
+        connectors = self.connectors
+        # the commands after each connector, None after one ending the sequence
+        seconds: list[Optional[Command]] = list(commands[1:])
+        if len(connectors) == len(commands):
+            seconds.append(None)
+
+        last = len(connectors) - 1
+        if connectors[0] in _RIGHT_NESTED_CONNECTORS:
+            # built from the end, a | (b | c)
+            connection = _new_connection(
+                commands[last], seconds[last], connectors[last]
+            )
+            for i in range(last - 1, -1, -1):
+                connection = _new_connection(
+                    commands[i], _connection_command(connection), connectors[i]
+                )
+        else:
+            # built from the start, (a; b); c
+            connection = _new_connection(commands[0], seconds[0], connectors[0])
+            for i in range(1, last + 1):
+                connection = _new_connection(
+                    _connection_command(connection), seconds[i], connectors[i]
+                )
+        connection.flag_bits = self.flag_bits
+        return connection
+
+    def to_command(self) -> "Command":
+        """
+        :return: a command running the top connection, without flags or redirections
+        """
+        return _connection_command(self.to_connection())
 
-class SimpleCom:
+    def _to_json(self, worklist: Optional[_Worklist] = None) -> dict[str, list]:
+        """
+        :param worklist: the worklist converting the commands, if any
+        :return: a dictionary representation of the sequence
+        """
+        return {
+            "flags": _flags_json(self.flag_bits, worklist),
+            "commands": [_child_json(x, worklist) for x in self.commands],
+            "connectors": [x._to_json() for x in self.connectors],
+        }
+
+
+def _new_connection(
+    first: "Command", second: Optional["Command"], connector: ConnectionType
+) -> Connection:
+    """
+    :param first: the first command
+    :param second: the second command, or None
+    :param connector: the connector
+    :return: a connection without flags
+    """
+    connection = Connection.__new__(Connection)
+    connection.flag_bits = flag_bits_from_int(CommandFlag, 0)
+    connection.first = first
+    connection.second = second
+    connection.connector = connector
+    return connection
+
+
+def _connection_command(connection: Connection) -> "Command":
+    """
+    :param connection: a connection
+    :return: a command running the connection, without flags or redirections
+    """
+    value = ValueUnion.__new__(ValueUnion)
+    value.kind = "connection"
+    value.node = connection
+    command = Command.__new__(Command)
+    command.type = CommandType.CM_CONNECTION
+    command.flag_bits = flag_bits_from_int(CommandFlag, 0)
+    command.redirects = []
+    command.value = value
+    return command
+
+
+class SimpleCom(_Node):
     """
     a simple command class
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "line", "words", "redirects")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     line: int  # line number the command is on
     words: list[WordDesc]  # program name, arguments, variable assignments, etc
     redirects: list[Redirect]  # redirections
@@ -696,185 +1975,370 @@ class SimpleCom:
         """
         :param simple: the simple command struct
         """
-        self.flags = command_flag_list_from_int(simple.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, simple.flags)
         self.line = simple.line
         self.words = word_desc_list_from_word_list(simple.words)
         self.redirects = redirect_list_from_redirect(simple.redirects)
 
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> SimpleCom:
+        """
+        :param json: the dictionary representation of the simple command, as
+        _to_json returns it
+        :param worklist: unused, simple commands have no commands below them
+        :return: the simple command
+        """
+        simple = cls.__new__(cls)
+        simple.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        simple.line = json["line"]
+        simple.words = [WordDesc.from_json(x) for x in json["words"]]
+        simple.redirects = [Redirect.from_json(x) for x in json["redirects"]]
+        return simple
+
     def __eq__(self, other: object) -> bool:
         """
         :param other: the other simple command
         :return: whether the two simple commands are equal, the
         """
+        if self is other:
+            return True
         if not isinstance(other, SimpleCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
+            return False
+        if self.flag_bits != other.flag_bits:
             return False
-        if not list_same_elements(self.words, other.words):
+        if not list_same_elements(self.words, other.words, _digest):
             return False
-        if not list_same_elements(self.redirects, other.redirects):
+        if not list_same_elements(self.redirects, other.redirects, _digest):
             return False
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            _unordered_fingerprints(self.words, digest),
+            _unordered_fingerprints(self.redirects, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
         """
+        :param worklist: the worklist of the tree being converted, for how flags
+        are written, if any
         :return: a dictionary representation of the simple command
         """
         return {
-            "flags": [x._to_json() for x in self.flags],
+            "flags": _flags_json(self.flag_bits, worklist),
             "line": self.line,
-            "words": [x._to_json() for x in self.words],
-            "redirects": [x._to_json() for x in self.redirects],
+            "words": [x._to_json(worklist) for x in self.words],
+            "redirects": [x._to_json(worklist) for x in self.redirects],
         }
 
-    def _to_ctypes(self) -> c_bash.simple_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.simple_com:
         """
+        :param worklist: unused, simple commands have no commands below them
         :return: the c simple_com struct representation of this simple command
         """
         c_simple = c_bash.simple_com()
-        c_simple.flags = int_from_command_flag_list(self.flags)
+        c_simple.flags = self.flag_bits
         c_simple.line = self.line
         c_simple.words = c_word_list_from_word_desc_list(self.words)
         c_simple.redirects = c_redirect_list_from_redirect_list(self.redirects)
         return c_simple
 
 
-class FunctionDef:
+class FunctionDef(_Node):
     """
     for function definitions
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "line", "name", "command", "source_file")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     line: int  # line number the command is on
     name: WordDesc  # the name of the function
     command: "Command"  # the execution tree for the function
     source_file: Optional[str]  # the file the function was defined in, if any
 
-    def __init__(self, function: c_bash.function_def):
+    def __init__(
+        self, function: c_bash.function_def, worklist: Optional[_Worklist] = None
+    ):
         """
         :param function: the function_def struct
+        :param worklist: the worklist building the commands below, if any
         """
-        self.flags = command_flag_list_from_int(function.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, function.flags)
         self.line = function.line
         self.name = WordDesc(function.name.contents)
-        self.command = Command(function.command.contents)
+        self.command = _child_node(Command, function.command.contents, worklist)
         self.source_file = (
             function.source_file.decode("utf-8") if function.source_file else None
         )
 
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> FunctionDef:
+        """
+        :param json: the dictionary representation of the function definition, as
+        _to_json returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the function definition
+        """
+        function = cls.__new__(cls)
+        function.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        function.line = json["line"]
+        function.name = WordDesc.from_json(json["name"])
+        function.command = _child_from_json(Command, json["command"], worklist)
+        function.source_file = json["source_file"]
+        return function
+
     def __eq__(self, other: object) -> bool:
         """
         :param other: the other function definition
         :return: whether the two function definitions are equal, the
         flags lists need not be in the same order
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other function definition
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two function definitions are equal, leaving
+        the bodies to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, FunctionDef):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
             return False
-        if self.name != other.name:
+        if self.flag_bits != other.flag_bits:
             return False
-        if self.command != other.command:
+        if self.name != other.name:
             return False
         # if the asts are coming from different files, they should still be considered equal
         # if self.source_file != other.source_file:
         #     return False
+        pairs.append((self.command, other.command))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list, None]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
+        """
+        :return: the command
+        """
+        return [self.command]
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            _fingerprint_of(self.name, digest),
+            _fingerprint_of(self.command, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list, None]]:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the function definition
         """
         return {
-            "flags": [x._to_json() for x in self.flags],
+            "flags": _flags_json(self.flag_bits, worklist),
             "line": self.line,
-            "name": self.name._to_json(),
-            "command": self.command._to_json(),
+            "name": self.name._to_json(worklist),
+            "command": _child_json(self.command, worklist),
             "source_file": self.source_file if self.source_file is not None else None,
         }
 
-    def _to_ctypes(self) -> c_bash.function_def:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.function_def:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c function_def struct representation of this function definition
         """
         c_function = c_bash.function_def()
-        c_function.flags = int_from_command_flag_list(self.flags)
+        c_function.flags = self.flag_bits
         c_function.line = self.line
         c_function.name = ctypes.POINTER(c_bash.word_desc)(self.name._to_ctypes())
-        c_function.command = ctypes.POINTER(c_bash.command)(self.command._to_ctypes())
+        c_function.command = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.command, c_bash.command, worklist)
+        )
         c_function.source_file = (
             self.source_file.encode("utf-8") if self.source_file is not None else None
         )
         return c_function
 
 
-class GroupCom:
+class GroupCom(_Node):
     """
     group commands allow pipes and redirections to be applied to a group of commands
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "command")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     command: "Command"  # the command to run
 
-    def __init__(self, group: c_bash.group_com):
+    def __init__(self, group: c_bash.group_com, worklist: Optional[_Worklist] = None):
         """
         :param group: the group command struct
+        :param worklist: the worklist building the commands below, if any
         """
-        self.flags = command_flag_list_from_int(group.ignore)
-        self.command = Command(group.command.contents)
+        self.flag_bits = flag_bits_from_int(CommandFlag, group.ignore)
+        self.command = _child_node(Command, group.command.contents, worklist)
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> GroupCom:
+        """
+        :param json: the dictionary representation of the group command, as
+        _to_json returns it, which has the flags under "line"
+        :param worklist: the worklist building the commands below, if any
+        :return: the group command
+        """
+        group = cls.__new__(cls)
+        flags = json["flags"] if "flags" in json else json["line"]
+        group.flag_bits = flag_bits_from_json(CommandFlag, flags)
+        group.command = _child_from_json(Command, json["command"], worklist)
+        return group
 
     def __eq__(self, other: object) -> bool:
         """
         :param other: the other group command
         :return: whether the two group commands are equal
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other group command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two group commands are equal, leaving
+        the commands to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, GroupCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
             return False
-        if self.command != other.command:
+        if self.flag_bits != other.flag_bits:
             return False
+        pairs.append((self.command, other.command))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
+        """
+        :return: the command
+        """
+        return [self.command]
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (int(self.flag_bits), _fingerprint_of(self.command, digest))
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the group command
         """
         return {
-            "line": [x._to_json() for x in self.flags],
-            "command": self.command._to_json(),
+            "flags": _flags_json(self.flag_bits, worklist),
+            "command": _child_json(self.command, worklist),
         }
 
-    def _to_ctypes(self) -> c_bash.group_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.group_com:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c group_com struct representation of this group command
         """
         c_group = c_bash.group_com()
-        c_group.ignore = int_from_command_flag_list(self.flags)
-        c_group.command = ctypes.POINTER(c_bash.command)(self.command._to_ctypes())
+        c_group.ignore = self.flag_bits
+        c_group.command = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.command, c_bash.command, worklist)
+        )
         return c_group
 
 
-class SelectCom:
+class SelectCom(_Node):
     """
     the select command is like a for loop but with a menu
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "line", "name", "map_list", "action")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     line: int  # line number the command is on
     name: WordDesc  # the name of the variable?
     map_list: list[WordDesc]  # the list of words to map over
     action: "Command"  # the action to take for each word in the map list, during execution name is bound to member of map_list
 
-    def __init__(self, select: c_bash.select_com):
+    def __init__(self, select: c_bash.select_com, worklist: Optional[_Worklist] = None):
         """
         :param select: the select command struct
+        :param worklist: the worklist building the commands below, if any
         """
-        self.flags = command_flag_list_from_int(select.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, select.flags)
         self.line = select.line
         self.name = WordDesc(select.name.contents)
         self.map_list = word_desc_list_from_word_list(select.map_list)
-        self.action = Command(select.action.contents)
+        self.action = _child_node(Command, select.action.contents, worklist)
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> SelectCom:
+        """
+        :param json: the dictionary representation of the select command, as _to_json
+        returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the select command
+        """
+        select = cls.__new__(cls)
+        select.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        select.line = json["line"]
+        select.name = WordDesc.from_json(json["name"])
+        select.map_list = [WordDesc.from_json(x) for x in json["map_list"]]
+        select.action = _child_from_json(Command, json["action"], worklist)
+        return select
 
     def __eq__(self, other: object) -> bool:
         """
@@ -882,49 +2346,96 @@ class SelectCom:
         :return: whether the two select commands are equal, the
         lists need not be in the same order
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other select command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two select commands are equal, leaving
+        the actions to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, SelectCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
             return False
-        if self.name != other.name:
+        if self.flag_bits != other.flag_bits:
             return False
-        if not list_same_elements(self.map_list, other.map_list):
+        if self.name != other.name:
             return False
-        if self.action != other.action:
+        if not list_same_elements(self.map_list, other.map_list, _digest):
             return False
+        pairs.append((self.action, other.action))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
+        """
+        :return: the action
+        """
+        return [self.action]
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            _fingerprint_of(self.name, digest),
+            _unordered_fingerprints(self.map_list, digest),
+            _fingerprint_of(self.action, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the select command
         """
         return {
-            "flags": [x._to_json() for x in self.flags],
+            "flags": _flags_json(self.flag_bits, worklist),
             "line": self.line,
-            "name": self.name._to_json(),
-            "map_list": [x._to_json() for x in self.map_list],
-            "action": self.action._to_json(),
+            "name": self.name._to_json(worklist),
+            "map_list": [x._to_json(worklist) for x in self.map_list],
+            "action": _child_json(self.action, worklist),
         }
 
-    def _to_ctypes(self) -> c_bash.select_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.select_com:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c select_com struct representation of this select command
         """
         c_select = c_bash.select_com()
-        c_select.flags = int_from_command_flag_list(self.flags)
+        c_select.flags = self.flag_bits
         c_select.line = self.line
         c_select.name = ctypes.POINTER(c_bash.word_desc)(self.name._to_ctypes())
         c_select.map_list = c_word_list_from_word_desc_list(self.map_list)
-        c_select.action = ctypes.POINTER(c_bash.command)(self.action._to_ctypes())
+        c_select.action = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.action, c_bash.command, worklist)
+        )
         return c_select
 
 
-class ArithCom:
+class ArithCom(_Node):
     """
     arithmetic expression ((...))
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "line", "exp")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     line: int  # line number the command is on
     exp: list[WordDesc]  # the expression to evaluate
 
@@ -932,67 +2443,148 @@ class ArithCom:
         """
         :param arith: the arith command struct
         """
-        self.flags = command_flag_list_from_int(arith.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, arith.flags)
         self.line = arith.line
         self.exp = word_desc_list_from_word_list(arith.exp)
 
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> ArithCom:
+        """
+        :param json: the dictionary representation of the arith command, as
+        _to_json returns it
+        :param worklist: unused, arithmetic commands have no commands below them
+        :return: the arith command
+        """
+        arith = cls.__new__(cls)
+        arith.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        arith.line = json["line"]
+        arith.exp = [WordDesc.from_json(x) for x in json["exp"]]
+        return arith
+
     def __eq__(self, other: object) -> bool:
         """
         :param other: the other arith command
         :return: whether the two arith commands are equal, the
         flags lists need not be in the same order
         """
+        if self is other:
+            return True
         if not isinstance(other, ArithCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
             return False
-        if not list_same_elements(self.exp, other.exp):
+        if self.flag_bits != other.flag_bits:
+            return False
+        if not list_same_elements(self.exp, other.exp, _digest):
             return False
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (int(self.flag_bits), _unordered_fingerprints(self.exp, digest))
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
         """
+        :param worklist: the worklist of the tree being converted, for how flags
+        are written, if any
         :return: a dictionary representation of the arith command
         """
         return {
-            "flags": [x._to_json() for x in self.flags],
+            "flags": _flags_json(self.flag_bits, worklist),
             "line": self.line,
-            "exp": [x._to_json() for x in self.exp],
+            "exp": [x._to_json(worklist) for x in self.exp],
         }
 
-    def _to_ctypes(self) -> c_bash.arith_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.arith_com:
         """
+        :param worklist: unused, arithmetic commands have no commands below them
         :return: the c arith_com struct representation of this arith command
         """
         c_arith = c_bash.arith_com()
-        c_arith.flags = int_from_command_flag_list(self.flags)
+        c_arith.flags = self.flag_bits
         c_arith.line = self.line
         c_arith.exp = c_word_list_from_word_desc_list(self.exp)
         return c_arith
 
 
-class CondCom:
+class CondCom(_Node):
     """
     conditional expression [[...]]
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "line", "type", "op", "left", "right")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     line: int  # line number the command is on
     type: CondTypeEnum  # the type of conditional expression
     op: Optional[WordDesc]  # binary tree vibe?
     left: Optional["CondCom"]  # the left side of the expression
     right: Optional["CondCom"]  # the right side of the expression
 
-    def __init__(self, cond: c_bash.cond_com):
+    def __init__(self, cond: c_bash.cond_com, worklist: Optional[_Worklist] = None):
+        """
+        :param cond: the cond command struct
+        :param worklist: the worklist building the expressions below, if any
+        """
+        _convert(self._build, cond, worklist)
+
+    def _build(self, cond: c_bash.cond_com, worklist: _Worklist):
         """
+        sets the fields of the cond command, the expressions below it are
+        built by the worklist
         :param cond: the cond command struct
+        :param worklist: the worklist of the tree being built
         """
-        self.flags = command_flag_list_from_int(cond.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, cond.flags)
         self.line = cond.line
         self.type = CondTypeEnum(cond.type)
         self.op = WordDesc(cond.op.contents) if cond.op else None
-        self.left = CondCom(cond.left.contents) if cond.left else None
-        self.right = CondCom(cond.right.contents) if cond.right else None
+        self.left = (
+            _child_node(CondCom, cond.left.contents, worklist) if cond.left else None
+        )
+        self.right = (
+            _child_node(CondCom, cond.right.contents, worklist) if cond.right else None
+        )
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> CondCom:
+        """
+        :param json: the dictionary representation of the cond command, as
+        _to_json returns it
+        :param worklist: the worklist building the expressions below, if any
+        :return: the cond command
+        """
+        cond = cls.__new__(cls)
+        _convert(cond._build_from_json, json, worklist)
+        return cond
+
+    def _build_from_json(self, json: dict, worklist: _Worklist):
+        """
+        sets the fields of the cond command, the expressions below it are
+        built by the worklist
+        :param json: the dictionary representation of the cond command
+        :param worklist: the worklist of the tree being built
+        """
+        self.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        self.line = json["line"]
+        self.type = enum_from_json(CondTypeEnum, json["cond_type"])
+        self.op = WordDesc.from_json(json["op"]) if json["op"] is not None else None
+        self.left = _child_from_json(CondCom, json["left"], worklist)
+        self.right = _child_from_json(CondCom, json["right"], worklist)
 
     def __eq__(self, other: object) -> bool:
         """
@@ -1000,39 +2592,106 @@ class CondCom:
         :return: whether the two cond commands are equal, the
         flags lists need not be in the same order
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other cond command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two cond commands are equal, leaving
+        the expressions below them to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, CondCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
+            return False
+        if self.flag_bits != other.flag_bits:
             return False
         if self.type != other.type:
             return False
         if self.op != other.op:
             return False
-        if self.left != other.left:
-            return False
-        if self.right != other.right:
-            return False
+        pairs.append((self.left, other.left))
+        pairs.append((self.right, other.right))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list, None]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
         """
+        :return: the left and the right side, if any
+        """
+        return _nodes(self.left, self.right)
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            _enum_value(self.type),
+            _fingerprint_of(self.op, digest),
+            _fingerprint_of(self.left, digest),
+            _fingerprint_of(self.right, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list, None]]:
+        """
+        :param worklist: the worklist converting the expressions below, if any
         :return: a dictionary representation of the cond command
         """
-        return {
-            "flags": [x._to_json() for x in self.flags],
-            "line": self.line,
-            "cond_type": self.type._to_json(),
-            "op": self.op._to_json() if self.op is not None else None,
-            "left": self.left._to_json() if self.left is not None else None,
-            "right": self.right._to_json() if self.right is not None else None,
-        }
+        return _convert(self._build_json, {}, worklist)
+
+    def _build_json(self, json: dict, worklist: _Worklist):
+        """
+        fills in the dictionary representation of the cond command, the
+        expressions below it are converted by the worklist
+        :param json: the empty dictionary to fill in
+        :param worklist: the worklist of the tree being converted
+        """
+        json.update(
+            {
+                "flags": _flags_json(self.flag_bits, worklist),
+                "line": self.line,
+                "cond_type": self.type._to_json(),
+                "op": self.op._to_json(worklist) if self.op is not None else None,
+                "left": (
+                    _child_json(self.left, worklist) if self.left is not None else None
+                ),
+                "right": (
+                    _child_json(self.right, worklist)
+                    if self.right is not None
+                    else None
+                ),
+            }
+        )
 
-    def _to_ctypes(self) -> c_bash.cond_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.cond_com:
         """
+        :param worklist: the worklist converting the expressions below, if any
         :return: the c cond_com struct representation of this cond command
         """
-        c_cond = c_bash.cond_com()
-        c_cond.flags = int_from_command_flag_list(self.flags)
+        return _convert(self._build_ctypes, c_bash.cond_com(), worklist)
+
+    def _build_ctypes(self, c_cond: c_bash.cond_com, worklist: _Worklist):
+        """
+        fills in the c cond_com struct, the expressions below it are
+        converted by the worklist
+        :param c_cond: the empty struct to fill in
+        :param worklist: the worklist of the tree being converted
+        """
+        c_cond.flags = self.flag_bits
         c_cond.line = self.line
         c_cond.type = self.type.value
         c_cond.op = (
@@ -1041,40 +2700,66 @@ class CondCom:
             else None
         )
         c_cond.left = (
-            ctypes.POINTER(c_bash.cond_com)(self.left._to_ctypes())
+            ctypes.POINTER(c_bash.cond_com)(
+                _child_ctypes(self.left, c_bash.cond_com, worklist)
+            )
             if self.left is not None
             else None
         )
         c_cond.right = (
-            ctypes.POINTER(c_bash.cond_com)(self.right._to_ctypes())
+            ctypes.POINTER(c_bash.cond_com)(
+                _child_ctypes(self.right, c_bash.cond_com, worklist)
+            )
             if self.right is not None
             else None
         )
-        return c_cond
 
 
-class ArithForCom:
+class ArithForCom(_Node):
     """
     a c-style for loop ((init; test; step)) action
     """
 
-    flags: list[CommandFlag]
+    __slots__ = ("flag_bits", "line", "init", "test", "step", "action")
+
+    flag_bits: CommandFlag
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     line: int  # line number the command is on
     init: list[WordDesc]  # the initial values of the variables
     test: list[WordDesc]  # the test to perform
     step: list[WordDesc]  # the step to take
     action: "Command"  # the action to take for each iteration
 
-    def __init__(self, arith_for: c_bash.arith_for_com):
+    def __init__(
+        self, arith_for: c_bash.arith_for_com, worklist: Optional[_Worklist] = None
+    ):
         """
         :param arith_for: the arith_for command struct
+        :param worklist: the worklist building the commands below, if any
         """
-        self.flags = command_flag_list_from_int(arith_for.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, arith_for.flags)
         self.line = arith_for.line
         self.init = word_desc_list_from_word_list(arith_for.init)
         self.test = word_desc_list_from_word_list(arith_for.test)
         self.step = word_desc_list_from_word_list(arith_for.step)
-        self.action = Command(arith_for.action.contents)
+        self.action = _child_node(Command, arith_for.action.contents, worklist)
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> ArithForCom:
+        """
+        :param json: the dictionary representation of the arith_for command, as
+        _to_json returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the arith_for command
+        """
+        arith_for = cls.__new__(cls)
+        arith_for.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        arith_for.line = json["line"]
+        arith_for.init = [WordDesc.from_json(x) for x in json["init"]]
+        arith_for.test = [WordDesc.from_json(x) for x in json["test"]]
+        arith_for.step = [WordDesc.from_json(x) for x in json["step"]]
+        arith_for.action = _child_from_json(Command, json["action"], worklist)
+        return arith_for
 
     def __eq__(self, other: object) -> bool:
         """
@@ -1082,9 +2767,22 @@ class ArithForCom:
         :return: whether the two arith_for commands are equal, the
         flags lists need not be in the same order
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other arith_for command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two arith_for commands are equal, leaving
+        the actions to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, ArithForCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
+            return False
+        if self.flag_bits != other.flag_bits:
             return False
         if self.init != other.init:
             return False
@@ -1092,105 +2790,214 @@ class ArithForCom:
             return False
         if self.step != other.step:
             return False
-        if self.action != other.action:
-            return False
+        pairs.append((self.action, other.action))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
+        """
+        :return: the action
+        """
+        return [self.action]
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
         """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            _ordered_fingerprints(self.init, digest),
+            _ordered_fingerprints(self.test, digest),
+            _ordered_fingerprints(self.step, digest),
+            _fingerprint_of(self.action, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
+        """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the arith_for command
         """
         return {
-            "flags": [x._to_json() for x in self.flags],
+            "flags": _flags_json(self.flag_bits, worklist),
             "line": self.line,
-            "init": [x._to_json() for x in self.init],
-            "test": [x._to_json() for x in self.test],
-            "step": [x._to_json() for x in self.step],
-            "action": self.action._to_json(),
+            "init": [x._to_json(worklist) for x in self.init],
+            "test": [x._to_json(worklist) for x in self.test],
+            "step": [x._to_json(worklist) for x in self.step],
+            "action": _child_json(self.action, worklist),
         }
 
-    def _to_ctypes(self) -> c_bash.arith_for_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.arith_for_com:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c arith_for_com struct representation of this arith_for command
         """
         c_arith_for = c_bash.arith_for_com()
-        c_arith_for.flags = int_from_command_flag_list(self.flags)
+        c_arith_for.flags = self.flag_bits
         c_arith_for.line = self.line
         c_arith_for.init = c_word_list_from_word_desc_list(self.init)
         c_arith_for.test = c_word_list_from_word_desc_list(self.test)
         c_arith_for.step = c_word_list_from_word_desc_list(self.step)
-        c_arith_for.action = ctypes.POINTER(c_bash.command)(self.action._to_ctypes())
+        c_arith_for.action = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.action, c_bash.command, worklist)
+        )
         return c_arith_for
 
 
-class SubshellCom:
+class SubshellCom(_Node):
     """
     a subshell command
     """
 
-    flags: list[CommandFlag]  # unclear flag type
+    __slots__ = ("flag_bits", "line", "command")
+
+    flag_bits: CommandFlag  # unclear flag type
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     line: int  # line number the command is on
     command: "Command"  # the command to run in the subshell
 
-    def __init__(self, subshell: c_bash.subshell_com):
+    def __init__(
+        self, subshell: c_bash.subshell_com, worklist: Optional[_Worklist] = None
+    ):
         """
         :param subshell: the subshell command struct
+        :param worklist: the worklist building the commands below, if any
         """
-        self.flags = command_flag_list_from_int(subshell.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, subshell.flags)
         self.line = subshell.line
-        self.command = Command(subshell.command.contents)
+        self.command = _child_node(Command, subshell.command.contents, worklist)
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> SubshellCom:
+        """
+        :param json: the dictionary representation of the subshell command, as
+        _to_json returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the subshell command
+        """
+        subshell = cls.__new__(cls)
+        subshell.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        subshell.line = json["line"]
+        subshell.command = _child_from_json(Command, json["command"], worklist)
+        return subshell
 
     def __eq__(self, other: object) -> bool:
         """
         :param other: the other subshell command
         :return: whether the two subshell commands are equal, the
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other subshell command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two subshell commands are equal, leaving
+        the commands to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, SubshellCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
             return False
-        if self.command != other.command:
+        if self.flag_bits != other.flag_bits:
             return False
+        pairs.append((self.command, other.command))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
         """
+        :return: the command
+        """
+        return [self.command]
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (int(self.flag_bits), _fingerprint_of(self.command, digest))
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
+        """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the subshell command
         """
         return {
-            "flags": [x._to_json() for x in self.flags],
+            "flags": _flags_json(self.flag_bits, worklist),
             "line": self.line,
-            "command": self.command._to_json(),
+            "command": _child_json(self.command, worklist),
         }
 
-    def _to_ctypes(self) -> c_bash.subshell_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.subshell_com:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c subshell_com struct representation of this subshell command
         """
         c_subshell = c_bash.subshell_com()
-        c_subshell.flags = int_from_command_flag_list(self.flags)
+        c_subshell.flags = self.flag_bits
         c_subshell.line = self.line
-        c_subshell.command = ctypes.POINTER(c_bash.command)(self.command._to_ctypes())
+        c_subshell.command = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.command, c_bash.command, worklist)
+        )
         return c_subshell
 
 
-class CoprocCom:
+class CoprocCom(_Node):
     """
     a coprocess command
     """
 
-    flags: list[CommandFlag]  # unclear flag type
+    __slots__ = ("flag_bits", "name", "command")
+
+    flag_bits: CommandFlag  # unclear flag type
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     name: str  # the name of the coprocess
     command: "Command"  # the command to run in the coprocess
 
-    def __init__(self, coproc: c_bash.coproc_com):
+    def __init__(self, coproc: c_bash.coproc_com, worklist: Optional[_Worklist] = None):
         """
         :param coproc: the coproc command struct
+        :param worklist: the worklist building the commands below, if any
         """
-        self.flags = command_flag_list_from_int(coproc.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, coproc.flags)
         # c_char_p is a bytes object so we need to decode it
         self.name = coproc.name.decode("utf-8")
-        self.command = Command(coproc.command.contents)
+        self.command = _child_node(Command, coproc.command.contents, worklist)
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> CoprocCom:
+        """
+        :param json: the dictionary representation of the coproc command, as
+        _to_json returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the coproc command
+        """
+        coproc = cls.__new__(cls)
+        coproc.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        coproc.name = json["name"]
+        coproc.command = _child_from_json(Command, json["command"], worklist)
+        return coproc
 
     def __eq__(self, other: object) -> bool:
         """
@@ -1198,262 +3005,397 @@ class CoprocCom:
         :return: whether the two coproc commands are equal, the
         flags lists need not be in the same order
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other coproc command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two coproc commands are equal, leaving
+        the commands to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, CoprocCom):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self._fingerprints_differ(other):
             return False
-        if self.name != other.name:
+        if self.flag_bits != other.flag_bits:
             return False
-        if self.command != other.command:
+        if self.name != other.name:
             return False
+        pairs.append((self.command, other.command))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
+        """
+        :return: the command
+        """
+        return [self.command]
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            int(self.flag_bits),
+            self.name,
+            _fingerprint_of(self.command, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the coproc command
         """
         return {
-            "flags": [x._to_json() for x in self.flags],
+            "flags": _flags_json(self.flag_bits, worklist),
             "name": self.name,
-            "command": self.command._to_json(),
+            "command": _child_json(self.command, worklist),
         }
 
-    def _to_ctypes(self) -> c_bash.coproc_com:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.coproc_com:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c coproc_com struct representation of this coproc command
         """
         c_coproc = c_bash.coproc_com()
-        c_coproc.flags = int_from_command_flag_list(self.flags)
+        c_coproc.flags = self.flag_bits
         c_coproc.name = self.name.encode("utf-8")
-        c_coproc.command = ctypes.POINTER(c_bash.command)(self.command._to_ctypes())
+        c_coproc.command = ctypes.POINTER(c_bash.command)(
+            _child_ctypes(self.command, c_bash.command, worklist)
+        )
         return c_coproc
 
 
-class ValueUnion:
+def _value_union_variant(kind: str) -> property:
+    """
+    :param kind: the name of a value union attribute, such as for_com
+    :return: a property reading and writing that attribute of a value union
+    """
+
+    def get(self: "ValueUnion"):
+        return self.node if self.kind == kind else None
+
+    def set(self: "ValueUnion", node):
+        if node is not None:
+            self.kind = kind
+            self.node = node
+        elif self.kind == kind:
+            self.kind = None
+            self.node = None
+
+    return property(get, set)
+
+
+# the c union member and struct of each value union attribute
+_VALUE_UNION_C_MEMBERS = {
+    "for_com": ("For", c_bash.for_com),
+    "case_com": ("Case", c_bash.case_com),
+    "while_com": ("While", c_bash.while_com),
+    "if_com": ("If", c_bash.if_com),
+    "connection": ("Connection", c_bash.connection),
+    "simple_com": ("Simple", c_bash.simple_com),
+    "function_def": ("Function_def", c_bash.function_def),
+    "group_com": ("Group", c_bash.group_com),
+    "select_com": ("Select", c_bash.select_com),
+    "arith_com": ("Arith", c_bash.arith_com),
+    "cond_com": ("Cond", c_bash.cond_com),
+    "arith_for_com": ("ArithFor", c_bash.arith_for_com),
+    "subshell_com": ("Subshell", c_bash.subshell_com),
+    "coproc_com": ("Coproc", c_bash.coproc_com),
+}
+
+
+# the value union attribute and node class of each command type
+_VALUE_UNION_KINDS = {
+    CommandType.CM_FOR: ("for_com", ForCom),
+    CommandType.CM_CASE: ("case_com", CaseCom),
+    CommandType.CM_WHILE: ("while_com", WhileCom),
+    CommandType.CM_IF: ("if_com", IfCom),
+    CommandType.CM_SIMPLE: ("simple_com", SimpleCom),
+    CommandType.CM_SELECT: ("select_com", SelectCom),
+    CommandType.CM_CONNECTION: ("connection", Connection),
+    CommandType.CM_FUNCTION_DEF: ("function_def", FunctionDef),
+    CommandType.CM_UNTIL: ("while_com", WhileCom),
+    CommandType.CM_GROUP: ("group_com", GroupCom),
+    CommandType.CM_ARITH: ("arith_com", ArithCom),
+    CommandType.CM_COND: ("cond_com", CondCom),
+    CommandType.CM_ARITH_FOR: ("arith_for_com", ArithForCom),
+    CommandType.CM_SUBSHELL: ("subshell_com", SubshellCom),
+    CommandType.CM_COPROC: ("coproc_com", CoprocCom),
+}
+
+
+class ValueUnion(_Node):
     """
     a union of all the possible command types
-    exactly one of these will be non-null
-    """
-
-    for_com: Optional[ForCom]
-    case_com: Optional[CaseCom]
-    while_com: Optional[WhileCom]
-    if_com: Optional[IfCom]
-    connection: Optional[Connection]
-    simple_com: Optional[SimpleCom]
-    function_def: Optional[FunctionDef]
-    group_com: Optional[GroupCom]
-    select_com: Optional[SelectCom]
-    arith_com: Optional[ArithCom]
-    cond_com: Optional[CondCom]
-    arith_for_com: Optional[ArithForCom]
-    subshell_com: Optional[SubshellCom]
-    coproc_com: Optional[CoprocCom]
-
-    def __init__(self, command_type: CommandType, value: c_bash.value):
+    exactly one of these will be non-null, only that one is stored
+    """
+
+    __slots__ = ("kind", "node")
+
+    kind: Optional[str]  # the name of the attribute that is non-null
+    node: Optional[object]  # the value of that attribute
+
+    for_com: Optional[ForCom] = _value_union_variant("for_com")
+    case_com: Optional[CaseCom] = _value_union_variant("case_com")
+    while_com: Optional[WhileCom] = _value_union_variant("while_com")
+    if_com: Optional[IfCom] = _value_union_variant("if_com")
+    connection: Optional[Connection] = _value_union_variant("connection")
+    simple_com: Optional[SimpleCom] = _value_union_variant("simple_com")
+    function_def: Optional[FunctionDef] = _value_union_variant("function_def")
+    group_com: Optional[GroupCom] = _value_union_variant("group_com")
+    select_com: Optional[SelectCom] = _value_union_variant("select_com")
+    arith_com: Optional[ArithCom] = _value_union_variant("arith_com")
+    cond_com: Optional[CondCom] = _value_union_variant("cond_com")
+    arith_for_com: Optional[ArithForCom] = _value_union_variant("arith_for_com")
+    subshell_com: Optional[SubshellCom] = _value_union_variant("subshell_com")
+    coproc_com: Optional[CoprocCom] = _value_union_variant("coproc_com")
+
+    def __init__(
+        self,
+        command_type: CommandType,
+        value: c_bash.value,
+        worklist: Optional[_Worklist] = None,
+    ):
         """
         :param command_type: the type of command
         :param value: the value union struct
+        :param worklist: the worklist building the commands below, if any
         """
-        self.for_com = None
-        self.case_com = None
-        self.while_com = None
-        self.if_com = None
-        self.connection = None
-        self.simple_com = None
-        self.function_def = None
-        self.group_com = None
-        self.select_com = None
-        self.arith_com = None
-        self.cond_com = None
-        self.arith_for_com = None
-        self.subshell_com = None
-        self.coproc_com = None
+        self.kind = None
+        self.node = None
 
         if command_type == CommandType.CM_FOR:
-            self.for_com = ForCom(value.For.contents)
+            self.for_com = ForCom(value.For.contents, worklist)
         elif command_type == CommandType.CM_CASE:
-            self.case_com = CaseCom(value.Case.contents)
+            self.case_com = CaseCom(value.Case.contents, worklist)
         elif command_type == CommandType.CM_WHILE:
-            self.while_com = WhileCom(value.While.contents)
+            self.while_com = WhileCom(value.While.contents, worklist)
         elif command_type == CommandType.CM_IF:
-            self.if_com = IfCom(value.If.contents)
+            self.if_com = IfCom(value.If.contents, worklist)
         elif command_type == CommandType.CM_CONNECTION:
-            self.connection = Connection(value.Connection.contents)
+            self.connection = Connection(value.Connection.contents, worklist)
         elif command_type == CommandType.CM_SIMPLE:
             self.simple_com = SimpleCom(value.Simple.contents)
         elif command_type == CommandType.CM_FUNCTION_DEF:
-            self.function_def = FunctionDef(value.Function_def.contents)
+            self.function_def = FunctionDef(value.Function_def.contents, worklist)
         elif command_type == CommandType.CM_UNTIL:
-            self.while_com = WhileCom(value.While.contents)
+            self.while_com = WhileCom(value.While.contents, worklist)
         elif command_type == CommandType.CM_GROUP:
-            self.group_com = GroupCom(value.Group.contents)
+            self.group_com = GroupCom(value.Group.contents, worklist)
         elif command_type == CommandType.CM_SELECT:
-            self.select_com = SelectCom(value.Select.contents)
+            self.select_com = SelectCom(value.Select.contents, worklist)
         elif command_type == CommandType.CM_ARITH:
             self.arith_com = ArithCom(value.Arith.contents)
         elif command_type == CommandType.CM_COND:
-            self.cond_com = CondCom(value.Cond.contents)
+            self.cond_com = CondCom(value.Cond.contents, worklist)
         elif command_type == CommandType.CM_ARITH_FOR:
-            self.arith_for_com = ArithForCom(value.ArithFor.contents)
+            self.arith_for_com = ArithForCom(value.ArithFor.contents, worklist)
         elif command_type == CommandType.CM_SUBSHELL:
-            self.subshell_com = SubshellCom(value.Subshell.contents)
+            self.subshell_com = SubshellCom(value.Subshell.contents, worklist)
         elif command_type == CommandType.CM_COPROC:
-            self.coproc_com = CoprocCom(value.Coproc.contents)
+            self.coproc_com = CoprocCom(value.Coproc.contents, worklist)
         else:
             raise Exception("Unknown command type provided.")
 
+    @classmethod
+    def from_json(
+        cls,
+        command_type: CommandType,
+        json: dict,
+        worklist: Optional[_Worklist] = None,
+    ) -> ValueUnion:
+        """
+        :param command_type: the type of command
+        :param json: the dictionary representation of the node, as _to_json
+        returns it
+        :param worklist: the worklist building the commands below, if any
+        :return: the value union
+        """
+        kind, node_class = _VALUE_UNION_KINDS[command_type]
+        value = cls.__new__(cls)
+        value.kind = kind
+        value.node = node_class.from_json(json, worklist)
+        return value
+
     def __eq__(self, other: object) -> bool:
         """
         :param other: the other value union
         :return: whether the two value unions are equal
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other value union
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the kinds of the two value unions are equal, leaving
+        the nodes to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, ValueUnion):
             return False
-        if self.for_com != other.for_com:
-            return False
-        if self.case_com != other.case_com:
-            return False
-        if self.while_com != other.while_com:
-            return False
-        if self.if_com != other.if_com:
-            return False
-        if self.connection != other.connection:
-            return False
-        if self.simple_com != other.simple_com:
-            return False
-        if self.function_def != other.function_def:
-            return False
-        if self.group_com != other.group_com:
+        if self._fingerprints_differ(other):
             return False
-        if self.select_com != other.select_com:
-            return False
-        if self.arith_com != other.arith_com:
-            return False
-        if self.cond_com != other.cond_com:
-            return False
-        if self.arith_for_com != other.arith_for_com:
-            return False
-        if self.subshell_com != other.subshell_com:
-            return False
-        if self.coproc_com != other.coproc_com:
+        if self.kind != other.kind:
             return False
+        pairs.append((self.node, other.node))
         return True
 
-    def _to_json(self) -> dict:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
         """
+        :return: the node, if any
+        """
+        return _nodes(self.node)
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (self.kind, _fingerprint_of(self.node, digest))
+
+    def _to_json(self, worklist: Optional[_Worklist] = None) -> dict:
+        """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the value union
         """
-        if self.for_com is not None:
-            return self.for_com._to_json()
-        elif self.case_com is not None:
-            return self.case_com._to_json()
-        elif self.while_com is not None:
-            return self.while_com._to_json()
-        elif self.if_com is not None:
-            return self.if_com._to_json()
-        elif self.connection is not None:
-            return self.connection._to_json()
-        elif self.simple_com is not None:
-            return self.simple_com._to_json()
-        elif self.function_def is not None:
-            return self.function_def._to_json()
-        elif self.group_com is not None:
-            return self.group_com._to_json()
-        elif self.select_com is not None:
-            return self.select_com._to_json()
-        elif self.arith_com is not None:
-            return self.arith_com._to_json()
-        elif self.cond_com is not None:
-            return self.cond_com._to_json()
-        elif self.arith_for_com is not None:
-            return self.arith_for_com._to_json()
-        elif self.subshell_com is not None:
-            return self.subshell_com._to_json()
-        elif self.coproc_com is not None:
-            return self.coproc_com._to_json()
-        else:
+        if self.node is None:
             raise Exception("invalid value union")
+        return self.node._to_json(worklist)
 
-    def _to_ctypes(self) -> c_bash.value:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.value:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c value union struct representation of this value union
         """
-        c_value = c_bash.value()
-        if self.for_com is not None:
-            c_value.For = ctypes.POINTER(c_bash.for_com)(self.for_com._to_ctypes())
-        elif self.case_com is not None:
-            c_value.Case = ctypes.POINTER(c_bash.case_com)(self.case_com._to_ctypes())
-        elif self.while_com is not None:
-            c_value.While = ctypes.POINTER(c_bash.while_com)(
-                self.while_com._to_ctypes()
-            )
-        elif self.if_com is not None:
-            c_value.If = ctypes.POINTER(c_bash.if_com)(self.if_com._to_ctypes())
-        elif self.connection is not None:
-            c_value.Connection = ctypes.POINTER(c_bash.connection)(
-                self.connection._to_ctypes()
-            )
-        elif self.simple_com is not None:
-            c_value.Simple = ctypes.POINTER(c_bash.simple_com)(
-                self.simple_com._to_ctypes()
-            )
-        elif self.function_def is not None:
-            c_value.Function_def = ctypes.POINTER(c_bash.function_def)(
-                self.function_def._to_ctypes()
-            )
-        elif self.group_com is not None:
-            c_value.Group = ctypes.POINTER(c_bash.group_com)(
-                self.group_com._to_ctypes()
-            )
-        elif self.select_com is not None:
-            c_value.Select = ctypes.POINTER(c_bash.select_com)(
-                self.select_com._to_ctypes()
-            )
-        elif self.arith_com is not None:
-            c_value.Arith = ctypes.POINTER(c_bash.arith_com)(
-                self.arith_com._to_ctypes()
-            )
-        elif self.cond_com is not None:
-            c_value.Cond = ctypes.POINTER(c_bash.cond_com)(self.cond_com._to_ctypes())
-        elif self.arith_for_com is not None:
-            c_value.ArithFor = ctypes.POINTER(c_bash.arith_for_com)(
-                self.arith_for_com._to_ctypes()
-            )
-        elif self.subshell_com is not None:
-            c_value.Subshell = ctypes.POINTER(c_bash.subshell_com)(
-                self.subshell_com._to_ctypes()
-            )
-        elif self.coproc_com is not None:
-            c_value.Coproc = ctypes.POINTER(c_bash.coproc_com)(
-                self.coproc_com._to_ctypes()
-            )
-        else:
+        if self.node is None:
             raise Exception("invalid value union")
+        c_member, c_struct = _VALUE_UNION_C_MEMBERS[self.kind]
+        c_value = c_bash.value()
+        setattr(
+            c_value, c_member, ctypes.POINTER(c_struct)(self.node._to_ctypes(worklist))
+        )
         return c_value
 
 
-class Command:
+class Command(_Node):
     """
     a mirror of the bash command struct defined here:
     https://git.savannah.gnu.org/cgit/bash.git/tree/command.h
     """
 
+    __slots__ = ("type", "flag_bits", "redirects", "value", "_lazy")
+
     type: CommandType  # command type
-    flags: list[CommandFlag]  # command flags
+    flag_bits: CommandFlag  # command flags
+    flags: list[CommandFlag] = _flag_list_view("flag_bits", CommandFlag)
     # line: int  # line number the command is on - seems to be unused
     redirects: list[Redirect]
     value: ValueUnion
+    # only set on lazy commands whose redirects and value haven't been read
+    # yet, the struct to read them from and the parse session owning it
+    _lazy: tuple
+
+    def __init__(
+        self, bash_command: c_bash.command, worklist: Optional[_Worklist] = None
+    ):
+        """
+        :param bash_command: the command struct
+        :param worklist: the worklist building the commands below, if any
+        """
+        _convert(self._build, bash_command, worklist)
 
-    def __init__(self, bash_command: c_bash.command):
+    def _build(self, bash_command: c_bash.command, worklist: _Worklist):
         """
+        sets the fields of the command, the commands below it are built by the worklist.
+        If the worklist has a parse session the command is lazy, the redirects and
+        value are left unset and read from the struct when first accessed
         :param bash_command: the command struct
+        :param worklist: the worklist of the tree being built
         """
         self.type = CommandType(bash_command.type)
-        self.flags = command_flag_list_from_int(bash_command.flags)
+        self.flag_bits = flag_bits_from_int(CommandFlag, bash_command.flags)
         # self.line = bash_command.line
+        if worklist.session is not None:
+            self._lazy = (bash_command, worklist.session)
+        else:
+            self._build_fields(bash_command, worklist)
+
+    def _build_fields(self, bash_command: c_bash.command, worklist: _Worklist):
+        """
+        sets the redirects and value of the command
+        :param bash_command: the command struct
+        :param worklist: the worklist of the tree being built
+        """
         self.redirects = redirect_list_from_redirect(bash_command.redirects)
-        self.value = ValueUnion(self.type, bash_command.value)
+        self.value = ValueUnion(self.type, bash_command.value, worklist)
+
+    @classmethod
+    def from_json(cls, json: dict, worklist: Optional[_Worklist] = None) -> Command:
+        """
+        :param json: the dictionary representation of the command, as _to_json
+        or ast_to_json returns it, or as json.loads reads it back
+        :param worklist: the worklist building the commands below, if any
+        :return: the command
+        """
+        command = cls.__new__(cls)
+        _convert(command._build_from_json, json, worklist)
+        return command
+
+    def _build_from_json(self, json: dict, worklist: _Worklist):
+        """
+        sets the fields of the command, the commands below it are built by the worklist
+        :param json: the dictionary representation of the command
+        :param worklist: the worklist of the tree being built
+        """
+        self.type = enum_from_json(CommandType, json["type"])
+        self.flag_bits = flag_bits_from_json(CommandFlag, json["flags"])
+        self.redirects = [Redirect.from_json(x) for x in json["redirects"]]
+        self.value = ValueUnion.from_json(self.type, json["value"], worklist)
+
+    def __getattr__(self, name: str):
+        """
+        only called for the fields that aren't set, reads the redirects and value
+        of a lazy command from its struct. The commands in the value are lazy too
+        :param name: the name of the field
+        :return: the field
+        """
+        if name not in ("redirects", "value"):
+            raise AttributeError(name)
+        try:
+            bash_command, session = self._lazy
+        except AttributeError:
+            raise AttributeError(name) from None
+        if session.closed:
+            raise RuntimeError("The parse session of this command has been closed")
+        worklist = _Worklist(session=session)
+        self._build_fields(bash_command, worklist)
+        worklist.run()
+        del self._lazy
+        return getattr(self, name)
 
     def __eq__(self, other: object) -> bool:
         """
@@ -1461,38 +3403,99 @@ class Command:
         :return: whether the two commands are equal, the
         flags lists need not be in the same order
         """
+        return _nodes_equal(self, other)
+
+    def _equal_fields(self, other: object, pairs: list[tuple]) -> bool:
+        """
+        :param other: the other command
+        :param pairs: the pairs of nodes _nodes_equal still has to compare
+        :return: whether the fields of the two commands are equal, leaving
+        the values to be compared from pairs
+        """
+        if self is other:
+            return True
         if not isinstance(other, Command):
             return False
-        if self.type != other.type:
+        if self._fingerprints_differ(other):
             return False
-        if not list_same_elements(self.flags, other.flags):
+        if self.type != other.type:
             return False
-        if not list_same_elements(self.redirects, other.redirects):
+        if self.flag_bits != other.flag_bits:
             return False
-        if self.value != other.value:
+        if not list_same_elements(self.redirects, other.redirects, _digest):
             return False
+        pairs.append((self.value, other.value))
         return True
 
-    def _to_json(self) -> dict[str, Union[int, str, dict, list]]:
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the fingerprint, the node is frozen from then on so
+        the hash doesn't change while the node is in a set or a dictionary
+        """
+        return hash(self.fingerprint())
+
+    def _child_nodes(self) -> list[_Node]:
         """
+        :return: the value
+        """
+        return [self.value]
+
+    def _fingerprint_fields(self, digest: Callable[[_Node], bytes]) -> tuple:
+        """
+        :param digest: gives the fingerprint of a node
+        :return: the fields compared by __eq__, with the nodes replaced by
+        their fingerprints
+        """
+        return (
+            _enum_value(self.type),
+            int(self.flag_bits),
+            _unordered_fingerprints(self.redirects, digest),
+            _fingerprint_of(self.value, digest),
+        )
+
+    def _to_json(
+        self, worklist: Optional[_Worklist] = None
+    ) -> dict[str, Union[int, str, dict, list]]:
+        """
+        :param worklist: the worklist converting the commands below, if any
         :return: a dictionary representation of the command
         """
-        return {
-            "type": self.type._to_json(),
-            "flags": self.flags,
-            # 'line': self.line,
-            "redirects": [x._to_json() for x in self.redirects],
-            "value": self.value._to_json(),
-        }
+        return _convert(self._build_json, {}, worklist)
+
+    def _build_json(self, json: dict, worklist: _Worklist):
+        """
+        fills in the dictionary representation of the command, the commands
+        below it are converted by the worklist
+        :param json: the empty dictionary to fill in
+        :param worklist: the worklist of the tree being converted
+        """
+        json.update(
+            {
+                "type": self.type._to_json(),
+                "flags": _flags_json(self.flag_bits, worklist),
+                # 'line': self.line,
+                "redirects": [x._to_json(worklist) for x in self.redirects],
+                "value": self.value._to_json(worklist),
+            }
+        )
 
-    def _to_ctypes(self) -> c_bash.command:
+    def _to_ctypes(self, worklist: Optional[_Worklist] = None) -> c_bash.command:
         """
+        :param worklist: the worklist converting the commands below, if any
         :return: the c command struct representation of this command
         """
-        c_command = c_bash.command()
+        return _convert(self._build_ctypes, c_bash.command(), worklist)
+
+    def _build_ctypes(self, c_command: c_bash.command, worklist: _Worklist):
+        """
+        fills in the c command struct, the commands below it are converted by
+        the worklist. The struct is already pointed to by its parent, so it is
+        filled in place
+        :param c_command: the empty struct to fill in
+        :param worklist: the worklist of the tree being converted
+        """
         c_command.type = self.type.value
-        c_command.flags = int_from_command_flag_list(self.flags)
+        c_command.flags = self.flag_bits
         c_command.line = 0
-        c_command.redirects = c_redirect_from_redirect_list(self.redirects)
-        c_command.value = self.value._to_ctypes()
-        return c_command
+        c_command.redirects = c_redirect_list_from_redirect_list(self.redirects)
+        c_command.value = self.value._to_ctypes(worklist)
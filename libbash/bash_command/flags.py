@@ -1,9 +1,136 @@
 from __future__ import annotations
 
-from enum import Enum
+from enum import Enum, IntFlag
 
+from typing import Union
 
-class OFlag(Enum):
+# for each flag type, the bits that are defined and the flag for each bit
+_FLAG_TABLES: dict[type, tuple[int, dict[int, IntFlag]]] = {}
+
+
+def _flag_table(flag_type: type) -> tuple[int, dict[int, IntFlag]]:
+    """
+    :param flag_type: the flag enum
+    :return: the mask of the defined bits and the flag for each of those bits
+    """
+    table = _FLAG_TABLES.get(flag_type)
+    if table is None:
+        by_bit = {
+            flag.value: flag for flag in flag_type.__members__.values() if flag.value
+        }
+        mask = 0
+        for bit in by_bit:
+            mask |= bit
+        table = _FLAG_TABLES[flag_type] = (mask, by_bit)
+    return table
+
+
+def flag_bits_from_int(flag_type: type, flag_int: int) -> IntFlag:
+    """
+    :param flag_type: the flag enum
+    :param flag_int: the integer value of the flags, as stored in the c structs
+    :return: the flags as a single flag_type value, bits that aren't
+    flags of flag_type are dropped
+    """
+    return flag_type(flag_int & _flag_table(flag_type)[0])
+
+
+def flag_list_from_int(flag_type: type, flag_int: int) -> list:
+    """
+    :param flag_type: the flag enum
+    :param flag_int: the integer value of the flags
+    :return: a list of the flags set in flag_int, in the order they are defined
+    """
+    mask, by_bit = _flag_table(flag_type)
+    flag_int &= mask
+    flag_list = []
+    while flag_int:
+        bit = flag_int & -flag_int
+        flag_int ^= bit
+        flag_list.append(by_bit[bit])
+    return flag_list
+
+
+def int_from_flag_list(flag_list: list) -> int:
+    """
+    :param flag_list: a list of flags
+    :return: the integer value of the flags
+    """
+    flag_int = 0
+    for flag in flag_list:
+        flag_int |= flag.value
+    return flag_int
+
+
+# for each flag or enum type, the member each name written by _to_json stands for
+_JSON_NAMES: dict[type, dict[str, Enum]] = {}
+
+
+def _json_names(enum_type: type) -> dict[str, Enum]:
+    """
+    :param enum_type: the flag or enum type
+    :return: the member of each name written by _to_json. Two redirect
+    instructions are written as "<&-", the first of them is kept
+    """
+    names = _JSON_NAMES.get(enum_type)
+    if names is None:
+        names = {}
+        for member in enum_type.__members__.values():
+            names.setdefault(member._to_json(), member)
+        _JSON_NAMES[enum_type] = names
+    return names
+
+
+def enum_from_json(enum_type: type, value: Union[str, Enum, int]) -> Enum:
+    """
+    :param enum_type: the enum
+    :param value: the name _to_json writes for a member, the member or its value
+    :return: the member
+    """
+    if isinstance(value, str):
+        try:
+            return _json_names(enum_type)[value]
+        except KeyError:
+            raise ValueError(f"Unknown {enum_type.__name__} {value!r}") from None
+    return enum_type(value)
+
+
+def flag_bits_from_json(flag_type: type, flags: Union[list, int]) -> IntFlag:
+    """
+    :param flag_type: the flag enum
+    :param flags: a list of the names _to_json writes for the flags, of the flags
+    or of their values, or the integer value of all of them
+    :return: the flags as a single flag_type value
+    """
+    if isinstance(flags, int):
+        return flag_bits_from_int(flag_type, flags)
+    flag_int = 0
+    for flag in flags:
+        flag_int |= enum_from_json(flag_type, flag).value
+    return flag_bits_from_int(flag_type, flag_int)
+
+
+# the names _to_json writes for each set of flags, by flag type and value
+_FLAG_NAME_LISTS: dict[tuple[type, int], tuple[str, ...]] = {}
+
+
+def flag_names_from_int(flag_type: type, flag_int: int) -> list[str]:
+    """
+    :param flag_type: the flag enum
+    :param flag_int: the integer value of the flags
+    :return: the names _to_json writes for the flags set in flag_int, in the order
+    they are defined. The names of each set of flags are looked up once
+    """
+    key = (flag_type, int(flag_int))
+    names = _FLAG_NAME_LISTS.get(key)
+    if names is None:
+        names = _FLAG_NAME_LISTS[key] = tuple(
+            flag._to_json() for flag in flag_list_from_int(flag_type, flag_int)
+        )
+    return list(names)
+
+
+class OFlag(IntFlag):
     """
     represents open flags present in the OpenFlag class
     """
@@ -15,36 +142,25 @@ class OFlag(Enum):
     O_CREAT = 1 << 9
     O_TRUNC = 1 << 10
 
-    def __eq__(self, other):
-        """
-        :param other: the other OFlag
-        :return: True if the other OFlag is equal to this OFlag
-        """
-        if isinstance(other, OFlag):
-            return self.value == other.value
-        elif isinstance(other, int):
-            return self.value == other
-        else:
-            return False
-
     def _to_json(self) -> str:
         """
         :return: the string representation of the open flag
         """
-        if self == OFlag.O_RDONLY:
-            return "read_only"
-        elif self == OFlag.O_WRONLY:
-            return "write_only"
-        elif self == OFlag.O_RDWR:
-            return "read_write"
-        elif self == OFlag.O_APPEND:
-            return "append"
-        elif self == OFlag.O_CREAT:
-            return "create"
-        elif self == OFlag.O_TRUNC:
-            return "truncate"
-        else:
-            raise Exception("invalid open flag")
+        try:
+            return _OFLAG_NAMES[self]
+        except KeyError:
+            raise Exception("invalid open flag") from None
+
+
+# the name _to_json writes for each open flag
+_OFLAG_NAMES: dict[OFlag, str] = {
+    OFlag.O_RDONLY: "read_only",
+    OFlag.O_WRONLY: "write_only",
+    OFlag.O_RDWR: "read_write",
+    OFlag.O_APPEND: "append",
+    OFlag.O_CREAT: "create",
+    OFlag.O_TRUNC: "truncate",
+}
 
 
 def oflag_list_from_int(oflag_int: int) -> list[OFlag]:
@@ -52,11 +168,7 @@ def oflag_list_from_int(oflag_int: int) -> list[OFlag]:
     :param oflag_int: the integer value of the open flag
     :return: a list of open flags
     """
-    flag_list = []
-    for flag in OFlag:
-        if oflag_int & flag.value:
-            flag_list.append(flag)
-    return flag_list
+    return flag_list_from_int(OFlag, oflag_int)
 
 
 def int_from_oflag_list(flag_list: list[OFlag]) -> int:
@@ -64,13 +176,10 @@ def int_from_oflag_list(flag_list: list[OFlag]) -> int:
     :param flag_list: the list of open flags
     :return: the integer value of the open flag
     """
-    flag_int = 0
-    for flag in flag_list:
-        flag_int |= flag.value
-    return flag_int
+    return int_from_flag_list(flag_list)
 
 
-class WordDescFlag(Enum):
+class WordDescFlag(IntFlag):
     """
     represents word description flags present in the WordDesc class
     """
@@ -110,84 +219,49 @@ class WordDescFlag(Enum):
     # force assignments to be to local variables, non-fatal on assignment errors
     W_FORCELOCAL = 1 << 29
 
-    def __eq__(self, other):
-        """
-        :param other: the other WordDescFlag
-        :return: True if the other WordDescFlag is equal to this WordDescFlag
-        """
-        if isinstance(other, WordDescFlag):
-            return self.value == other.value
-        elif isinstance(other, int):
-            return self.value == other
-        else:
-            return False
-
     def _to_json(self) -> str:
         """
         :return: the string representation of the word description flag
         """
-        if self == WordDescFlag.W_HASDOLLAR:
-            return "has_dollar"
-        elif self == WordDescFlag.W_QUOTED:
-            return "quoted"
-        elif self == WordDescFlag.W_ASSIGNMENT:
-            return "assignment"
-        elif self == WordDescFlag.W_SPLITSPACE:
-            return "split_space"
-        elif self == WordDescFlag.W_NOSPLIT:
-            return "no_split"
-        elif self == WordDescFlag.W_NOGLOB:
-            return "no_glob"
-        elif self == WordDescFlag.W_NOSPLIT2:
-            return "no_split2"
-        elif self == WordDescFlag.W_TILDEEXP:
-            return "tilde_exp"
-        elif self == WordDescFlag.W_DOLLARAT:
-            return "dollar_at"
-        elif self == WordDescFlag.W_ARRAYREF:
-            return "array_ref"
-        elif self == WordDescFlag.W_NOCOMSUB:
-            return "no_comsub"
-        elif self == WordDescFlag.W_ASSIGNRHS:
-            return "assign_rhs"
-        elif self == WordDescFlag.W_NOTILDE:
-            return "no_tilde"
-        elif self == WordDescFlag.W_NOASSNTILDE:
-            return "no_assign_tilde"
-        elif self == WordDescFlag.W_EXPANDRHS:
-            return "expand_rhs"
-        elif self == WordDescFlag.W_COMPASSIGN:
-            return "comp_assign"
-        elif self == WordDescFlag.W_ASSNBLTIN:
-            return "assign_builtin"
-        elif self == WordDescFlag.W_ASSIGNARG:
-            return "assign_arg"
-        elif self == WordDescFlag.W_HASQUOTEDNULL:
-            return "has_quoted_null"
-        elif self == WordDescFlag.W_DQUOTE:
-            return "dquote"
-        elif self == WordDescFlag.W_NOPROCSUB:
-            return "no_procsub"
-        elif self == WordDescFlag.W_SAWQUOTEDNULL:
-            return "saw_quoted_null"
-        elif self == WordDescFlag.W_ASSIGNASSOC:
-            return "assign_assoc"
-        elif self == WordDescFlag.W_ASSIGNARRAY:
-            return "assign_array"
-        elif self == WordDescFlag.W_ARRAYIND:
-            return "array_index"
-        elif self == WordDescFlag.W_ASSNGLOBAL:
-            return "assign_global"
-        elif self == WordDescFlag.W_NOBRACE:
-            return "no_brace"
-        elif self == WordDescFlag.W_COMPLETE:
-            return "complete"
-        elif self == WordDescFlag.W_CHKLOCAL:
-            return "check_local"
-        elif self == WordDescFlag.W_FORCELOCAL:
-            return "force_local"
-        else:
-            raise Exception("invalid word description flag")
+        try:
+            return _WORD_DESC_FLAG_NAMES[self]
+        except KeyError:
+            raise Exception("invalid word description flag") from None
+
+
+# the name _to_json writes for each word description flag
+_WORD_DESC_FLAG_NAMES: dict[WordDescFlag, str] = {
+    WordDescFlag.W_HASDOLLAR: "has_dollar",
+    WordDescFlag.W_QUOTED: "quoted",
+    WordDescFlag.W_ASSIGNMENT: "assignment",
+    WordDescFlag.W_SPLITSPACE: "split_space",
+    WordDescFlag.W_NOSPLIT: "no_split",
+    WordDescFlag.W_NOGLOB: "no_glob",
+    WordDescFlag.W_NOSPLIT2: "no_split2",
+    WordDescFlag.W_TILDEEXP: "tilde_exp",
+    WordDescFlag.W_DOLLARAT: "dollar_at",
+    WordDescFlag.W_ARRAYREF: "array_ref",
+    WordDescFlag.W_NOCOMSUB: "no_comsub",
+    WordDescFlag.W_ASSIGNRHS: "assign_rhs",
+    WordDescFlag.W_NOTILDE: "no_tilde",
+    WordDescFlag.W_NOASSNTILDE: "no_assign_tilde",
+    WordDescFlag.W_EXPANDRHS: "expand_rhs",
+    WordDescFlag.W_COMPASSIGN: "comp_assign",
+    WordDescFlag.W_ASSNBLTIN: "assign_builtin",
+    WordDescFlag.W_ASSIGNARG: "assign_arg",
+    WordDescFlag.W_HASQUOTEDNULL: "has_quoted_null",
+    WordDescFlag.W_DQUOTE: "dquote",
+    WordDescFlag.W_NOPROCSUB: "no_procsub",
+    WordDescFlag.W_SAWQUOTEDNULL: "saw_quoted_null",
+    WordDescFlag.W_ASSIGNASSOC: "assign_assoc",
+    WordDescFlag.W_ASSIGNARRAY: "assign_array",
+    WordDescFlag.W_ARRAYIND: "array_index",
+    WordDescFlag.W_ASSNGLOBAL: "assign_global",
+    WordDescFlag.W_NOBRACE: "no_brace",
+    WordDescFlag.W_COMPLETE: "complete",
+    WordDescFlag.W_CHKLOCAL: "check_local",
+    WordDescFlag.W_FORCELOCAL: "force_local",
+}
 
 
 def word_desc_flag_list_from_int(flag_int: int) -> list[WordDescFlag]:
@@ -195,11 +269,7 @@ def word_desc_flag_list_from_int(flag_int: int) -> list[WordDescFlag]:
     :param flag_int: the integer value of the word description flag
     :return: a list of word description flags
     """
-    flag_list = []
-    for flag in WordDescFlag:
-        if flag_int & flag.value:
-            flag_list.append(flag)
-    return flag_list
+    return flag_list_from_int(WordDescFlag, flag_int)
 
 
 def int_from_word_desc_flag_list(flag_list: list[WordDescFlag]) -> int:
@@ -207,13 +277,10 @@ def int_from_word_desc_flag_list(flag_list: list[WordDescFlag]) -> int:
     :param flag_list: the list of word description flags
     :return: the integer value of the word description flag
     """
-    flag_int = 0
-    for flag in flag_list:
-        flag_int |= flag.value
-    return flag_int
+    return int_from_flag_list(flag_list)
 
 
-class CommandFlag(Enum):
+class CommandFlag(IntFlag):
     """
     represents command flags present in several command types
     """
@@ -235,56 +302,35 @@ class CommandFlag(Enum):
     CMD_STD_PATH = 1 << 14  # use default PATH for command lookup
     CMD_TRY_OPTIMIZING = 1 << 15  # try to optimize simple command
 
-    def __eq__(self, other):
-        """
-        :param other: the other CommandFlag
-        :return: True if the other CommandFlag is equal to this CommandFlag
-        """
-        if isinstance(other, CommandFlag):
-            return self.value == other.value
-        elif isinstance(other, int):
-            return self.value == other
-        else:
-            return False
-
     def _to_json(self) -> str:
         """
         :return: the string representation of the command flag
         """
-        if self == CommandFlag.CMD_WANT_SUBSHELL:
-            return "want_subshell"
-        elif self == CommandFlag.CMD_FORCE_SUBSHELL:
-            return "force_subshell"
-        elif self == CommandFlag.CMD_INVERT_RETURN:
-            return "invert_return"
-        elif self == CommandFlag.CMD_IGNORE_RETURN:
-            return "ignore_return"
-        elif self == CommandFlag.CMD_NO_FUNCTIONS:
-            return "no_functions"
-        elif self == CommandFlag.CMD_INHIBIT_EXPANSION:
-            return "inhibit_expansion"
-        elif self == CommandFlag.CMD_NO_FORK:
-            return "no_fork"
-        elif self == CommandFlag.CMD_TIME_PIPELINE:
-            return "time_pipeline"
-        elif self == CommandFlag.CMD_TIME_POSIX:
-            return "time_posix"
-        elif self == CommandFlag.CMD_AMPERSAND:
-            return "ampersand"
-        elif self == CommandFlag.CMD_STDIN_REDIRECTED:
-            return "stdin_redirected"
-        elif self == CommandFlag.CMD_COMMAND_BUILTIN:
-            return "command_builtin"
-        elif self == CommandFlag.CMD_COPROC_SHELL:
-            return "coproc_shell"
-        elif self == CommandFlag.CMD_LASTPIPE:
-            return "last_pipe"
-        elif self == CommandFlag.CMD_STD_PATH:
-            return "std_path"
-        elif self == CommandFlag.CMD_TRY_OPTIMIZING:
-            return "try_optimizing"
-        else:
-            raise Exception("invalid command flag")
+        try:
+            return _COMMAND_FLAG_NAMES[self]
+        except KeyError:
+            raise Exception("invalid command flag") from None
+
+
+# the name _to_json writes for each command flag
+_COMMAND_FLAG_NAMES: dict[CommandFlag, str] = {
+    CommandFlag.CMD_WANT_SUBSHELL: "want_subshell",
+    CommandFlag.CMD_FORCE_SUBSHELL: "force_subshell",
+    CommandFlag.CMD_INVERT_RETURN: "invert_return",
+    CommandFlag.CMD_IGNORE_RETURN: "ignore_return",
+    CommandFlag.CMD_NO_FUNCTIONS: "no_functions",
+    CommandFlag.CMD_INHIBIT_EXPANSION: "inhibit_expansion",
+    CommandFlag.CMD_NO_FORK: "no_fork",
+    CommandFlag.CMD_TIME_PIPELINE: "time_pipeline",
+    CommandFlag.CMD_TIME_POSIX: "time_posix",
+    CommandFlag.CMD_AMPERSAND: "ampersand",
+    CommandFlag.CMD_STDIN_REDIRECTED: "stdin_redirected",
+    CommandFlag.CMD_COMMAND_BUILTIN: "command_builtin",
+    CommandFlag.CMD_COPROC_SHELL: "coproc_shell",
+    CommandFlag.CMD_LASTPIPE: "last_pipe",
+    CommandFlag.CMD_STD_PATH: "std_path",
+    CommandFlag.CMD_TRY_OPTIMIZING: "try_optimizing",
+}
 
 
 def command_flag_list_from_int(flag_int: int) -> list[CommandFlag]:
@@ -292,11 +338,7 @@ def command_flag_list_from_int(flag_int: int) -> list[CommandFlag]:
     :param flag_int: the integer value of the command flag
     :return: a list of command flags
     """
-    flag_list = []
-    for flag in CommandFlag:
-        if flag_int & flag.value:
-            flag_list.append(flag)
-    return flag_list
+    return flag_list_from_int(CommandFlag, flag_int)
 
 
 def int_from_command_flag_list(flag_list: list[CommandFlag]) -> int:
@@ -304,10 +346,7 @@ def int_from_command_flag_list(flag_list: list[CommandFlag]) -> int:
     :param flag_list: the list of command flags
     :return: the integer value of the command flag
     """
-    flag_int = 0
-    for flag in flag_list:
-        flag_int |= flag.value
-    return flag_int
+    return int_from_flag_list(flag_list)
 
 
 class CommandType(Enum):
@@ -343,42 +382,41 @@ class CommandType(Enum):
         else:
             return False
 
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the value, so a CommandType hashes the same as the
+        int it is equal to
+        """
+        return hash(self.value)
+
     def _to_json(self) -> str:
         """
         :return: the string representation of the command type
         """
-        if self == CommandType.CM_FOR:
-            return "for"
-        elif self == CommandType.CM_CASE:
-            return "case"
-        elif self == CommandType.CM_WHILE:
-            return "while"
-        elif self == CommandType.CM_IF:
-            return "if"
-        elif self == CommandType.CM_SELECT:
-            return "select"
-        elif self == CommandType.CM_SIMPLE:
-            return "simple"
-        elif self == CommandType.CM_CONNECTION:
-            return "connection"
-        elif self == CommandType.CM_FUNCTION_DEF:
-            return "function_def"
-        elif self == CommandType.CM_UNTIL:
-            return "until"
-        elif self == CommandType.CM_GROUP:
-            return "group"
-        elif self == CommandType.CM_ARITH:
-            return "arithmetic"
-        elif self == CommandType.CM_COND:
-            return "conditional"
-        elif self == CommandType.CM_ARITH_FOR:
-            return "arithmetic_for"
-        elif self == CommandType.CM_SUBSHELL:
-            return "subshell"
-        elif self == CommandType.CM_COPROC:
-            return "coproc"
-        else:
-            raise Exception("invalid command type")
+        try:
+            return _COMMAND_TYPE_NAMES[self]
+        except KeyError:
+            raise Exception("invalid command type") from None
+
+
+# the name _to_json writes for each command type
+_COMMAND_TYPE_NAMES: dict[CommandType, str] = {
+    CommandType.CM_FOR: "for",
+    CommandType.CM_CASE: "case",
+    CommandType.CM_WHILE: "while",
+    CommandType.CM_IF: "if",
+    CommandType.CM_SIMPLE: "simple",
+    CommandType.CM_SELECT: "select",
+    CommandType.CM_CONNECTION: "connection",
+    CommandType.CM_FUNCTION_DEF: "function_def",
+    CommandType.CM_UNTIL: "until",
+    CommandType.CM_GROUP: "group",
+    CommandType.CM_ARITH: "arithmetic",
+    CommandType.CM_COND: "conditional",
+    CommandType.CM_ARITH_FOR: "arithmetic_for",
+    CommandType.CM_SUBSHELL: "subshell",
+    CommandType.CM_COPROC: "coproc",
+}
 
 
 class RInstruction(Enum):
@@ -419,52 +457,46 @@ class RInstruction(Enum):
         else:
             return False
 
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the value, so a RInstruction hashes the same as the
+        int it is equal to
+        """
+        return hash(self.value)
+
     def _to_json(self) -> str:
         """
         :return: the string representation of the redirection type
         """
-        if self == RInstruction.R_OUTPUT_DIRECTION:
-            return ">"
-        elif self == RInstruction.R_INPUT_DIRECTION:
-            return "<"
-        elif self == RInstruction.R_INPUTA_DIRECTION:
-            return "&"  # ?
-        elif self == RInstruction.R_APPENDING_TO:
-            return ">>"
-        elif self == RInstruction.R_READING_UNTIL:
-            return "<<"
-        elif self == RInstruction.R_READING_STRING:
-            return "<<<"
-        elif self == RInstruction.R_DUPLICATING_INPUT:
-            return "<&"
-        elif self == RInstruction.R_DUPLICATING_OUTPUT:
-            return ">&"
-        elif self == RInstruction.R_DEBLANK_READING_UNTIL:
-            return "<<-"
-        elif self == RInstruction.R_CLOSE_THIS:
-            return "<&-"
-        elif self == RInstruction.R_ERR_AND_OUT:
-            return "&>"
-        elif self == RInstruction.R_INPUT_OUTPUT:
-            return "<>"
-        elif self == RInstruction.R_OUTPUT_FORCE:
-            return ">|"
-        elif self == RInstruction.R_DUPLICATING_INPUT_WORD:
-            return "<&$"  # todo figure out if $ is needed
-        elif self == RInstruction.R_DUPLICATING_OUTPUT_WORD:
-            return ">&$"  # todo figure out if $ is needed
-        elif self == RInstruction.R_MOVE_INPUT:
-            return "<&-"
-        elif self == RInstruction.R_MOVE_OUTPUT:
-            return ">&-"
-        elif self == RInstruction.R_MOVE_INPUT_WORD:
-            return "<&$-"  # todo figure out if $ is needed
-        elif self == RInstruction.R_MOVE_OUTPUT_WORD:
-            return ">&$-"  # todo figure out if $ is needed
-        elif self == RInstruction.R_APPEND_ERR_AND_OUT:
-            return "&>>"
-        else:
-            raise Exception("invalid redirect instruction")
+        try:
+            return _R_INSTRUCTION_NAMES[self]
+        except KeyError:
+            raise Exception("invalid redirect instruction") from None
+
+
+# the name _to_json writes for each redirection instruction
+_R_INSTRUCTION_NAMES: dict[RInstruction, str] = {
+    RInstruction.R_OUTPUT_DIRECTION: ">",
+    RInstruction.R_INPUT_DIRECTION: "<",
+    RInstruction.R_INPUTA_DIRECTION: "&",  # ?
+    RInstruction.R_APPENDING_TO: ">>",
+    RInstruction.R_READING_UNTIL: "<<",
+    RInstruction.R_READING_STRING: "<<<",
+    RInstruction.R_DUPLICATING_INPUT: "<&",
+    RInstruction.R_DUPLICATING_OUTPUT: ">&",
+    RInstruction.R_DEBLANK_READING_UNTIL: "<<-",
+    RInstruction.R_CLOSE_THIS: "<&-",
+    RInstruction.R_ERR_AND_OUT: "&>",
+    RInstruction.R_INPUT_OUTPUT: "<>",
+    RInstruction.R_OUTPUT_FORCE: ">|",
+    RInstruction.R_DUPLICATING_INPUT_WORD: "<&$",  # todo figure out if $ is needed
+    RInstruction.R_DUPLICATING_OUTPUT_WORD: ">&$",  # todo figure out if $ is needed
+    RInstruction.R_MOVE_INPUT: "<&-",
+    RInstruction.R_MOVE_OUTPUT: ">&-",
+    RInstruction.R_MOVE_INPUT_WORD: "<&$-",  # todo figure out if $ is needed
+    RInstruction.R_MOVE_OUTPUT_WORD: ">&$-",  # todo figure out if $ is needed
+    RInstruction.R_APPEND_ERR_AND_OUT: "&>>",
+}
 
 
 class CondTypeEnum(Enum):
@@ -487,24 +519,32 @@ class CondTypeEnum(Enum):
         else:
             return False
 
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the value, so a CondTypeEnum hashes the same as the
+        int it is equal to
+        """
+        return hash(self.value)
+
     def _to_json(self) -> str:
         """
         :return: the string representation of the conditional expression type
         """
-        if self == CondTypeEnum.COND_AND:
-            return "and"
-        elif self == CondTypeEnum.COND_OR:
-            return "or"
-        elif self == CondTypeEnum.COND_UNARY:
-            return "unary"
-        elif self == CondTypeEnum.COND_BINARY:
-            return "binary"
-        elif self == CondTypeEnum.COND_TERM:
-            return "term"
-        elif self == CondTypeEnum.COND_EXPR:
-            return "expression"
-        else:
-            raise Exception("invalid conditional expression type")
+        try:
+            return _COND_TYPE_NAMES[self]
+        except KeyError:
+            raise Exception("invalid conditional expression type") from None
+
+
+# the name _to_json writes for each conditional expression type
+_COND_TYPE_NAMES: dict[CondTypeEnum, str] = {
+    CondTypeEnum.COND_AND: "and",
+    CondTypeEnum.COND_OR: "or",
+    CondTypeEnum.COND_UNARY: "unary",
+    CondTypeEnum.COND_BINARY: "binary",
+    CondTypeEnum.COND_TERM: "term",
+    CondTypeEnum.COND_EXPR: "expression",
+}
 
 
 class ConnectionType(Enum):
@@ -533,60 +573,62 @@ class ConnectionType(Enum):
         else:
             return False
 
+    def __hash__(self) -> int:
+        """
+        :return: the hash of the value, so a ConnectionType hashes the same as the
+        int it is equal to
+        """
+        return hash(self.value)
+
     def _to_json(self) -> str:
         """
         :return: the string representation of the connection type
         """
-        if self == ConnectionType.AMPERSAND:
-            return "&"
-        elif self == ConnectionType.SEMICOLON:
-            return ";"
-        elif self == ConnectionType.NEWLINE:
-            return "\n"
-        elif self == ConnectionType.PIPE:
-            return "|"
-        elif self == ConnectionType.AND_AND:
-            return "&&"
-        elif self == ConnectionType.OR_OR:
-            return "||"
-        else:
-            raise Exception("invalid connection type")
+        try:
+            return _CONNECTION_TYPE_NAMES[self]
+        except KeyError:
+            raise Exception("invalid connection type") from None
 
 
-class RedirectFlag(Enum):
+# the name _to_json writes for each connection type
+_CONNECTION_TYPE_NAMES: dict[ConnectionType, str] = {
+    ConnectionType.AMPERSAND: "&",
+    ConnectionType.SEMICOLON: ";",
+    ConnectionType.NEWLINE: "\n",
+    ConnectionType.PIPE: "|",
+    ConnectionType.AND_AND: "&&",
+    ConnectionType.OR_OR: "||",
+}
+
+
+class RedirectFlag(IntFlag):
     """
     a redirect flag enum
     """
 
     REDIR_VARASSIGN = 1 << 0
 
-    def __eq__(self, other: object) -> bool:
-        if isinstance(other, RedirectFlag):
-            return self.value == other.value
-        elif isinstance(other, int):
-            return self.value == other
-        else:
-            return False
-
     def _to_json(self) -> str:
         """
         :return: the string representation of the redirect flag
         """
-        if self == RedirectFlag.REDIR_VARASSIGN:
-            return "var_assign"
-        else:
-            raise Exception("invalid redirect flag")
+        try:
+            return _REDIRECT_FLAG_NAMES[self]
+        except KeyError:
+            raise Exception("invalid redirect flag") from None
+
+
+# the name _to_json writes for each redirect flag
+_REDIRECT_FLAG_NAMES: dict[RedirectFlag, str] = {
+    RedirectFlag.REDIR_VARASSIGN: "var_assign",
+}
 
 
 def redirect_flag_list_from_rflags(rflags: int) -> list[RedirectFlag]:
     """
     :param rflags: the integer value of the redirect flag
     """
-    flag_list = []
-    for flag in RedirectFlag:
-        if rflags & flag.value:
-            flag_list.append(flag)
-    return flag_list
+    return flag_list_from_int(RedirectFlag, rflags)
 
 
 def int_from_redirect_flag_list(flag_list: list[RedirectFlag]) -> int:
@@ -594,13 +636,10 @@ def int_from_redirect_flag_list(flag_list: list[RedirectFlag]) -> int:
     :param flag_list: the list of redirect flags
     :return: the integer value of the redirect flag
     """
-    flag_int = 0
-    for flag in flag_list:
-        flag_int |= flag.value
-    return flag_int
+    return int_from_flag_list(flag_list)
 
 
-class PatternFlag(Enum):
+class PatternFlag(IntFlag):
     """
     a pattern flag enum, present in the CasePattern class
     """
@@ -608,27 +647,21 @@ class PatternFlag(Enum):
     CASEPAT_FALLTHROUGH = 1 << 0  # fall through to next pattern
     CASEPAT_TESTNEXT = 1 << 1  # test next pattern
 
-    def __eq__(self, other: object) -> bool:
-        """
-        :param other: the other PatternFlag
-        """
-        if isinstance(other, PatternFlag):
-            return self.value == other.value
-        elif isinstance(other, int):
-            return self.value == other
-        else:
-            return False
-
     def _to_json(self) -> str:
         """
         :return: the string representation of the pattern flag
         """
-        if self == PatternFlag.CASEPAT_FALLTHROUGH:
-            return "fallthrough"
-        elif self == PatternFlag.CASEPAT_TESTNEXT:
-            return "test_next"
-        else:
-            raise Exception("invalid pattern flag")
+        try:
+            return _PATTERN_FLAG_NAMES[self]
+        except KeyError:
+            raise Exception("invalid pattern flag") from None
+
+
+# the name _to_json writes for each pattern flag
+_PATTERN_FLAG_NAMES: dict[PatternFlag, str] = {
+    PatternFlag.CASEPAT_FALLTHROUGH: "fallthrough",
+    PatternFlag.CASEPAT_TESTNEXT: "test_next",
+}
 
 
 def pattern_flag_list_from_int(flag_int: int) -> list[PatternFlag]:
@@ -636,11 +669,7 @@ def pattern_flag_list_from_int(flag_int: int) -> list[PatternFlag]:
     :param flag_int: the integer value of the pattern flag
     :return: a list of pattern flags
     """
-    flag_list = []
-    for flag in PatternFlag:
-        if flag_int & flag.value:
-            flag_list.append(flag)
-    return flag_list
+    return flag_list_from_int(PatternFlag, flag_int)
 
 
 def int_from_pattern_flag_list(flag_list: list[PatternFlag]) -> int:
@@ -648,7 +677,4 @@ def int_from_pattern_flag_list(flag_list: list[PatternFlag]) -> int:
     :param flag_list: the list of pattern flags
     :return: the integer value of the pattern flag
     """
-    flag_int = 0
-    for flag in flag_list:
-        flag_int |= flag.value
-    return flag_int
+    return int_from_flag_list(flag_list)
@@ -1,24 +1,44 @@
-def list_same_elements(l1: list, l2: list) -> bool:
+from typing import Callable, Hashable
+
+
+def list_same_elements(
+    l1: list, l2: list, key: Callable[[object], Hashable] = hash
+) -> bool:
     """
-    Checks if two lists are equal (order doesn't matter)
+    Checks if two lists are equal (order doesn't matter), in linear time
     :param l1: The first list
     :param l2: The second list
+    :param key: Gives a digest of an element, equal elements have equal digests
     :return: True if the lists are equal, false otherwise
     """
-    l1 = l1.copy()
-    l2 = l2.copy()
-
     if len(l1) != len(l2):
         return False
 
-    for i in l1:
-        found_match = False
-        for j in l2:
-            if i == j:
-                l2.remove(j)
-                found_match = True
+    # the lists usually are in the same order, so the elements are compared in
+    # order up to the first pair that differs
+    start = 0
+    for i, j in zip(l1, l2):
+        if i != j:
+            break
+        start += 1
+    if start == len(l1):
+        return True
+
+    # the rest of the second list is grouped by digest, and each element of the
+    # first list is compared with the elements of its group, from the end of the
+    # group, the first one compared is almost always equal to it
+    groups: dict = {}
+    for j in l2[start:]:
+        groups.setdefault(key(j), []).append(j)
+    for i in l1[start:]:
+        group = groups.get(key(i))
+        if not group:
+            return False
+        for index in range(len(group) - 1, -1, -1):
+            if group[index] == i:
+                del group[index]
                 break
-        if not found_match:
+        else:
             return False
 
     return True
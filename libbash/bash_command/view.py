@@ -0,0 +1,676 @@
+from __future__ import annotations
+
+from typing import Iterator, Optional
+from .. import ctypes_bash_command as c_bash
+from .flags import *
+from .command import (
+    ArithCom,
+    ArithForCom,
+    CaseCom,
+    Command,
+    CondCom,
+    Connection,
+    CoprocCom,
+    ForCom,
+    FunctionDef,
+    GroupCom,
+    IfCom,
+    Pattern,
+    Redirect,
+    RedirecteeUnion,
+    SelectCom,
+    SimpleCom,
+    SubshellCom,
+    ValueUnion,
+    WhileCom,
+    WordDesc,
+)
+
+
+class _View:
+    """
+    the base of the view classes, a view has the same attributes as the node class
+    it mirrors but reads them from the c struct each time they are accessed rather
+    than copying them. Views are read-only and only valid while the parse session
+    owning the structs is open
+    """
+
+    __slots__ = ("_struct", "_session")
+
+    _node_class: type  # the node class the view mirrors
+
+    def __init__(self, struct, session):
+        """
+        :param struct: the c struct to read from
+        :param session: the parse session owning the struct
+        """
+        self._struct = struct
+        self._session = session
+
+    def _contents(self):
+        """
+        :return: the c struct, if it hasn't been freed
+        """
+        if self._session.closed:
+            raise RuntimeError("The parse session of this view has been closed")
+        return self._struct
+
+    def to_node(self):
+        """
+        :return: a copy of the struct as a node, owned by python and valid after
+        the parse session is closed
+        """
+        return self._node_class(self._contents())
+
+
+def _field(c_name: str) -> property:
+    """
+    :param c_name: the name of the struct field
+    :return: a property reading the field as is
+    """
+    return property(lambda self: getattr(self._contents(), c_name))
+
+
+def _text_field(c_name: str) -> property:
+    """
+    :param c_name: the name of a char * struct field
+    :return: a property reading the field decoded, or None if it is null
+    """
+
+    def get(self) -> Optional[str]:
+        text = getattr(self._contents(), c_name)
+        return text.decode("utf-8") if text is not None else None
+
+    return property(get)
+
+
+def _flag_bits_field(c_name: str, flag_type: type) -> property:
+    """
+    :param c_name: the name of the struct field holding the flags
+    :param flag_type: the flag enum
+    :return: a property reading the flags as a single flag value
+    """
+    return property(
+        lambda self: flag_bits_from_int(flag_type, getattr(self._contents(), c_name))
+    )
+
+
+def _flags_field(c_name: str, flag_type: type) -> property:
+    """
+    :param c_name: the name of the struct field holding the flags
+    :param flag_type: the flag enum
+    :return: a property reading the flags as a list
+    """
+    return property(
+        lambda self: flag_list_from_int(flag_type, getattr(self._contents(), c_name))
+    )
+
+
+def _enum_field(c_name: str, enum_type: type) -> property:
+    """
+    :param c_name: the name of the struct field
+    :param enum_type: the enum the field holds a value of
+    :return: a property reading the field as an enum member
+    """
+    return property(lambda self: enum_type(getattr(self._contents(), c_name)))
+
+
+def _child_field(c_name: str, view_type: str) -> property:
+    """
+    :param c_name: the name of the struct field pointing to the child
+    :param view_type: the name of the view class of the child
+    :return: a property reading the child as a view, or None if it is null
+    """
+
+    def get(self):
+        pointer = getattr(self._contents(), c_name)
+        if not pointer:
+            return None
+        return _VIEW_TYPES[view_type](pointer.contents, self._session)
+
+    return property(get)
+
+
+def _list_field(c_name: str, view_type: str, item_name: Optional[str]) -> property:
+    """
+    :param c_name: the name of the struct field pointing to the linked list
+    :param view_type: the name of the view class of the items
+    :param item_name: the name of the list cell field pointing to the item, or
+    None if the cells are the items themselves
+    :return: a property reading the list as a ListView
+    """
+    return property(
+        lambda self: ListView(
+            getattr(self._contents(), c_name),
+            _VIEW_TYPES[view_type],
+            item_name,
+            self._session,
+        )
+    )
+
+
+class ListView:
+    """
+    a read-only view of a linked list of structs, such as a word_list. The items
+    are read each time the list is iterated over, which walks the linked list
+    """
+
+    __slots__ = ("_head", "_view_type", "_item_name", "_session")
+
+    def __init__(self, head, view_type: type, item_name: Optional[str], session):
+        """
+        :param head: a pointer to the first cell of the list, null if it is empty
+        :param view_type: the view class of the items
+        :param item_name: the name of the cell field pointing to the item, or
+        None if the cells are the items themselves
+        :param session: the parse session owning the structs
+        """
+        self._head = head
+        self._view_type = view_type
+        self._item_name = item_name
+        self._session = session
+
+    def __iter__(self) -> Iterator[_View]:
+        """
+        :return: an iterator over views of the items
+        """
+        cell = self._head
+        view_type = self._view_type
+        item_name = self._item_name
+        session = self._session
+        while cell:
+            if session.closed:
+                raise RuntimeError("The parse session of this view has been closed")
+            contents = cell.contents
+            item = getattr(contents, item_name).contents if item_name else contents
+            yield view_type(item, session)
+            cell = contents.next
+
+    def __len__(self) -> int:
+        """
+        :return: the number of items, counted by walking the list
+        """
+        return sum(1 for _ in self)
+
+    def __bool__(self) -> bool:
+        """
+        :return: whether the list has any items
+        """
+        return bool(self._head)
+
+    def __getitem__(self, index: int) -> _View:
+        """
+        :param index: the index of the item, negative indexes count from the end
+        :return: a view of the item, found by walking the list
+        """
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for i, item in enumerate(self):
+                if i == index:
+                    return item
+        raise IndexError("list index out of range")
+
+    def to_nodes(self) -> list:
+        """
+        :return: copies of the items as nodes, see _View.to_node
+        """
+        return [item.to_node() for item in self]
+
+
+class WordDescView(_View):
+    """
+    a read-only view of a word_desc struct, see WordDesc
+    """
+
+    __slots__ = ()
+    _node_class = WordDesc
+
+    word: bytes = _field("word")
+    flag_bits: WordDescFlag = _flag_bits_field("flags", WordDescFlag)
+    flags: list[WordDescFlag] = _flags_field("flags", WordDescFlag)
+
+
+class RedirecteeView(_View):
+    """
+    a read-only view of a REDIRECTEE union, see RedirecteeUnion. Whether the
+    union holds a file descriptor or a word depends on the redirect it is in
+    """
+
+    __slots__ = ("_is_filename",)
+    _node_class = RedirecteeUnion
+
+    def __init__(self, struct: c_bash.REDIRECTEE, session, is_filename: bool):
+        """
+        :param struct: the union
+        :param session: the parse session owning the union
+        :param is_filename: whether the union holds a word rather than a file
+        descriptor
+        """
+        super().__init__(struct, session)
+        self._is_filename = is_filename
+
+    @property
+    def dest(self) -> Optional[int]:
+        """
+        :return: the file descriptor, if the union holds one
+        """
+        contents = self._contents()
+        return None if self._is_filename else contents.dest
+
+    @property
+    def filename(self) -> Optional[WordDescView]:
+        """
+        :return: a view of the word, if the union holds one
+        """
+        contents = self._contents()
+        if not self._is_filename or not contents.filename:
+            return None
+        return WordDescView(contents.filename.contents, self._session)
+
+    def to_node(self):
+        """
+        :return: a copy of the union as a node, see _View.to_node
+        """
+        contents = self._contents()
+        if self._is_filename:
+            return RedirecteeUnion(None, contents.filename.contents)
+        return RedirecteeUnion(contents.dest, None)
+
+
+# the redirect instructions whose redirectee is a file descriptor
+_DESCRIPTOR_INSTRUCTIONS = (
+    RInstruction.R_DUPLICATING_INPUT,
+    RInstruction.R_DUPLICATING_OUTPUT,
+    RInstruction.R_CLOSE_THIS,
+    RInstruction.R_MOVE_INPUT,
+    RInstruction.R_MOVE_OUTPUT,
+)
+
+
+class RedirectView(_View):
+    """
+    a read-only view of a redirect struct, see Redirect
+    """
+
+    __slots__ = ()
+    _node_class = Redirect
+
+    rflag_bits: RedirectFlag = _flag_bits_field("rflags", RedirectFlag)
+    rflags: list[RedirectFlag] = _flags_field("rflags", RedirectFlag)
+    flag_bits: OFlag = _flag_bits_field("flags", OFlag)
+    flags: list[OFlag] = _flags_field("flags", OFlag)
+    instruction: RInstruction = _enum_field("instruction", RInstruction)
+    here_doc_eof: Optional[str] = _text_field("here_doc_eof")
+
+    @property
+    def redirector(self) -> RedirecteeView:
+        """
+        :return: a view of the redirector
+        """
+        contents = self._contents()
+        is_filename = bool(contents.rflags & RedirectFlag.REDIR_VARASSIGN)
+        return RedirecteeView(contents.redirector, self._session, is_filename)
+
+    @property
+    def redirectee(self) -> RedirecteeView:
+        """
+        :return: a view of the redirectee
+        """
+        contents = self._contents()
+        is_filename = RInstruction(contents.instruction) not in _DESCRIPTOR_INSTRUCTIONS
+        return RedirecteeView(contents.redirectee, self._session, is_filename)
+
+
+class ForComView(_View):
+    """
+    a read-only view of a for_com struct, see ForCom
+    """
+
+    __slots__ = ()
+    _node_class = ForCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    line: int = _field("line")
+    name: WordDescView = _child_field("name", "WordDescView")
+    map_list: ListView = _list_field("map_list", "WordDescView", "word")
+    action: CommandView = _child_field("action", "CommandView")
+
+
+class PatternView(_View):
+    """
+    a read-only view of a pattern_list struct, see Pattern
+    """
+
+    __slots__ = ()
+    _node_class = Pattern
+
+    patterns: ListView = _list_field("patterns", "WordDescView", "word")
+    action: Optional[CommandView] = _child_field("action", "CommandView")
+    flag_bits: PatternFlag = _flag_bits_field("flags", PatternFlag)
+    flags: list[PatternFlag] = _flags_field("flags", PatternFlag)
+
+
+class CaseComView(_View):
+    """
+    a read-only view of a case_com struct, see CaseCom
+    """
+
+    __slots__ = ()
+    _node_class = CaseCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    line: int = _field("line")
+    word: WordDescView = _child_field("word", "WordDescView")
+    clauses: ListView = _list_field("clauses", "PatternView", None)
+
+
+class WhileComView(_View):
+    """
+    a read-only view of a while_com struct, see WhileCom
+    """
+
+    __slots__ = ()
+    _node_class = WhileCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    test: CommandView = _child_field("test", "CommandView")
+    action: CommandView = _child_field("action", "CommandView")
+
+
+class IfComView(_View):
+    """
+    a read-only view of an if_com struct, see IfCom
+    """
+
+    __slots__ = ()
+    _node_class = IfCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    test: CommandView = _child_field("test", "CommandView")
+    true_case: CommandView = _child_field("true_case", "CommandView")
+    false_case: Optional[CommandView] = _child_field("false_case", "CommandView")
+
+
+class ConnectionView(_View):
+    """
+    a read-only view of a connection struct, see Connection
+    """
+
+    __slots__ = ()
+    _node_class = Connection
+
+    flag_bits: CommandFlag = _flag_bits_field("ignore", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("ignore", CommandFlag)
+    first: CommandView = _child_field("first", "CommandView")
+    second: Optional[CommandView] = _child_field("second", "CommandView")
+    connector: ConnectionType = _enum_field("connector", ConnectionType)
+
+
+class SimpleComView(_View):
+    """
+    a read-only view of a simple_com struct, see SimpleCom
+    """
+
+    __slots__ = ()
+    _node_class = SimpleCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    line: int = _field("line")
+    words: ListView = _list_field("words", "WordDescView", "word")
+    redirects: ListView = _list_field("redirects", "RedirectView", None)
+
+
+class FunctionDefView(_View):
+    """
+    a read-only view of a function_def struct, see FunctionDef
+    """
+
+    __slots__ = ()
+    _node_class = FunctionDef
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    line: int = _field("line")
+    name: WordDescView = _child_field("name", "WordDescView")
+    command: CommandView = _child_field("command", "CommandView")
+    source_file: Optional[str] = _text_field("source_file")
+
+
+class GroupComView(_View):
+    """
+    a read-only view of a group_com struct, see GroupCom
+    """
+
+    __slots__ = ()
+    _node_class = GroupCom
+
+    flag_bits: CommandFlag = _flag_bits_field("ignore", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("ignore", CommandFlag)
+    command: CommandView = _child_field("command", "CommandView")
+
+
+class SelectComView(_View):
+    """
+    a read-only view of a select_com struct, see SelectCom
+    """
+
+    __slots__ = ()
+    _node_class = SelectCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    line: int = _field("line")
+    name: WordDescView = _child_field("name", "WordDescView")
+    map_list: ListView = _list_field("map_list", "WordDescView", "word")
+    action: CommandView = _child_field("action", "CommandView")
+
+
+class ArithComView(_View):
+    """
+    a read-only view of an arith_com struct, see ArithCom
+    """
+
+    __slots__ = ()
+    _node_class = ArithCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    line: int = _field("line")
+    exp: ListView = _list_field("exp", "WordDescView", "word")
+
+
+class CondComView(_View):
+    """
+    a read-only view of a cond_com struct, see CondCom
+    """
+
+    __slots__ = ()
+    _node_class = CondCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    line: int = _field("line")
+    type: CondTypeEnum = _enum_field("type", CondTypeEnum)
+    op: Optional[WordDescView] = _child_field("op", "WordDescView")
+    left: Optional[CondComView] = _child_field("left", "CondComView")
+    right: Optional[CondComView] = _child_field("right", "CondComView")
+
+
+class ArithForComView(_View):
+    """
+    a read-only view of an arith_for_com struct, see ArithForCom
+    """
+
+    __slots__ = ()
+    _node_class = ArithForCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    line: int = _field("line")
+    init: ListView = _list_field("init", "WordDescView", "word")
+    test: ListView = _list_field("test", "WordDescView", "word")
+    step: ListView = _list_field("step", "WordDescView", "word")
+    action: CommandView = _child_field("action", "CommandView")
+
+
+class SubshellComView(_View):
+    """
+    a read-only view of a subshell_com struct, see SubshellCom
+    """
+
+    __slots__ = ()
+    _node_class = SubshellCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    line: int = _field("line")
+    command: CommandView = _child_field("command", "CommandView")
+
+
+class CoprocComView(_View):
+    """
+    a read-only view of a coproc_com struct, see CoprocCom
+    """
+
+    __slots__ = ()
+    _node_class = CoprocCom
+
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    name: str = _text_field("name")
+    command: CommandView = _child_field("command", "CommandView")
+
+
+# the value union attribute, c union member and view class of each command type
+_VALUE_UNION_VIEWS = {
+    CommandType.CM_FOR: ("for_com", "For", ForComView),
+    CommandType.CM_CASE: ("case_com", "Case", CaseComView),
+    CommandType.CM_WHILE: ("while_com", "While", WhileComView),
+    CommandType.CM_IF: ("if_com", "If", IfComView),
+    CommandType.CM_CONNECTION: ("connection", "Connection", ConnectionView),
+    CommandType.CM_SIMPLE: ("simple_com", "Simple", SimpleComView),
+    CommandType.CM_FUNCTION_DEF: ("function_def", "Function_def", FunctionDefView),
+    CommandType.CM_UNTIL: ("while_com", "While", WhileComView),
+    CommandType.CM_GROUP: ("group_com", "Group", GroupComView),
+    CommandType.CM_SELECT: ("select_com", "Select", SelectComView),
+    CommandType.CM_ARITH: ("arith_com", "Arith", ArithComView),
+    CommandType.CM_COND: ("cond_com", "Cond", CondComView),
+    CommandType.CM_ARITH_FOR: ("arith_for_com", "ArithFor", ArithForComView),
+    CommandType.CM_SUBSHELL: ("subshell_com", "Subshell", SubshellComView),
+    CommandType.CM_COPROC: ("coproc_com", "Coproc", CoprocComView),
+}
+
+
+def _value_union_view_variant(kind: str) -> property:
+    """
+    :param kind: the name of a value union attribute, such as for_com
+    :return: a property reading that attribute of a value union view
+    """
+    return property(lambda self: self.node if self.kind == kind else None)
+
+
+class ValueUnionView(_View):
+    """
+    a read-only view of the value union of a command struct, see ValueUnion.
+    It is read from the command struct, whose type tells which member is set
+    """
+
+    __slots__ = ()
+
+    for_com: Optional[ForComView] = _value_union_view_variant("for_com")
+    case_com: Optional[CaseComView] = _value_union_view_variant("case_com")
+    while_com: Optional[WhileComView] = _value_union_view_variant("while_com")
+    if_com: Optional[IfComView] = _value_union_view_variant("if_com")
+    connection: Optional[ConnectionView] = _value_union_view_variant("connection")
+    simple_com: Optional[SimpleComView] = _value_union_view_variant("simple_com")
+    function_def: Optional[FunctionDefView] = _value_union_view_variant(
+        "function_def"
+    )
+    group_com: Optional[GroupComView] = _value_union_view_variant("group_com")
+    select_com: Optional[SelectComView] = _value_union_view_variant("select_com")
+    arith_com: Optional[ArithComView] = _value_union_view_variant("arith_com")
+    cond_com: Optional[CondComView] = _value_union_view_variant("cond_com")
+    arith_for_com: Optional[ArithForComView] = _value_union_view_variant(
+        "arith_for_com"
+    )
+    subshell_com: Optional[SubshellComView] = _value_union_view_variant(
+        "subshell_com"
+    )
+    coproc_com: Optional[CoprocComView] = _value_union_view_variant("coproc_com")
+
+    @property
+    def kind(self) -> str:
+        """
+        :return: the name of the attribute that is set, such as "simple_com"
+        """
+        return _VALUE_UNION_VIEWS[CommandType(self._contents().type)][0]
+
+    @property
+    def node(self) -> _View:
+        """
+        :return: a view of the member that is set
+        """
+        contents = self._contents()
+        _, c_member, view_type = _VALUE_UNION_VIEWS[CommandType(contents.type)]
+        return view_type(getattr(contents.value, c_member).contents, self._session)
+
+    def to_node(self) -> ValueUnion:
+        """
+        :return: a copy of the value union as a node, see _View.to_node
+        """
+        contents = self._contents()
+        return ValueUnion(CommandType(contents.type), contents.value)
+
+
+class CommandView(_View):
+    """
+    a read-only view of a command struct, see Command
+    """
+
+    __slots__ = ()
+    _node_class = Command
+
+    type: CommandType = _enum_field("type", CommandType)
+    flag_bits: CommandFlag = _flag_bits_field("flags", CommandFlag)
+    flags: list[CommandFlag] = _flags_field("flags", CommandFlag)
+    redirects: ListView = _list_field("redirects", "RedirectView", None)
+
+    @property
+    def value(self) -> ValueUnionView:
+        """
+        :return: a view of the value union
+        """
+        return ValueUnionView(self._contents(), self._session)
+
+
+# the view classes by name, fields refer to them by name since they can refer
+# to classes defined after them
+_VIEW_TYPES: dict[str, type] = {
+    view_type.__name__: view_type
+    for view_type in (
+        WordDescView,
+        RedirectView,
+        ForComView,
+        PatternView,
+        CaseComView,
+        WhileComView,
+        IfComView,
+        ConnectionView,
+        SimpleComView,
+        FunctionDefView,
+        GroupComView,
+        SelectComView,
+        ArithComView,
+        CondComView,
+        ArithForComView,
+        SubshellComView,
+        CoprocComView,
+        CommandView,
+    )
+}
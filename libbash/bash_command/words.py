@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Optional
+
+# how many distinct words the shared word table holds at most
+_MAX_WORDS = 1 << 16
+# the longest word the shared word table interns, longer words seldom repeat
+_MAX_WORD_LENGTH = 256
+
+
+class WordTable:
+    """
+    An intern table of the words of the ASTs, so the words that are equal share one
+    bytes object rather than each word description holding its own copy, and each
+    word has an id that serializers and indexes can refer to it by.
+
+    The table is bounded: once it holds max_words words, the least recently used
+    word is evicted to make room for a new one, so the words in use stay interned
+    in a long running process. Words longer than max_length are handed back as
+    they are and get no id. Ids are never reused, the id of a word that was
+    evicted or cleared raises a KeyError rather than giving another word back,
+    the word gets a new id if it is interned again.
+    """
+
+    __slots__ = ("max_words", "max_length", "evictions", "_ids", "_words", "_next_id")
+
+    max_words: int  # how many words the table holds at most
+    max_length: int  # the longest word the table interns
+    evictions: int  # number of words evicted to stay under max_words
+    _ids: OrderedDict[bytes, int]  # the id of each word, least recently used first
+    _words: dict[int, bytes]  # the word of each id
+    _next_id: int  # the id the next word added gets
+
+    def __init__(self, max_words: int = _MAX_WORDS, max_length: int = _MAX_WORD_LENGTH):
+        """
+        :param max_words: how many words the table holds at most
+        :param max_length: the longest word the table interns
+        """
+        self.max_words = max_words
+        self.max_length = max_length
+        self.evictions = 0
+        self._ids = OrderedDict()
+        self._words = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        """
+        :return: the number of words in the table
+        """
+        return len(self._ids)
+
+    def __contains__(self, word: bytes) -> bool:
+        """
+        :param word: a word
+        :return: whether the word is in the table
+        """
+        return word in self._ids
+
+    def word_id(self, word: bytes) -> Optional[int]:
+        """
+        :param word: a word
+        :return: the id of the word, which is added to the table if it isn't in it
+        yet, or None if the word doesn't fit in the table
+        """
+        ids = self._ids
+        word_id = ids.get(word)
+        if word_id is not None:
+            ids.move_to_end(word)
+            return word_id
+        if len(word) > self.max_length or self.max_words <= 0:
+            return None
+        while len(ids) >= self.max_words:
+            _, evicted = ids.popitem(last=False)
+            del self._words[evicted]
+            self.evictions += 1
+        word = bytes(word)
+        word_id = ids[word] = self._next_id
+        self._words[word_id] = word
+        self._next_id += 1
+        return word_id
+
+    def intern(self, word: bytes) -> bytes:
+        """
+        :param word: a word
+        :return: the bytes object of the table equal to the word, or the word
+        itself if it doesn't fit in the table
+        """
+        word_id = self.word_id(word)
+        return word if word_id is None else self._words[word_id]
+
+    def word(self, word_id: int) -> bytes:
+        """
+        :param word_id: the id of a word in the table
+        :return: the word
+        """
+        try:
+            return self._words[word_id]
+        except KeyError:
+            raise KeyError(
+                f"Word id {word_id} is not in the table, it was evicted or cleared"
+            ) from None
+
+    def clear(self):
+        """
+        Empties the table. The ids handed out before are no longer valid, looking
+        them up raises a KeyError, and the words already interned stay shared by
+        the nodes holding them.
+        """
+        self._ids = OrderedDict()
+        self._words = {}
+
+
+# the word table the word descriptions of every AST are interned in
+word_table = WordTable()
@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+import tempfile
+
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+from .api import BASH_FILE_PATH, bash_to_ast_from_bytes
+from .lines import LineIndex
+from .bash_command import Command
+from .serialize import _FORMAT_VERSION, ast_to_bytes, bytes_to_ast
+
+# file extension of the cache entries
+_ENTRY_SUFFIX = ".ast"
+
+_version_tag: Optional[bytes] = None
+
+
+def _get_version_tag() -> bytes:
+    """
+    :return: a tag identifying the libbash version, the bash.so build and the
+    serialization format, any of these changing invalidates the cached ASTs
+    """
+    global _version_tag
+    if _version_tag is None:
+        try:
+            from importlib.metadata import PackageNotFoundError, version
+
+            libbash_version = version("libbash")
+        except (ImportError, PackageNotFoundError):
+            libbash_version = "unknown"
+
+        bash_hash = hashlib.sha256()
+        try:
+            with open(BASH_FILE_PATH, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    bash_hash.update(chunk)
+        except OSError:
+            bash_hash.update(b"missing")
+
+        _version_tag = (
+            f"libbash {libbash_version}\0"
+            f"bash.so {bash_hash.hexdigest()}\0"
+            f"format {_FORMAT_VERSION}\0"
+        ).encode("utf-8")
+    return _version_tag
+
+
+class ParseCache:
+    """
+    a content addressed on-disk cache of parsed ASTs, entries are keyed by a
+    hash of the script bytes and the libbash and bash.so versions, and the least
+    recently used entries are evicted once the cache grows past max_bytes
+    """
+
+    directory: str  # where the cache entries are stored
+    max_bytes: Optional[int]  # the size cap of the cache, None for no cap
+    hits: int  # number of lookups answered from the cache
+    misses: int  # number of lookups that had to parse the script
+    evictions: int  # number of entries evicted to stay under max_bytes
+
+    def __init__(self, directory: str, max_bytes: Optional[int] = None):
+        """
+        :param directory: where the cache entries are stored, created if missing
+        :param max_bytes: the size cap of the cache in bytes, None for no cap
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # total size of the entries, computed on the first write
+        self._size: Optional[int] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source: bytes) -> str:
+        """
+        :param source: the bash source code
+        :return: the key the AST of the source is stored under
+        """
+        return hashlib.sha256(_get_version_tag() + source).hexdigest()
+
+    def _path(self, key: str) -> str:
+        """
+        :param key: the key of an entry
+        :return: the path of the entry, entries are spread over subdirectories
+        """
+        return os.path.join(self.directory, key[:2], key + _ENTRY_SUFFIX)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        :param key: the key of an entry
+        :return: the stored entry, or None if there is none
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # the modification time is what the least recently used entry is
+            # decided by
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes):
+        """
+        Stores an entry, evicting the least recently used entries if the cache
+        grows past max_bytes.
+        :param key: the key of the entry
+        :param data: the entry
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if self._size is None:
+            self._size = sum(os.path.getsize(entry) for entry, _ in self._entries())
+
+        # an entry written over replaces the old one, which no longer counts
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+
+        # write then rename, so other processes never see half written entries
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._size += len(data) - old_size
+
+        if self.max_bytes is not None and self._size > self.max_bytes:
+            self._evict()
+
+    def discard(self, key: str):
+        """
+        Deletes an entry, if there is one.
+        :param key: the key of the entry
+        """
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+        except OSError:
+            return
+        if self._size is not None:
+            self._size -= size
+
+    def _entries(self) -> list[tuple[str, float]]:
+        """
+        :return: the path and modification time of every entry
+        """
+        entries = []
+        for subdirectory in os.scandir(self.directory):
+            if not subdirectory.is_dir():
+                continue
+            for entry in os.scandir(subdirectory.path):
+                if entry.name.endswith(_ENTRY_SUFFIX):
+                    entries.append((entry.path, entry.stat().st_mtime))
+        return entries
+
+    def _evict(self):
+        """
+        Deletes the least recently used entries until the cache is well under
+        max_bytes, so the directory isn't scanned again on every write.
+        """
+        target = self.max_bytes * 9 // 10
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._size = sum(os.path.getsize(path) for path, _ in entries)
+        for path, _ in entries:
+            if self._size <= target:
+                break
+            try:
+                size = os.path.getsize(path)
+                os.unlink(path)
+            except OSError:
+                continue
+            self._size -= size
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Deletes every entry in the cache.
+        """
+        for path, _ in self._entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        self._size = 0
+
+    def bash_to_ast(
+        self, bash_file: str, with_linno_info: bool = False
+    ) -> list[Command] | list[tuple[Command, bytes, int, int]]:
+        """
+        The same as bash_to_ast, but answered from the cache if the file was
+        parsed before. A cache hit skips bash and the construction of the AST
+        from the c structs entirely.
+
+        :param bash_file: The path to the bash file to parse
+        :param with_linno_info: If true, the line numbers of the commands will be returned
+        :return: The AST of the bash script
+        """
+        with open(bash_file, "rb") as f:
+            source = f.read()
+        return self.bash_to_ast_from_bytes(source, with_linno_info)
+
+    def bash_to_ast_from_bytes(
+        self, data: bytes, with_linno_info: bool = False
+    ) -> list[Command] | list[tuple[Command, bytes, int, int]]:
+        """
+        The same as bash_to_ast_from_bytes, but answered from the cache if the
+        source was parsed before.
+
+        :param data: The bash source code
+        :param with_linno_info: If true, the line numbers of the commands will be returned
+        :return: The AST of the bash script
+        """
+        key = self.key(data)
+        entry = self.get(key)
+        ast = None
+        if entry is not None:
+            try:
+                linno_list, ast_data = marshal.loads(entry)
+                ast = bytes_to_ast(ast_data)
+            except (EOFError, ValueError, TypeError):
+                # a truncated or corrupt entry mustn't break the parse, it is
+                # deleted and the script parsed again
+                self.discard(key)
+                ast = None
+        if ast is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            # the line numbers are always stored so one entry serves both modes
+            parsed = bash_to_ast_from_bytes(data, with_linno_info=True)
+            ast = [command for command, _, _, _ in parsed]
+            linno_list = [
+                (linno_before, linno_after) for _, _, linno_before, linno_after in parsed
+            ]
+            self.put(key, marshal.dumps((linno_list, ast_to_bytes(ast))))
+
+        if not with_linno_info:
+            return ast
+
+        lines = LineIndex(data)
+        return [
+            (command, lines.slice(linno_before, linno_after), linno_before, linno_after)
+            for command, (linno_before, linno_after) in zip(ast, linno_list)
+        ]
+
+
+class MemoryCache:
+    """
+    a bounded in-memory least recently used cache of parsed ASTs, for long
+    running processes that keep asking for the same scripts. Entries are held
+    in serialized form, so every hit hands out a fresh copy of the AST and
+    callers can't corrupt what is cached
+    """
+
+    max_entries: int  # the maximum number of entries held
+    max_bytes: Optional[int]  # the maximum size of the entries held, None for no cap
+    disk_cache: Optional[ParseCache]  # where misses are looked up before parsing
+    hits: int  # number of lookups answered from the cache
+    misses: int  # number of lookups that had to parse the script
+    evictions: int  # number of entries evicted to stay under the caps
+    bytes_held: int  # the size of the entries held
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: Optional[int] = None,
+        disk_cache: Optional[ParseCache] = None,
+    ):
+        """
+        :param max_entries: the maximum number of entries held
+        :param max_bytes: the maximum size of the entries held in bytes, None for no cap
+        :param disk_cache: an on-disk cache to look misses up in before parsing
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_cache = disk_cache
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_held = 0
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        """
+        :return: the number of entries held
+        """
+        return len(self._entries)
+
+    def clear(self):
+        """
+        Drops every entry.
+        """
+        self._entries.clear()
+        self.bytes_held = 0
+
+    def bash_to_ast(
+        self, bash_file: str, with_linno_info: bool = False
+    ) -> list[Command] | list[tuple[Command, bytes, int, int]]:
+        """
+        The same as bash_to_ast, but answered from the cache if the file was
+        parsed before. Files are looked up by path, modification time and size,
+        so a hit doesn't even read the file.
+
+        :param bash_file: The path to the bash file to parse
+        :param with_linno_info: If true, the line numbers of the commands will be returned
+        :return: The AST of the bash script
+        """
+        stat = os.stat(bash_file)
+        key = (os.path.abspath(bash_file), stat.st_mtime_ns, stat.st_size)
+
+        def read_source() -> bytes:
+            with open(bash_file, "rb") as f:
+                return f.read()
+
+        return self._lookup(key, read_source, with_linno_info)
+
+    def bash_to_ast_from_bytes(
+        self, data: bytes, with_linno_info: bool = False
+    ) -> list[Command] | list[tuple[Command, bytes, int, int]]:
+        """
+        The same as bash_to_ast_from_bytes, but answered from the cache if the
+        source was parsed before. Sources are looked up by a hash of their content.
+
+        :param data: The bash source code
+        :param with_linno_info: If true, the line numbers of the commands will be returned
+        :return: The AST of the bash script
+        """
+        return self._lookup(hashlib.sha256(data).digest(), lambda: data, with_linno_info)
+
+    def _lookup(
+        self, key: Hashable, read_source: Callable[[], bytes], with_linno_info: bool
+    ) -> list[Command] | list[tuple[Command, bytes, int, int]]:
+        """
+        :param key: the key of the entry
+        :param read_source: returns the bash source code, called on a miss
+        :param with_linno_info: If true, the line numbers of the commands will be returned
+        :return: The AST of the bash script
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            linno_list, ast_data = marshal.loads(entry)
+            ast = bytes_to_ast(ast_data)
+            if not with_linno_info:
+                return ast
+            return [(command, *info) for command, info in zip(ast, linno_list)]
+
+        self.misses += 1
+        source = read_source()
+        if self.disk_cache is not None:
+            parsed = self.disk_cache.bash_to_ast_from_bytes(source, with_linno_info=True)
+        else:
+            parsed = bash_to_ast_from_bytes(source, with_linno_info=True)
+        ast = [command for command, _, _, _ in parsed]
+        # the command strings are stored as well, the source isn't kept around
+        linno_list = [linno_info for _, *linno_info in parsed]
+        self._store(key, marshal.dumps((linno_list, ast_to_bytes(ast))))
+
+        # the caller gets the freshly parsed AST, the cache holds its own copy
+        return parsed if with_linno_info else ast
+
+    def _store(self, key: Hashable, entry: bytes):
+        """
+        Stores an entry, evicting the least recently used entries to stay under the caps.
+        :param key: the key of the entry
+        :param entry: the serialized AST
+        """
+        if self.max_bytes is not None and len(entry) > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.bytes_held += len(entry)
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes_held > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes_held -= len(evicted)
+            self.evictions += 1
@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import json
+from json.encoder import encode_basestring_ascii
+
+from typing import Iterator, List, Union
+
+from .bash_command import *
+
+# how many characters of JSON text are gathered before they are handed out
+_CHUNK_SIZE = 1 << 16
+
+# the JSON text of the names of each set of flags, by flag type and bits
+_FLAG_TEXTS: dict[tuple[type, int], str] = {}
+
+
+def _value(value: Union[str, int, None]) -> str:
+    """
+    :param value: a str, an int or None
+    :return: the JSON text json.dumps writes for the value
+    """
+    if value is None:
+        return "null"
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        # flags written as ints are plain ints, the same as json.dumps writes
+        return int.__repr__(value)
+    return json.dumps(value)
+
+
+def _flag_names(flag_bits: IntFlag) -> str:
+    """
+    :param flag_bits: the flags of a node
+    :return: the JSON text of the list of the names of the flags
+    """
+    key = (type(flag_bits), int(flag_bits))
+    text = _FLAG_TEXTS.get(key)
+    if text is None:
+        names = flag_names_from_int(type(flag_bits), flag_bits)
+        text = _FLAG_TEXTS[key] = "[" + ", ".join(map(_value, names)) + "]"
+    return text
+
+
+# the JSON text of a node, with the commands and conditional expressions below it
+# left in between the pieces of text, to be written in their place
+_Parts = List[Union[str, Command, CondCom, None]]
+
+
+class _JsonWriter:
+    """
+    writes the JSON text json.dumps writes for the output of ast_to_json, straight
+    from the nodes, without building the dictionaries first
+    """
+
+    __slots__ = ("flatten_connections", "flags_as_int")
+
+    flatten_connections: bool  # whether connections are written as sequences
+    flags_as_int: bool  # whether flags are written as their integer value
+
+    def __init__(self, flatten_connections: bool = False, flags_as_int: bool = False):
+        """
+        :param flatten_connections: whether connections are written as the
+        sequences they flatten into, see ast_to_json
+        :param flags_as_int: whether flags are written as ints, see ast_to_json
+        """
+        self.flatten_connections = flatten_connections
+        self.flags_as_int = flags_as_int
+
+    def iter_json(self, ast: list[Command], ndjson: bool = False) -> Iterator[str]:
+        """
+        :param ast: the AST, a list of Command objects
+        :param ndjson: whether to write each command on a line of its own rather
+        than all of them as a JSON list
+        :return: an iterator of chunks of the JSON text
+        """
+        chunk: list[str] = []
+        size = 0
+        if not ndjson:
+            chunk.append("[")
+        for i, command in enumerate(ast):
+            if i and not ndjson:
+                chunk.append(", ")
+            # the pieces of text still to be written, last first, a node is
+            # replaced by its pieces when it comes up so deep trees don't recurse
+            stack: _Parts = [command]
+            while stack:
+                item = stack.pop()
+                if isinstance(item, str):
+                    chunk.append(item)
+                    size += len(item)
+                    if size >= _CHUNK_SIZE:
+                        yield "".join(chunk)
+                        chunk = []
+                        size = 0
+                elif item is None:
+                    chunk.append("null")
+                elif isinstance(item, CondCom):
+                    stack.extend(reversed(self._cond_parts(item)))
+                else:
+                    stack.extend(reversed(self._command_parts(item)))
+            if ndjson:
+                chunk.append("\n")
+        if not ndjson:
+            chunk.append("]")
+        if chunk:
+            yield "".join(chunk)
+
+    def _flags(self, flag_bits: IntFlag) -> str:
+        """
+        :param flag_bits: the flags of a node
+        :return: the JSON text of the flags, the names of the flags or their
+        integer value
+        """
+        if self.flags_as_int:
+            return int.__repr__(int(flag_bits))
+        return _flag_names(flag_bits)
+
+    def _word(self, word: WordDesc) -> str:
+        """
+        :param word: a word description
+        :return: the JSON text of word._to_json()
+        """
+        return (
+            '{"word": '
+            + encode_basestring_ascii(word.word.decode("utf-8", errors="replace"))
+            + ', "flags": '
+            + self._flags(word.flag_bits)
+            + "}"
+        )
+
+    def _words(self, words: list[WordDesc]) -> str:
+        """
+        :param words: a list of word descriptions
+        :return: the JSON text of the list of their _to_json
+        """
+        return "[" + ", ".join([self._word(word) for word in words]) + "]"
+
+    def _redirectee(self, redirectee: RedirecteeUnion) -> str:
+        """
+        :param redirectee: a redirectee union
+        :return: the JSON text of redirectee._to_json()
+        """
+        if redirectee.dest is not None:
+            return '{"dest": ' + _value(redirectee.dest) + "}"
+        elif redirectee.filename is not None:
+            return '{"filename": ' + self._word(redirectee.filename) + "}"
+        else:
+            raise Exception("invalid redirectee")
+
+    def _redirects(self, redirects: list[Redirect]) -> str:
+        """
+        :param redirects: a list of redirects
+        :return: the JSON text of the list of their _to_json
+        """
+        return (
+            "["
+            + ", ".join(
+                [
+                    '{"redirector": '
+                    + self._redirectee(redirect.redirector)
+                    + ', "rflags": '
+                    + self._flags(redirect.rflag_bits)
+                    + ', "flags": '
+                    + self._flags(redirect.flag_bits)
+                    + ', "instruction": '
+                    + _value(redirect.instruction._to_json())
+                    + ', "redirectee": '
+                    + self._redirectee(redirect.redirectee)
+                    + ', "here_doc_eof": '
+                    + _value(redirect.here_doc_eof)
+                    + "}"
+                    for redirect in redirects
+                ]
+            )
+            + "]"
+        )
+
+    def _command_parts(self, command: Command) -> _Parts:
+        """
+        :param command: a command
+        :return: the pieces of the JSON text of the command
+        """
+        parts: _Parts = [
+            '{"type": '
+            + _value(command.type._to_json())
+            + ', "flags": '
+            + self._flags(command.flag_bits)
+            + ', "redirects": '
+            + self._redirects(command.redirects)
+            + ', "value": '
+        ]
+        node = command.value.node
+        if node is None:
+            raise Exception("invalid value union")
+        if isinstance(node, CondCom):
+            parts.append(node)
+        else:
+            self._NODE_PARTS[type(node)](self, node, parts)
+        parts.append("}")
+        return parts
+
+    def _for_parts(self, for_c: Union[ForCom, SelectCom], parts: _Parts):
+        parts += [
+            '{"flags": '
+            + self._flags(for_c.flag_bits)
+            + ', "line": '
+            + _value(for_c.line)
+            + ', "name": '
+            + self._word(for_c.name)
+            + ', "map_list": '
+            + self._words(for_c.map_list)
+            + ', "action": ',
+            for_c.action,
+            "}",
+        ]
+
+    def _case_parts(self, case_c: CaseCom, parts: _Parts):
+        parts.append(
+            '{"flags": '
+            + self._flags(case_c.flag_bits)
+            + ', "line": '
+            + _value(case_c.line)
+            + ', "word": '
+            + self._word(case_c.word)
+            + ', "clauses": ['
+        )
+        for i, clause in enumerate(case_c.clauses):
+            parts += [
+                (", " if i else "")
+                + '{"patterns": '
+                + self._words(clause.patterns)
+                + ', "action": ',
+                clause.action,
+                ', "flags": ' + self._flags(clause.flag_bits) + "}",
+            ]
+        parts.append("]}")
+
+    def _while_parts(self, while_c: WhileCom, parts: _Parts):
+        parts += [
+            '{"flags": ' + self._flags(while_c.flag_bits) + ', "test": ',
+            while_c.test,
+            ', "action": ',
+            while_c.action,
+            "}",
+        ]
+
+    def _if_parts(self, if_c: IfCom, parts: _Parts):
+        parts += [
+            '{"flags": ' + self._flags(if_c.flag_bits) + ', "test": ',
+            if_c.test,
+            ', "true_case": ',
+            if_c.true_case,
+            ', "false_case": ',
+            if_c.false_case,
+            "}",
+        ]
+
+    def _connection_parts(self, connection: Connection, parts: _Parts):
+        if self.flatten_connections:
+            sequence = connection.flatten()
+            parts.append(
+                '{"flags": ' + self._flags(sequence.flag_bits) + ', "commands": ['
+            )
+            for i, command in enumerate(sequence.commands):
+                if i:
+                    parts.append(", ")
+                parts.append(command)
+            parts.append(
+                '], "connectors": ['
+                + ", ".join(_value(x._to_json()) for x in sequence.connectors)
+                + "]}"
+            )
+            return
+        parts += [
+            '{"flags": ' + self._flags(connection.flag_bits) + ', "first": ',
+            connection.first,
+            ', "second": ',
+            connection.second,
+            ', "connector": ' + _value(connection.connector._to_json()) + "}",
+        ]
+
+    def _simple_parts(self, simple: SimpleCom, parts: _Parts):
+        parts.append(
+            '{"flags": '
+            + self._flags(simple.flag_bits)
+            + ', "line": '
+            + _value(simple.line)
+            + ', "words": '
+            + self._words(simple.words)
+            + ', "redirects": '
+            + self._redirects(simple.redirects)
+            + "}"
+        )
+
+    def _function_parts(self, function: FunctionDef, parts: _Parts):
+        parts += [
+            '{"flags": '
+            + self._flags(function.flag_bits)
+            + ', "line": '
+            + _value(function.line)
+            + ', "name": '
+            + self._word(function.name)
+            + ', "command": ',
+            function.command,
+            ', "source_file": ' + _value(function.source_file) + "}",
+        ]
+
+    def _group_parts(self, group: GroupCom, parts: _Parts):
+        parts += [
+            '{"flags": ' + self._flags(group.flag_bits) + ', "command": ',
+            group.command,
+            "}",
+        ]
+
+    def _arith_parts(self, arith: ArithCom, parts: _Parts):
+        parts.append(
+            '{"flags": '
+            + self._flags(arith.flag_bits)
+            + ', "line": '
+            + _value(arith.line)
+            + ', "exp": '
+            + self._words(arith.exp)
+            + "}"
+        )
+
+    def _arith_for_parts(self, arith_for: ArithForCom, parts: _Parts):
+        parts += [
+            '{"flags": '
+            + self._flags(arith_for.flag_bits)
+            + ', "line": '
+            + _value(arith_for.line)
+            + ', "init": '
+            + self._words(arith_for.init)
+            + ', "test": '
+            + self._words(arith_for.test)
+            + ', "step": '
+            + self._words(arith_for.step)
+            + ', "action": ',
+            arith_for.action,
+            "}",
+        ]
+
+    def _subshell_parts(self, subshell: SubshellCom, parts: _Parts):
+        parts += [
+            '{"flags": '
+            + self._flags(subshell.flag_bits)
+            + ', "line": '
+            + _value(subshell.line)
+            + ', "command": ',
+            subshell.command,
+            "}",
+        ]
+
+    def _coproc_parts(self, coproc: CoprocCom, parts: _Parts):
+        parts += [
+            '{"flags": '
+            + self._flags(coproc.flag_bits)
+            + ', "name": '
+            + _value(coproc.name)
+            + ', "command": ',
+            coproc.command,
+            "}",
+        ]
+
+    def _cond_parts(self, cond: CondCom) -> _Parts:
+        """
+        :param cond: a conditional expression
+        :return: the pieces of the JSON text of the expression
+        """
+        return [
+            '{"flags": '
+            + self._flags(cond.flag_bits)
+            + ', "line": '
+            + _value(cond.line)
+            + ', "cond_type": '
+            + _value(cond.type._to_json())
+            + ', "op": '
+            + (self._word(cond.op) if cond.op is not None else "null")
+            + ', "left": ',
+            cond.left,
+            ', "right": ',
+            cond.right,
+            "}",
+        ]
+
+    # the method writing each kind of node a command's value union can hold
+    _NODE_PARTS = {
+        ForCom: _for_parts,
+        SelectCom: _for_parts,
+        CaseCom: _case_parts,
+        WhileCom: _while_parts,
+        IfCom: _if_parts,
+        Connection: _connection_parts,
+        SimpleCom: _simple_parts,
+        FunctionDef: _function_parts,
+        GroupCom: _group_parts,
+        ArithCom: _arith_parts,
+        ArithForCom: _arith_for_parts,
+        SubshellCom: _subshell_parts,
+        CoprocCom: _coproc_parts,
+    }
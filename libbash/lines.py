@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import mmap
+import re
+from array import array
+
+from typing import Union
+
+# a newline, matched over the whole source in one pass by the re module
+_NEWLINE = re.compile(b"\n")
+
+
+class LineIndex:
+    """
+    The byte offsets at which the lines of a bash script start, so the source of
+    the commands can be sliced by line number. The offsets are found with a single
+    scan and stored as an array of 8 byte ints, the source itself isn't copied.
+    """
+
+    __slots__ = ("source", "offsets", "_view")
+
+    source: Union[bytes, mmap.mmap]  # the bash source code
+    # the byte offset at which each line starts, followed by the length of the
+    # source, so line i spans offsets[i]:offsets[i + 1]
+    offsets: array
+    _view: memoryview  # the whole source, sliced without copying
+
+    def __init__(self, source: Union[bytes, mmap.mmap]):
+        """
+        :param source: the bash source code, as bytes or a memory map
+        """
+        self.source = source
+        offsets = array("q", [0])
+        offsets.extend(match.end() for match in _NEWLINE.finditer(source))
+        if offsets[-1] != len(source):
+            offsets.append(len(source))
+        self.offsets = offsets
+        self._view = memoryview(source)
+
+    @classmethod
+    def from_file(cls, bash_file: str) -> LineIndex:
+        """
+        :param bash_file: the path to the bash file
+        :return: the line index of the file, which is memory mapped rather than
+        read, the map is unmapped once it and the slices taken from it are released
+        """
+        with open(bash_file, "rb") as f:
+            try:
+                source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                source = b""
+        return cls(source)
+
+    def __len__(self) -> int:
+        """
+        :return: the number of lines
+        """
+        return len(self.offsets) - 1
+
+    def span(self, linno_before: int, linno_after: int) -> tuple[int, int]:
+        """
+        :param linno_before: the first line to include
+        :param linno_after: the line to stop at
+        :return: the byte offsets the lines start and stop at
+        """
+        line_count = len(self.offsets) - 1
+        first = min(linno_before, line_count)
+        last = min(max(linno_before, linno_after), line_count)
+        return self.offsets[first], self.offsets[last]
+
+    def view(self, linno_before: int, linno_after: int) -> memoryview:
+        """
+        :param linno_before: the first line to include
+        :param linno_after: the line to stop at
+        :return: the lines, as a view of the source rather than a copy
+        """
+        start, end = self.span(linno_before, linno_after)
+        return self._view[start:end]
+
+    def slice(self, linno_before: int, linno_after: int) -> bytes:
+        """
+        :param linno_before: the first line to include
+        :param linno_after: the line to stop at
+        :return: the same as joining lines[linno_before:linno_after]
+        """
+        start, end = self.span(linno_before, linno_after)
+        return self.source[start:end]
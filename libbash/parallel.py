@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import concurrent.futures
+import os
+
+from typing import Iterable, Iterator, Optional, Union
+
+from .api import _get_bash, bash_to_ast
+from .bash_command import Command
+from .serialize import ast_to_bytes, bytes_to_ast
+
+
+def _init_worker():
+    """
+    Loads and initializes bash.so once in each worker process.
+    """
+    _get_bash()
+
+
+def _parse_in_worker(
+    bash_file: str, with_linno_info: bool
+) -> tuple[Optional[bytes], Optional[list[tuple[bytes, int, int]]], Optional[Exception]]:
+    """
+    Parses one file inside a worker process.
+    :param bash_file: The path to the bash file to parse
+    :param with_linno_info: If true, the line numbers of the commands will be returned
+    :return: the serialized AST and the line information of each command,
+    or the exception raised while parsing
+    """
+    try:
+        ast = bash_to_ast(bash_file, with_linno_info)
+    except Exception as e:
+        return None, None, e
+
+    if not with_linno_info:
+        return ast_to_bytes(ast), None, None
+    return (
+        ast_to_bytes([command for command, _, _, _ in ast]),
+        [linno_info for _, *linno_info in ast],
+        None,
+    )
+
+
+def _result_from_worker(
+    result: tuple[
+        Optional[bytes], Optional[list[tuple[bytes, int, int]]], Optional[Exception]
+    ],
+) -> Union[list[Command], list[tuple[Command, bytes, int, int]], Exception]:
+    """
+    :param result: what _parse_in_worker returned
+    :return: the AST, or the exception raised while parsing
+    """
+    data, linno_info, error = result
+    if error is not None:
+        return error
+    ast = bytes_to_ast(data)
+    if linno_info is None:
+        return ast
+    return [(command, *info) for command, info in zip(ast, linno_info)]
+
+
+def parse_many(
+    bash_files: Iterable[str],
+    workers: Optional[int] = None,
+    with_linno_info: bool = False,
+    ordered: bool = True,
+) -> Iterator[
+    tuple[str, Union[list[Command], list[tuple[Command, bytes, int, int]], Exception]]
+]:
+    """
+    Parses many bash files using a pool of worker processes, each with its own
+    copy of bash.so. bash.so keeps its parser state in globals, so this is the way
+    to parse in parallel, bash_to_ast must not be called from several threads.
+    The ASTs are sent back from the workers in a compact serialized form.
+
+    :param bash_files: The paths to the bash files to parse
+    :param workers: The number of worker processes, defaults to the number of CPUs
+    :param with_linno_info: If true, the line numbers of the commands will be returned
+    :param ordered: If true, the results are yielded in the order of bash_files,
+    otherwise they are yielded as soon as each file is parsed
+    :return: an iterator of (path, result) pairs, where result is the AST of the
+    file as returned by bash_to_ast or the exception raised while parsing it
+    """
+    bash_files = list(bash_files)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker
+    ) as executor:
+        if ordered:
+            results = executor.map(
+                _parse_in_worker,
+                bash_files,
+                [with_linno_info] * len(bash_files),
+                chunksize=max(1, len(bash_files) // (workers * 4)),
+            )
+            for bash_file, result in zip(bash_files, results):
+                yield bash_file, _result_from_worker(result)
+        else:
+            futures = {
+                executor.submit(_parse_in_worker, bash_file, with_linno_info): bash_file
+                for bash_file in bash_files
+            }
+            for future in concurrent.futures.as_completed(futures):
+                yield futures[future], _result_from_worker(future.result())
@@ -0,0 +1,431 @@
+from __future__ import annotations
+
+import mmap
+from itertools import repeat
+
+from typing import Union
+
+from .bash_command import *
+
+# bump this whenever the serialized form of the AST changes
+_FORMAT_VERSION = 3
+
+# kinds of fields a node can have
+_RAW = 0  # bytes, str, int or None, stored as is
+_FLAGS = 1  # flags, stored as an int
+_ENUM = 2  # an enum member, stored as its value
+_NODE = 3  # another node or None
+_LIST = 4  # a list of nodes, stored as its length followed by the nodes
+
+# the fields of every node class in the order they are serialized
+_SCHEMA: dict[type, tuple[tuple[str, int, object], ...]] = {
+    WordDesc: (
+        ("word", _RAW, None),
+        ("flag_bits", _FLAGS, WordDescFlag),
+    ),
+    RedirecteeUnion: (
+        ("dest", _RAW, None),
+        ("filename", _NODE, None),
+    ),
+    Redirect: (
+        ("redirector", _NODE, None),
+        ("rflag_bits", _FLAGS, RedirectFlag),
+        ("flag_bits", _FLAGS, OFlag),
+        ("instruction", _ENUM, RInstruction),
+        ("redirectee", _NODE, None),
+        ("here_doc_eof", _RAW, None),
+    ),
+    ForCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("line", _RAW, None),
+        ("name", _NODE, None),
+        ("map_list", _LIST, None),
+        ("action", _NODE, None),
+    ),
+    Pattern: (
+        ("patterns", _LIST, None),
+        ("action", _NODE, None),
+        ("flag_bits", _FLAGS, PatternFlag),
+    ),
+    CaseCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("line", _RAW, None),
+        ("word", _NODE, None),
+        ("clauses", _LIST, None),
+    ),
+    WhileCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("test", _NODE, None),
+        ("action", _NODE, None),
+    ),
+    IfCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("test", _NODE, None),
+        ("true_case", _NODE, None),
+        ("false_case", _NODE, None),
+    ),
+    Connection: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("first", _NODE, None),
+        ("second", _NODE, None),
+        ("connector", _ENUM, ConnectionType),
+    ),
+    SimpleCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("line", _RAW, None),
+        ("words", _LIST, None),
+        ("redirects", _LIST, None),
+    ),
+    FunctionDef: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("line", _RAW, None),
+        ("name", _NODE, None),
+        ("command", _NODE, None),
+        ("source_file", _RAW, None),
+    ),
+    GroupCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("command", _NODE, None),
+    ),
+    SelectCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("line", _RAW, None),
+        ("name", _NODE, None),
+        ("map_list", _LIST, None),
+        ("action", _NODE, None),
+    ),
+    ArithCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("line", _RAW, None),
+        ("exp", _LIST, None),
+    ),
+    CondCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("line", _RAW, None),
+        ("type", _ENUM, CondTypeEnum),
+        ("op", _NODE, None),
+        ("left", _NODE, None),
+        ("right", _NODE, None),
+    ),
+    ArithForCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("line", _RAW, None),
+        ("init", _LIST, None),
+        ("test", _LIST, None),
+        ("step", _LIST, None),
+        ("action", _NODE, None),
+    ),
+    SubshellCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("line", _RAW, None),
+        ("command", _NODE, None),
+    ),
+    CoprocCom: (
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("name", _RAW, None),
+        ("command", _NODE, None),
+    ),
+    ValueUnion: (
+        ("kind", _RAW, None),
+        ("node", _NODE, None),
+    ),
+    Command: (
+        ("type", _ENUM, CommandType),
+        ("flag_bits", _FLAGS, CommandFlag),
+        ("redirects", _LIST, None),
+        ("value", _NODE, None),
+    ),
+}
+
+# node classes by tag, a node's tag is its index in this list
+_CLASSES: list[type] = list(_SCHEMA)
+_TAGS: dict[type, int] = {cls: tag for tag, cls in enumerate(_CLASSES)}
+# the fields of each node class as in _SCHEMA, with the setter of the slot of the
+# field in place of its name, which skips the __setattr__ of the nodes since the
+# nodes being read are new and not frozen
+_SETTERS: dict[type, list[tuple]] = {
+    cls: [
+        (getattr(cls, name).__set__, kind, kind_type)
+        for name, kind, kind_type in fields
+    ]
+    for cls, fields in _SCHEMA.items()
+}
+
+
+def _ast_to_tokens(ast: list[Command]) -> list[Union[bytes, str, int, None]]:
+    """
+    Flattens the AST into a list of plain values. A node is written as its tag
+    followed by its fields, with the length of each list in place of the list,
+    and then the nodes in its fields and lists are written, in order.
+    Uses an explicit stack so the depth of the AST is not limited by recursion.
+    :param ast: The AST, a list of Command objects.
+    :return: the list of values
+    """
+    tokens: list[Union[bytes, str, int, None]] = [len(ast)]
+    # the nodes still to be written, or None where a field has no node
+    stack: list[object] = list(reversed(ast))
+    while stack:
+        node = stack.pop()
+        if node is None:
+            tokens.append(None)
+            continue
+
+        tokens.append(_TAGS[type(node)])
+        children: list[object] = []
+        for name, kind, kind_type in _SCHEMA[type(node)]:
+            value = getattr(node, name)
+            if kind == _RAW:
+                tokens.append(value)
+            elif kind == _FLAGS:
+                tokens.append(int(value))
+            elif kind == _ENUM:
+                tokens.append(value.value)
+            elif kind == _NODE:
+                children.append(value)
+            else:
+                tokens.append(len(value))
+                children.extend(value)
+        stack.extend(reversed(children))
+    return tokens
+
+
+def _ast_from_tokens(tokens: list[Union[bytes, str, int, None]]) -> list[Command]:
+    """
+    Rebuilds the AST written by _ast_to_tokens, without calling the node constructors.
+    :param tokens: the list of values
+    :return: The AST, a list of Command objects.
+    """
+    values = iter(tokens)
+    next_value = values.__next__
+
+    def next_length() -> int:
+        # a list can't be longer than the values its nodes are read from
+        length = next_value()
+        if not 0 <= length <= len(tokens):
+            raise ValueError(f"Invalid list length {length} in the serialized AST")
+        return length
+
+    ast: list = [None] * next_length()
+    # where each node still to be read goes, as the list and index or the node
+    # and the setter of its field, the next one last
+    slots: list[tuple] = [(ast, i) for i in range(len(ast) - 1, -1, -1)]
+    # the flag or enum member of each type and value, enum lookups are slow
+    members: dict[tuple[type, int], object] = {}
+    while slots:
+        target, key = slots.pop()
+        tag = next_value()
+        if tag is None:
+            node = None
+        else:
+            if type(tag) is not int or tag < 0:
+                raise ValueError(f"Invalid node tag {tag!r} in the serialized AST")
+            cls = _CLASSES[tag]
+            node = cls.__new__(cls)
+            children: list[tuple] = []
+            for set_field, kind, kind_type in _SETTERS[cls]:
+                if kind == _RAW:
+                    set_field(node, next_value())
+                elif kind == _NODE:
+                    children.append((node, set_field))
+                elif kind == _LIST:
+                    node_list = [None] * next_length()
+                    set_field(node, node_list)
+                    children += zip(repeat(node_list), range(len(node_list)))
+                else:
+                    value = next_value()
+                    member = members.get((kind_type, value))
+                    if member is None:
+                        member = members[kind_type, value] = kind_type(value)
+                    set_field(node, member)
+            if children:
+                slots += reversed(children)
+
+        if type(key) is int:
+            target[key] = node
+        else:
+            key(target, node)
+    if next(values, values) is not values:
+        raise ValueError("The serialized AST is followed by more values")
+    return ast
+
+
+# the first bytes of an AST written by ast_to_bytes
+_MAGIC = b"LBAST"
+
+# the first byte of each token, ints below _SMALL are written as that one byte
+_SMALL = 0xF0
+_NONE = 0xF0
+_INT = 0xF1  # followed by the varint of the int
+_NEGATIVE_INT = 0xF2  # followed by the varint of the negated int
+_BYTES = 0xF3  # followed by the varint of the index of the bytes in the string table
+_STR = 0xF4  # followed by the varint of the index of its utf-8 in the string table
+
+
+def _write_varint(output: bytearray, value: int):
+    """
+    writes a non-negative int 7 bits at a time, the low bits first, the high
+    bit of each byte is set if more bytes follow
+    :param output: where to write the int
+    :param value: the int
+    """
+    while value >= 0x80:
+        output.append(value & 0x7F | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def _read_varint(data: memoryview, position: int) -> tuple[int, int]:
+    """
+    :param data: the data to read from
+    :param position: where the varint starts
+    :return: the int written by _write_varint and where it ends
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def ast_to_bytes(ast: list[Command]) -> bytes:
+    """
+    Serializes the AST into a compact binary form, to be cached or sent between
+    processes. Each node is written as its tag followed by its fields, ints as
+    varints, and each distinct word or string once in a string table at the start,
+    which the nodes refer to by index.
+    :param ast: The AST, a list of Command objects.
+    :return: the serialized AST
+    """
+    strings: dict[Union[bytes, str], int] = {}
+    body = bytearray()
+    for token in _ast_to_tokens(ast):
+        if token is None:
+            body.append(_NONE)
+        elif isinstance(token, int):
+            if 0 <= token < _SMALL:
+                body.append(token)
+            elif token >= 0:
+                body.append(_INT)
+                _write_varint(body, token)
+            else:
+                body.append(_NEGATIVE_INT)
+                _write_varint(body, -token)
+        else:
+            index = strings.get(token)
+            if index is None:
+                index = strings[token] = len(strings)
+            body.append(_BYTES if isinstance(token, bytes) else _STR)
+            _write_varint(body, index)
+
+    output = bytearray(_MAGIC)
+    _write_varint(output, _FORMAT_VERSION)
+    _write_varint(output, len(strings))
+    for string in strings:
+        if isinstance(string, str):
+            string = string.encode("utf-8")
+        _write_varint(output, len(string))
+        output += string
+    output += body
+    return bytes(output)
+
+
+def bytes_to_ast(data: Union[bytes, bytearray, memoryview, mmap.mmap]) -> list[Command]:
+    """
+    Deserializes an AST written by ast_to_bytes.
+    :param data: the serialized AST, any object supporting the buffer protocol,
+    such as a memory mapped file, which is read in place
+    :return: The AST, a list of Command objects.
+    :raises ValueError: if the data isn't a whole AST written by ast_to_bytes
+    """
+    try:
+        return _bytes_to_ast(data)
+    except (IndexError, KeyError, TypeError, StopIteration) as e:
+        # the data ends early or its values don't fit where they are read
+        raise ValueError("The serialized AST is truncated or malformed") from e
+
+
+def _bytes_to_ast(
+    data: Union[bytes, bytearray, memoryview, mmap.mmap],
+) -> list[Command]:
+    """
+    :param data: the serialized AST
+    :return: The AST, a list of Command objects, see bytes_to_ast
+    """
+    with memoryview(data) as view:
+        if view[: len(_MAGIC)] != _MAGIC:
+            raise ValueError("The data is not an AST written by ast_to_bytes")
+        version, position = _read_varint(view, len(_MAGIC))
+        if version != _FORMAT_VERSION:
+            raise ValueError(
+                f"The AST was written in format {version}, "
+                f"this version of libbash reads format {_FORMAT_VERSION}"
+            )
+
+        count, position = _read_varint(view, position)
+        # the words are interned, so they share their bytes with other ASTs
+        strings: list[bytes] = []
+        for _ in range(count):
+            length, position = _read_varint(view, position)
+            strings.append(word_table.intern(bytes(view[position : position + length])))
+            position += length
+        # the strings that are read as str, decoded once each
+        decoded: dict[int, str] = {}
+
+        tokens: list[Union[bytes, str, int, None]] = []
+        end = len(view)
+        while position < end:
+            byte = view[position]
+            position += 1
+            if byte < _SMALL:
+                tokens.append(byte)
+                continue
+            if byte == _NONE:
+                tokens.append(None)
+                continue
+            value, position = _read_varint(view, position)
+            if byte == _BYTES:
+                tokens.append(strings[value])
+            elif byte == _STR:
+                string = decoded.get(value)
+                if string is None:
+                    string = decoded[value] = strings[value].decode("utf-8")
+                tokens.append(string)
+            elif byte == _INT:
+                tokens.append(value)
+            elif byte == _NEGATIVE_INT:
+                tokens.append(-value)
+            else:
+                raise ValueError(f"Invalid token {byte:#x} in the serialized AST")
+    return _ast_from_tokens(tokens)
+
+
+def ast_to_bytes_file(ast: list[Command], write_to: str):
+    """
+    Serializes the AST with ast_to_bytes into a file.
+    :param ast: The AST, a list of Command objects.
+    :param write_to: The path of the file the serialized AST is written to
+    """
+    data = ast_to_bytes(ast)
+    with open(write_to, "wb") as f:
+        f.write(data)
+
+
+def bytes_file_to_ast(file: str) -> list[Command]:
+    """
+    Deserializes an AST written by ast_to_bytes_file, the file is memory mapped
+    rather than read.
+    :param file: The path of the file the serialized AST was written to
+    :return: The AST, a list of Command objects.
+    """
+    with open(file, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files can't be mapped
+            return bytes_to_ast(b"")
+    with data:
+        return bytes_to_ast(data)
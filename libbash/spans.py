@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+
+from typing import Optional
+
+from .api import bash_to_ast, bash_to_ast_from_bytes
+from .bash_command import (
+    ArithForCom,
+    CaseCom,
+    Command,
+    ForCom,
+    GroupCom,
+    IfCom,
+    Pattern,
+    SelectCom,
+    SubshellCom,
+    WhileCom,
+)
+from .bash_command.command import _Node
+from .lines import LineIndex
+
+# the nodes closed by a keyword or a bracket on a line of its own, after the
+# last line recorded below them
+_CLOSED_NODES = (
+    ArithForCom,
+    CaseCom,
+    ForCom,
+    GroupCom,
+    IfCom,
+    Pattern,
+    SelectCom,
+    SubshellCom,
+    WhileCom,
+)
+
+
+class SpanIndex:
+    """
+    The source spans of the nodes of an AST, as parallel arrays indexed by node id.
+    The ids number the nodes in source order, a node before the nodes below it.
+
+    The spans are line-granular. Bash only records line numbers, for the
+    top-level commands and on the nodes with a line field, and no columns, so a
+    span covers whole lines, [start_line, end_line), and its byte offsets are where
+    those lines start and stop. The nodes without a line field get the lines of
+    the nodes below them. A node ends where the next node under the same parent
+    starts, and a node closed by a keyword or a bracket, such as an if command
+    and its fi, ends where its parent ends if it is the last node under it.
+
+    Words and redirects have no position at all and aren't indexed, they are part
+    of the span of their node. Nodes on the same line, such as the two commands
+    of `echo a; echo b`, can't be told apart, node_at returns the node holding
+    both of them for that line.
+    """
+
+    __slots__ = (
+        "lines",
+        "nodes",
+        "parents",
+        "start_lines",
+        "end_lines",
+        "start_bytes",
+        "end_bytes",
+        "_shared",
+        "_ids",
+    )
+
+    lines: LineIndex  # the lines of the source
+    nodes: list[_Node]  # the node of each id
+    parents: array  # the id of the parent of each node, -1 for top-level commands
+    start_lines: array  # the first line of each node
+    end_lines: array  # the line each node stops at
+    start_bytes: array  # the byte offset each node starts at
+    end_bytes: array  # the byte offset each node stops at
+    # whether each node shares its first line (1) or its last line (2) with
+    # another node under the same parent, or the node above it does
+    _shared: array
+    _ids: dict[int, int]  # the id of each node, by the identity of the node
+
+    def __init__(self, parsed: list[tuple[Command, bytes, int, int]], lines: LineIndex):
+        """
+        :param parsed: the AST with the line numbers of the commands, as returned
+        by bash_to_ast with with_linno_info
+        :param lines: the lines of the source the AST was parsed from
+        """
+        self.lines = lines
+        self.nodes = []
+        self.parents = array("q")
+        self.start_lines = array("q")
+        self.end_lines = array("q")
+        self._shared = array("b")
+        self._ids = {}
+        for command, _, linno_before, linno_after in parsed:
+            self._add_command(command, linno_before, max(linno_after, linno_before))
+
+        offsets = lines.offsets
+        line_count = len(lines)
+        self.start_bytes = array(
+            "q", (offsets[min(line, line_count)] for line in self.start_lines)
+        )
+        self.end_bytes = array(
+            "q", (offsets[min(line, line_count)] for line in self.end_lines)
+        )
+
+    @classmethod
+    def from_file(cls, bash_file: str) -> SpanIndex:
+        """
+        :param bash_file: The path to the bash file to parse
+        :return: the span index of the AST of the file, see bash_to_ast
+        """
+        parsed = bash_to_ast(bash_file, with_linno_info=True)
+        return cls(parsed, LineIndex.from_file(bash_file))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> SpanIndex:
+        """
+        :param data: The bash source code
+        :return: the span index of the AST of the source, see bash_to_ast_from_bytes
+        """
+        data = bytes(data)
+        return cls(bash_to_ast_from_bytes(data, with_linno_info=True), LineIndex(data))
+
+    def _add_command(self, command: Command, linno_before: int, linno_after: int):
+        """
+        Indexes a top-level command and the nodes below it, without recursing
+        :param command: the command
+        :param linno_before: the line the command starts on
+        :param linno_after: the line the command stops at
+        """
+        nodes = self.nodes
+        parents = self.parents
+        first = len(nodes)
+
+        # number the nodes in source order, with an explicit stack
+        stack: list[tuple[_Node, int]] = [(command, -1)]
+        while stack:
+            node, parent = stack.pop()
+            self._ids[id(node)] = len(nodes)
+            nodes.append(node)
+            parents.append(parent)
+            parent = len(nodes) - 1
+            stack.extend((child, parent) for child in reversed(node._child_nodes()))
+        count = len(nodes) - first
+
+        # the nodes after and before each one under the same parent, -1 for none
+        next_siblings = [-1] * count
+        previous_siblings = [-1] * count
+        last_children: dict[int, int] = {}
+        for i in range(1, count):
+            parent = parents[first + i] - first
+            previous = last_children.get(parent)
+            if previous is not None:
+                next_siblings[previous] = i
+                previous_siblings[i] = previous
+            last_children[parent] = i
+
+        # the lowest and highest line recorded on each node or below it, None if
+        # there is none, and whether the node is closed by a keyword or bracket
+        # after those lines, or its last child is. The nodes come after their
+        # parents so this goes backwards
+        last_line = max(linno_after - 1, linno_before)
+        lowest: list[Optional[int]] = [None] * count
+        highest: list[Optional[int]] = [None] * count
+        closed = [False] * count
+        for i in range(count - 1, -1, -1):
+            node = nodes[first + i]
+            last_child = last_children.get(i)
+            closed[i] = isinstance(node, _CLOSED_NODES) or (
+                last_child is not None and closed[last_child]
+            )
+            line = getattr(node, "line", None)
+            if isinstance(line, int) and line > 0:
+                # the line fields count from 1, the top-level line numbers from 0
+                line = min(max(line - 1, linno_before), last_line)
+                lowest[i] = line if lowest[i] is None else min(lowest[i], line)
+                highest[i] = line if highest[i] is None else max(highest[i], line)
+            parent = parents[first + i] - first
+            if parent >= 0 and lowest[i] is not None:
+                if lowest[parent] is None:
+                    lowest[parent] = lowest[i]
+                    highest[parent] = highest[i]
+                else:
+                    lowest[parent] = min(lowest[parent], lowest[i])
+                    highest[parent] = max(highest[parent], highest[i])
+
+        # a node starts on its lowest line and ends after its highest one, or
+        # where the next node with a line under the same parent starts. A closed
+        # node without one ends where its parent does, so its closing keyword is
+        # part of it. Nodes lie within their parent, and the top-level command
+        # spans its whole lines. No node starts before the node numbered before
+        # it, which keeps the start offsets sorted for node_at
+        starts = [linno_before] * count
+        ends = [max(linno_after, linno_before)] * count
+        for i in range(1, count):
+            parent = parents[first + i] - first
+            start = starts[i - 1]
+            if lowest[i] is not None:
+                start = max(lowest[i], start)
+            end = start + 1
+            if highest[i] is not None:
+                end = max(highest[i] + 1, end)
+            sibling = next_siblings[i]
+            while sibling != -1 and lowest[sibling] is None:
+                sibling = next_siblings[sibling]
+            if sibling != -1:
+                end = max(lowest[sibling], end)
+            elif closed[i]:
+                end = ends[parent]
+            starts[i] = min(start, ends[parent])
+            ends[i] = max(min(end, ends[parent]), starts[i])
+
+        # the lines a node shares with the nodes next to it, or that the node
+        # above it shares and the node spans too, the parents come first
+        shared = [0] * count
+        for i in range(1, count):
+            parent = parents[first + i] - first
+            previous = previous_siblings[i]
+            if (previous != -1 and ends[previous] > starts[i]) or (
+                shared[parent] & 1 and starts[i] == starts[parent]
+            ):
+                shared[i] |= 1
+            sibling = next_siblings[i]
+            if (sibling != -1 and starts[sibling] < ends[i]) or (
+                shared[parent] & 2 and ends[i] == ends[parent]
+            ):
+                shared[i] |= 2
+        self.start_lines.extend(starts)
+        self.end_lines.extend(ends)
+        self._shared.extend(shared)
+
+    def __len__(self) -> int:
+        """
+        :return: the number of nodes
+        """
+        return len(self.nodes)
+
+    def node_id(self, node: _Node) -> int:
+        """
+        :param node: a node of the AST, nodes are told apart by identity since
+        equal subtrees are equal nodes
+        :return: the id of the node
+        """
+        try:
+            return self._ids[id(node)]
+        except KeyError:
+            raise KeyError("The node is not in this span index") from None
+
+    def span(self, node: _Node) -> tuple[int, int, int, int]:
+        """
+        :param node: a node of the AST
+        :return: the byte offsets the node starts and stops at, and the line it
+        starts on and the line it stops at
+        """
+        i = self.node_id(node)
+        return (
+            self.start_bytes[i],
+            self.end_bytes[i],
+            self.start_lines[i],
+            self.end_lines[i],
+        )
+
+    def source(self, node: _Node) -> memoryview:
+        """
+        :param node: a node of the AST
+        :return: the lines of the node, as a view of the source
+        """
+        i = self.node_id(node)
+        return self.lines.view(self.start_lines[i], self.end_lines[i])
+
+    def parent(self, node: _Node) -> Optional[_Node]:
+        """
+        :param node: a node of the AST
+        :return: the node above it, None for a top-level command
+        """
+        parent = self.parents[self.node_id(node)]
+        return self.nodes[parent] if parent >= 0 else None
+
+    def node_at(self, byte_offset: int) -> Optional[_Node]:
+        """
+        Finds the innermost node whose span contains a byte offset, with a binary
+        search over the start offsets, which the node ids keep in order. The spans
+        are whole lines, so on a line shared by several nodes under the same
+        parent, the node holding all of them is found.
+        :param byte_offset: the byte offset in the source, such as a cursor
+        :return: the node, or None if no top-level command spans the offset
+        """
+        i = bisect_right(self.start_bytes, byte_offset) - 1
+        # the node starting last before the offset may have ended already, its
+        # parent or another node above it then contains the offset
+        while i >= 0 and self.end_bytes[i] <= byte_offset:
+            i = self.parents[i]
+        if i < 0:
+            return None
+        line = bisect_right(self.lines.offsets, byte_offset) - 1
+        # the offset may be on a line the node shares with other nodes
+        while i >= 0 and (
+            (self._shared[i] & 1 and line == self.start_lines[i])
+            or (self._shared[i] & 2 and line == self.end_lines[i] - 1)
+        ):
+            i = self.parents[i]
+        return self.nodes[i] if i >= 0 else None
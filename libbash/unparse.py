@@ -0,0 +1,556 @@
+from __future__ import annotations
+
+from typing import Iterator, Optional, Union
+
+from .bash_command import *
+
+# how many spaces each nesting level is indented by, indentation_amount in bash
+_INDENTATION_AMOUNT = 4
+
+# the characters that start an expansion, EXPCHAR in bash
+_EXPANSION_CHARACTERS = b"{~$`"
+
+
+# the commands and conditional expressions a printing method yields to be printed
+_Printing = Iterator[Union[Command, CondCom, None]]
+
+# what next() returns once a printing method is done
+_DONE = object()
+
+
+def _single_quote(string: bytes) -> bytes:
+    """
+    :param string: the string to quote
+    :return: the string in single quotes, the same as sh_single_quote in bash
+    """
+    if string == b"'":
+        return b"\\'"
+    return b"'" + string.replace(b"'", b"'\\''") + b"'"
+
+
+class _CommandPrinter:
+    """
+    a port of print_cmd.c in the bash source code, prints commands exactly the way
+    make_command_string does, without converting them into c structs first.
+    Like the globals in print_cmd.c, the indentation state carries over from one
+    command to the next, so a printer should be used for one script at a time
+    """
+
+    output: bytearray  # the command being printed, the_printed_command in bash
+    indentation: int  # the current indentation
+    skip_this_indent: int  # how many of the next commands aren't indented
+    inside_function_def: int  # how many function definitions are being printed
+    printing_connection: int  # how many connections are being printed
+    was_heredoc: bool  # whether here document bodies were just printed
+    # here documents whose bodies are printed after the connector
+    deferred_heredocs: list[Redirect]
+
+    def __init__(self):
+        self.output = bytearray()
+        self.indentation = 0
+        self.skip_this_indent = 0
+        self.inside_function_def = 0
+        self.printing_connection = 0
+        self.was_heredoc = False
+        self.deferred_heredocs = []
+
+    def make_command_string(self, command: Command) -> bytes:
+        """
+        :param command: the command to print
+        :return: the bash source code of the command, as make_command_string prints it
+        """
+        self.output = bytearray()
+        self.was_heredoc = False
+        self.deferred_heredocs = []
+
+        # the methods printing commands are generators that yield the commands and
+        # conditional expressions below them instead of printing them, the child is
+        # printed here before the parent resumes, so deep trees don't recurse
+        stack: list[_Printing] = [self._print_command(command)]
+        while stack:
+            child = next(stack[-1], _DONE)
+            if child is _DONE:
+                stack.pop()
+            elif isinstance(child, CondCom):
+                stack.append(self._print_cond_node(child))
+            else:
+                stack.append(self._print_command(child))
+        return bytes(self.output)
+
+    def _indent(self, amount: int):
+        self.output += b" " * amount
+
+    def _newline(self, string: bytes):
+        self.output += b"\n"
+        self._indent(self.indentation)
+        self.output += string
+
+    def _semicolon(self):
+        # don't print a semicolon after a command that already ends the line
+        if self.output[-1:] not in (b"&", b"\n"):
+            self.output += b";"
+
+    def _print_word_list(self, words: list[WordDesc], separator: bytes):
+        self.output += separator.join(word.word for word in words)
+
+    def _print_command(self, command: Optional[Command]) -> _Printing:
+        """
+        make_command_string_internal in bash
+        :param command: the command to print
+        """
+        if command is None:
+            return
+
+        if self.skip_this_indent:
+            self.skip_this_indent -= 1
+        else:
+            self._indent(self.indentation)
+
+        if command.flag_bits & CommandFlag.CMD_TIME_PIPELINE:
+            self.output += b"time "
+            if command.flag_bits & CommandFlag.CMD_TIME_POSIX:
+                self.output += b"-p "
+
+        if command.flag_bits & CommandFlag.CMD_INVERT_RETURN:
+            self.output += b"! "
+
+        node = command.value.node
+        if command.type == CommandType.CM_FOR:
+            yield from self._print_for_command(node)
+        elif command.type == CommandType.CM_ARITH_FOR:
+            yield from self._print_arith_for_command(node)
+        elif command.type == CommandType.CM_SELECT:
+            yield from self._print_select_command(node)
+        elif command.type == CommandType.CM_CASE:
+            yield from self._print_case_command(node)
+        elif command.type == CommandType.CM_WHILE:
+            yield from self._print_until_or_while(node, b"while")
+        elif command.type == CommandType.CM_UNTIL:
+            yield from self._print_until_or_while(node, b"until")
+        elif command.type == CommandType.CM_IF:
+            yield from self._print_if_command(node)
+        elif command.type == CommandType.CM_ARITH:
+            self._print_arith_command(node)
+        elif command.type == CommandType.CM_COND:
+            yield from self._print_cond_command(node)
+        elif command.type == CommandType.CM_SIMPLE:
+            self._print_simple_command(node)
+        elif command.type == CommandType.CM_CONNECTION:
+            yield from self._print_connection(node)
+        elif command.type == CommandType.CM_FUNCTION_DEF:
+            yield from self._print_function_def(node)
+        elif command.type == CommandType.CM_GROUP:
+            yield from self._print_group_command(node)
+        elif command.type == CommandType.CM_SUBSHELL:
+            self.output += b"( "
+            self.skip_this_indent += 1
+            yield node.command
+            if self.deferred_heredocs:
+                self._print_deferred_heredocs(b"")
+            self.output += b" )"
+        elif command.type == CommandType.CM_COPROC:
+            self.output += b"coproc " + node.name.encode("utf-8") + b" "
+            self.skip_this_indent += 1
+            yield node.command
+        else:
+            raise ValueError("print_command: bad command type " + str(command.type))
+
+        if command.redirects:
+            self.output += b" "
+            self._print_redirection_list(command.redirects)
+
+    def _print_connection(self, connection: Connection) -> _Printing:
+        self.skip_this_indent += 1
+        self.printing_connection += 1
+        yield connection.first
+
+        connector = connection.connector
+        if connector == ConnectionType.AMPERSAND or connector == ConnectionType.PIPE:
+            self._print_deferred_heredocs(
+                b" &" if connector == ConnectionType.AMPERSAND else b" |"
+            )
+            if connector != ConnectionType.AMPERSAND or connection.second is not None:
+                self.output += b" "
+                self.skip_this_indent += 1
+        elif connector == ConnectionType.AND_AND or connector == ConnectionType.OR_OR:
+            self._print_deferred_heredocs(
+                b" && " if connector == ConnectionType.AND_AND else b" || "
+            )
+            if connection.second is not None:
+                self.skip_this_indent += 1
+        else:
+            # ; and newline
+            if not self.deferred_heredocs:
+                if not self.was_heredoc:
+                    self.output += b";"
+                else:
+                    self.was_heredoc = False
+            else:
+                # _print_deferred_heredocs special-cases ;
+                self._print_deferred_heredocs(b"" if self.inside_function_def else b";")
+
+            if self.inside_function_def:
+                self.output += b"\n"
+            else:
+                self.output += b" "
+                self.skip_this_indent += 1
+
+        yield connection.second
+        if self.deferred_heredocs:
+            self._print_deferred_heredocs(b"")
+        self.printing_connection -= 1
+
+    def _print_for_command(self, for_c: ForCom) -> _Printing:
+        self.output += b"for " + for_c.name.word + b" in "
+        self._print_word_list(for_c.map_list, b" ")
+        self.output += b";"
+        yield from self._print_loop_body(for_c.action)
+
+    def _print_arith_for_command(self, arith_for: ArithForCom) -> _Printing:
+        self.output += b"for (("
+        self._print_word_list(arith_for.init, b" ")
+        self.output += b"; "
+        self._print_word_list(arith_for.test, b" ")
+        self.output += b"; "
+        self._print_word_list(arith_for.step, b" ")
+        self.output += b"))"
+        yield from self._print_loop_body(arith_for.action)
+
+    def _print_select_command(self, select: SelectCom) -> _Printing:
+        self.output += b"select " + select.name.word + b" in "
+        self._print_word_list(select.map_list, b" ")
+        self.output += b";"
+        yield from self._print_loop_body(select.action)
+
+    def _print_loop_body(self, action: Command) -> _Printing:
+        """
+        prints the do ... done of for, arithmetic for and select commands
+        :param action: the body of the loop
+        """
+        self._newline(b"do\n")
+        self.indentation += _INDENTATION_AMOUNT
+        yield action
+        if self.deferred_heredocs:
+            self._print_deferred_heredocs(b"")
+        self._semicolon()
+        self.indentation -= _INDENTATION_AMOUNT
+        self._newline(b"done")
+
+    def _print_group_command(self, group: GroupCom) -> _Printing:
+        self.output += b"{ "
+
+        if not self.inside_function_def:
+            self.skip_this_indent += 1
+        else:
+            # a group inside of a function definition is printed over
+            # several lines, using the current indentation
+            self.output += b"\n"
+            self.indentation += _INDENTATION_AMOUNT
+
+        yield group.command
+        if self.deferred_heredocs:
+            self._print_deferred_heredocs(b"")
+
+        if self.inside_function_def:
+            self.output += b"\n"
+            self.indentation -= _INDENTATION_AMOUNT
+            self._indent(self.indentation)
+        else:
+            self._semicolon()
+            self.output += b" "
+
+        self.output += b"}"
+
+    def _print_case_command(self, case_c: CaseCom) -> _Printing:
+        self.output += b"case " + case_c.word.word + b" in "
+        if case_c.clauses:
+            self.indentation += _INDENTATION_AMOUNT
+            for clause in case_c.clauses:
+                self._newline(b"")
+                self._print_word_list(clause.patterns, b" | ")
+                self.output += b")\n"
+                self.indentation += _INDENTATION_AMOUNT
+                yield clause.action
+                self.indentation -= _INDENTATION_AMOUNT
+                if self.deferred_heredocs:
+                    self._print_deferred_heredocs(b"")
+                if clause.flag_bits & PatternFlag.CASEPAT_FALLTHROUGH:
+                    self._newline(b";&")
+                elif clause.flag_bits & PatternFlag.CASEPAT_TESTNEXT:
+                    self._newline(b";;&")
+                else:
+                    self._newline(b";;")
+            self.indentation -= _INDENTATION_AMOUNT
+        self._newline(b"esac")
+
+    def _print_until_or_while(self, while_c: WhileCom, which: bytes) -> _Printing:
+        self.output += which + b" "
+        self.skip_this_indent += 1
+        yield while_c.test
+        if self.deferred_heredocs:
+            self._print_deferred_heredocs(b"")
+        self._semicolon()
+        self.output += b" do\n"
+        self.indentation += _INDENTATION_AMOUNT
+        yield while_c.action
+        if self.deferred_heredocs:
+            self._print_deferred_heredocs(b"")
+        self.indentation -= _INDENTATION_AMOUNT
+        self._semicolon()
+        self._newline(b"done")
+
+    def _print_if_command(self, if_c: IfCom) -> _Printing:
+        self.output += b"if "
+        self.skip_this_indent += 1
+        yield if_c.test
+        self._semicolon()
+        self.output += b" then\n"
+        self.indentation += _INDENTATION_AMOUNT
+        yield if_c.true_case
+        if self.deferred_heredocs:
+            self._print_deferred_heredocs(b"")
+        self.indentation -= _INDENTATION_AMOUNT
+
+        if if_c.false_case is not None:
+            self._semicolon()
+            self._newline(b"else\n")
+            self.indentation += _INDENTATION_AMOUNT
+            yield if_c.false_case
+            if self.deferred_heredocs:
+                self._print_deferred_heredocs(b"")
+            self.indentation -= _INDENTATION_AMOUNT
+
+        self._semicolon()
+        self._newline(b"fi")
+
+    def _print_arith_command(self, arith: ArithCom):
+        self.output += b"(("
+        self._print_word_list(arith.exp, b" ")
+        self.output += b"))"
+
+    def _print_cond_command(self, cond: CondCom) -> _Printing:
+        self.output += b"[[ "
+        yield cond
+        self.output += b" ]]"
+
+    def _print_cond_node(self, cond: CondCom) -> _Printing:
+        if cond.flag_bits & CommandFlag.CMD_INVERT_RETURN:
+            self.output += b"! "
+
+        if cond.type == CondTypeEnum.COND_EXPR:
+            self.output += b"( "
+            yield cond.left
+            self.output += b" )"
+        elif cond.type == CondTypeEnum.COND_AND:
+            yield cond.left
+            self.output += b" && "
+            yield cond.right
+        elif cond.type == CondTypeEnum.COND_OR:
+            yield cond.left
+            self.output += b" || "
+            yield cond.right
+        elif cond.type == CondTypeEnum.COND_UNARY:
+            self.output += cond.op.word + b" "
+            yield cond.left
+        elif cond.type == CondTypeEnum.COND_BINARY:
+            yield cond.left
+            self.output += b" " + cond.op.word + b" "
+            yield cond.right
+        elif cond.type == CondTypeEnum.COND_TERM:
+            self.output += cond.op.word
+
+    def _print_simple_command(self, simple: SimpleCom):
+        if simple.words:
+            self._print_word_list(simple.words, b" ")
+
+        if simple.redirects:
+            if simple.words:
+                self.output += b" "
+            self._print_redirection_list(simple.redirects)
+
+    def _print_function_def(self, function: FunctionDef) -> _Printing:
+        self.output += b"function " + function.name.word + b" () \n"
+        self._indent(self.indentation)
+        self.output += b"{ \n"
+
+        self.inside_function_def += 1
+        self.indentation += _INDENTATION_AMOUNT
+
+        # the braces of a group body are the ones printed above, the
+        # redirections of the group go after the closing brace
+        body = function.command
+        function_redirects: list[Redirect] = []
+        if body.type == CommandType.CM_GROUP:
+            function_redirects = body.redirects
+            body = body.value.node.command
+        yield body
+        if self.deferred_heredocs:
+            self._print_deferred_heredocs(b"")
+
+        self.indentation -= _INDENTATION_AMOUNT
+        self.inside_function_def -= 1
+        # unlike other compound commands, a function definition is followed
+        # by its connector even if its body ends in here documents
+        self.was_heredoc = False
+
+        if function_redirects:
+            self._newline(b"} ")
+            self._print_redirection_list(function_redirects)
+        else:
+            self._newline(b"}")
+
+    def _print_redirection_list(self, redirects: list[Redirect]):
+        heredocs: list[Redirect] = []
+
+        self.was_heredoc = False
+        for i, redirect in enumerate(redirects):
+            # the here document headers are printed in order, their bodies
+            # once the rest of the redirections are printed
+            if (
+                redirect.instruction == RInstruction.R_READING_UNTIL
+                or redirect.instruction == RInstruction.R_DEBLANK_READING_UNTIL
+            ):
+                self._print_heredoc_header(redirect)
+                heredocs.append(redirect)
+            elif (
+                redirect.instruction == RInstruction.R_DUPLICATING_OUTPUT_WORD
+                # bash tests the open flags against REDIR_VARASSIGN here,
+                # which >&word always has set, we do the same to print the same
+                and not int(redirect.flag_bits) & RedirectFlag.REDIR_VARASSIGN
+                and redirect.redirector.dest == 1
+            ):
+                # print it the way it is executed
+                word = redirect.redirectee.filename.word
+                if (
+                    word
+                    and word[:1] != b"-"
+                    and not word[:1].isdigit()
+                    and word[0] not in _EXPANSION_CHARACTERS
+                ):
+                    self.output += b"&> " + word
+                else:
+                    self._print_redirection(redirect)
+            else:
+                self._print_redirection(redirect)
+
+            if i < len(redirects) - 1:
+                self.output += b" "
+
+        # when printing a connection, the here document bodies go after
+        # the connector
+        if heredocs and self.printing_connection:
+            self.deferred_heredocs = heredocs
+        elif heredocs:
+            self._print_heredoc_bodies(heredocs)
+
+    def _print_heredoc_header(self, redirect: Redirect):
+        if redirect.rflag_bits & RedirectFlag.REDIR_VARASSIGN:
+            self.output += b"{" + redirect.redirector.filename.word + b"}"
+        elif redirect.redirector.dest != 0:
+            self.output += b"%d" % redirect.redirector.dest
+
+        self.output += b"<<"
+        if redirect.instruction == RInstruction.R_DEBLANK_READING_UNTIL:
+            self.output += b"-"
+        here_doc_eof = (redirect.here_doc_eof or "").encode("utf-8")
+        # if the here document delimiter is quoted, single quote it
+        if redirect.redirectee.filename.flag_bits & WordDescFlag.W_QUOTED:
+            self.output += _single_quote(here_doc_eof)
+        else:
+            self.output += here_doc_eof
+
+    def _print_heredoc_body(self, redirect: Redirect):
+        self.output += redirect.redirectee.filename.word
+        self.output += (redirect.here_doc_eof or "").encode("utf-8")
+
+    def _print_heredoc_bodies(self, heredocs: list[Redirect]):
+        self.output += b"\n"
+        for redirect in heredocs:
+            self._print_heredoc_body(redirect)
+            self.output += b"\n"
+        self.was_heredoc = True
+
+    def _print_deferred_heredocs(self, connector: bytes):
+        """
+        Prints the connector, then the bodies of the here documents of the
+        command before it. A lone ; isn't printed, it only means no space
+        is needed after the bodies.
+        :param connector: the connector
+        """
+        print_connector = connector != b"" and connector != b";"
+        if print_connector:
+            self.output += connector
+        if self.deferred_heredocs:
+            self._print_heredoc_bodies(self.deferred_heredocs)
+            if print_connector:
+                # make sure there's at least one space
+                self.output += b" "
+            self.was_heredoc = True
+        self.deferred_heredocs = []
+
+    def _print_redirection(self, redirect: Redirect):
+        instruction = redirect.instruction
+        redirector = redirect.redirector.dest
+        if redirect.rflag_bits & RedirectFlag.REDIR_VARASSIGN:
+            redirector_word = b"{" + redirect.redirector.filename.word + b"}"
+        else:
+            redirector_word = None
+        redirectee = redirect.redirectee.filename
+        redirectee_fd = redirect.redirectee.dest
+
+        def redirector_or(default: int) -> bytes:
+            # the redirector is left out when it is the default one
+            if redirector_word is not None:
+                return redirector_word
+            return b"" if redirector == default else b"%d" % redirector
+
+        def redirector_always() -> bytes:
+            if redirector_word is not None:
+                return redirector_word
+            return b"%d" % redirector
+
+        if instruction == RInstruction.R_INPUT_DIRECTION:
+            self.output += redirector_or(0) + b"< " + redirectee.word
+        elif instruction == RInstruction.R_OUTPUT_DIRECTION:
+            self.output += redirector_or(1) + b"> " + redirectee.word
+        elif instruction == RInstruction.R_INPUTA_DIRECTION:
+            # a redirection created by the shell
+            self.output += b"&"
+        elif instruction == RInstruction.R_OUTPUT_FORCE:
+            self.output += redirector_or(1) + b">| " + redirectee.word
+        elif instruction == RInstruction.R_APPENDING_TO:
+            self.output += redirector_or(1) + b">> " + redirectee.word
+        elif instruction == RInstruction.R_INPUT_OUTPUT:
+            # bash leaves out the redirector if it is 1, not 0
+            self.output += redirector_or(1) + b"<> " + redirectee.word
+        elif (
+            instruction == RInstruction.R_READING_UNTIL
+            or instruction == RInstruction.R_DEBLANK_READING_UNTIL
+        ):
+            self._print_heredoc_header(redirect)
+            self.output += b"\n"
+            self._print_heredoc_body(redirect)
+        elif instruction == RInstruction.R_READING_STRING:
+            self.output += redirector_or(0) + b"<<< " + redirectee.word
+        elif instruction == RInstruction.R_DUPLICATING_INPUT:
+            self.output += redirector_always() + b"<&%d" % redirectee_fd
+        elif instruction == RInstruction.R_DUPLICATING_OUTPUT:
+            self.output += redirector_always() + b">&%d" % redirectee_fd
+        elif instruction == RInstruction.R_DUPLICATING_INPUT_WORD:
+            self.output += redirector_or(0) + b"<&" + redirectee.word
+        elif instruction == RInstruction.R_DUPLICATING_OUTPUT_WORD:
+            self.output += redirector_or(1) + b">&" + redirectee.word
+        elif instruction == RInstruction.R_MOVE_INPUT:
+            self.output += redirector_always() + b"<&%d-" % redirectee_fd
+        elif instruction == RInstruction.R_MOVE_OUTPUT:
+            self.output += redirector_always() + b">&%d-" % redirectee_fd
+        elif instruction == RInstruction.R_MOVE_INPUT_WORD:
+            self.output += redirector_always() + b"<&" + redirectee.word + b"-"
+        elif instruction == RInstruction.R_MOVE_OUTPUT_WORD:
+            self.output += redirector_always() + b">&" + redirectee.word + b"-"
+        elif instruction == RInstruction.R_CLOSE_THIS:
+            self.output += redirector_always() + b">&-"
+        elif instruction == RInstruction.R_ERR_AND_OUT:
+            self.output += b"&> " + redirectee.word
+        elif instruction == RInstruction.R_APPEND_ERR_AND_OUT:
+            self.output += b"&>> " + redirectee.word
@@ -4,10 +4,47 @@ from __future__ import annotations
 
 import sys
 
-from libbash.api import bash_to_ast, ast_to_bash, ast_to_json
+from libbash.api import (
+    bash_to_ast,
+    bash_to_ast_from_bytes,
+    ast_to_bash,
+    ast_to_bash_string,
+    ast_to_json,
+    iter_ast_to_json,
+    json_to_ast,
+    iter_bash_to_ast,
+    parse_session,
+)
+from libbash.lines import LineIndex
+from libbash.parallel import parse_many
+from libbash.spans import SpanIndex
+from libbash.cache import MemoryCache, ParseCache
+from libbash.bash_command import (
+    CommandType,
+    Connection,
+    IfCom,
+    SimpleCom,
+    WordDesc,
+    WordDescFlag,
+    WordTable,
+    word_table,
+)
+from libbash.serialize import (
+    _LIST,
+    _NODE,
+    _SCHEMA,
+    ast_to_bytes,
+    ast_to_bytes_file,
+    bytes_file_to_ast,
+    bytes_to_ast,
+)
+import copy
+import itertools
+import json
 import os
 import shutil
 import random
+import re
 
 # The file path to the bash.so file
 BASH_FILE_PATH = os.path.join(os.path.dirname(
@@ -121,9 +158,6 @@ def test_bash_and_ast_consistency():
     Finally if getting the AST fails, it will make sure that it fails consistently.
     """
 
-    # this is necessary for exportfunc2.sub
-    sys.setrecursionlimit(10000)
-
     TMP_DIR = "/tmp/libbash"
     TMP_FILE = f"{TMP_DIR}/test.sh"
 
@@ -144,6 +178,9 @@ def test_bash_and_ast_consistency():
             ast_to_json(ast)
             ast_to_bash(ast, TMP_FILE)
             bash = read_from_file(TMP_FILE)
+            assert ast_to_bash_string(ast) == bash
+            # the python printer must print exactly what bash prints
+            assert ast_to_bash_string(ast, backend="python") == bash
         except RuntimeError as e:
             assert str(e) == "Bash read command failed, shell script may be invalid"
             continue
@@ -176,6 +213,699 @@ def test_bash_and_ast_consistency():
     print(f"Bash and AST consistency tests passed on {len(test_files)} scripts!")
 
 
+def test_bash_to_ast_from_bytes():
+    """
+    This test makes sure that parsing a script from memory gives the same AST
+    and line information as parsing it from a file.
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file, with_linno_info=True)
+        except RuntimeError:
+            continue
+
+        ast2 = bash_to_ast_from_bytes(read_from_file(test_file), with_linno_info=True)
+        assert ast == ast2
+
+    print(f"In-memory parsing tests passed on {len(test_files)} scripts!")
+
+
+def test_consecutive_files():
+    """
+    This test parses files one after the other, and makes sure the line numbers
+    of each file don't depend on the file parsed before it, since bash isn't
+    initialized again between parses.
+    """
+    TMP_FILES = ["/tmp/libbash_first.sh", "/tmp/libbash_second.sh"]
+    scripts = [
+        b"if true\nthen\n  echo 1\nfi\n" * 20 + b"echo no newline",
+        b"echo a\necho b\n\ncat <<EOF\nhere\nEOF\necho c\n",
+    ]
+    for tmp_file, script in zip(TMP_FILES, scripts):
+        with open(tmp_file, "wb") as f:
+            f.write(script)
+    expected = bash_to_ast_from_bytes(scripts[1], with_linno_info=True)
+    for _ in range(2):
+        bash_to_ast(TMP_FILES[0], with_linno_info=True)
+        second = bash_to_ast(TMP_FILES[1], with_linno_info=True)
+        assert second == expected
+        assert second[0][2] == 0
+    for tmp_file in TMP_FILES:
+        os.remove(tmp_file)
+
+    test_files = get_test_files()
+    previous = None
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file, with_linno_info=True)
+        except RuntimeError:
+            continue
+
+        if previous is not None:
+            bash_to_ast(previous, with_linno_info=True)
+            assert bash_to_ast(test_file, with_linno_info=True) == ast
+        previous = test_file
+
+    print(f"Consecutive file tests passed on {len(test_files)} scripts!")
+
+
+def test_source_as_memoryview():
+    """
+    This test makes sure that the source of each command is the same whether it
+    is sliced as bytes or as a memoryview, and matches the byte offsets of the
+    lines it spans.
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file, with_linno_info=True)
+        except RuntimeError:
+            continue
+
+        ast2 = bash_to_ast(test_file, with_linno_info=True, source_as_memoryview=True)
+        lines = LineIndex(read_from_file(test_file))
+        for (command, source, before, after), (command2, view, _, _) in zip(ast, ast2):
+            assert command == command2
+            assert isinstance(view, memoryview)
+            assert view == source
+            start, end = lines.span(before, after)
+            assert lines.source[start:end] == source
+
+    print(f"Memoryview source tests passed on {len(test_files)} scripts!")
+
+
+def test_span_index():
+    """
+    This test indexes the spans of the nodes of the test files, and makes sure each
+    node lies within the node above it, the top-level commands span the lines bash
+    reports for them, and the node found at an offset spans that offset. It also
+    makes sure the closing keyword of a compound command is part of it.
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file, with_linno_info=True)
+        except RuntimeError:
+            continue
+
+        spans = SpanIndex.from_file(test_file)
+        for command, source, linno_before, linno_after in ast:
+            assert spans.source(command) == source
+        for i, node in enumerate(spans.nodes):
+            start_byte, end_byte, start_line, end_line = spans.span(node)
+            assert start_byte <= end_byte and start_line <= end_line
+            parent = spans.parent(node)
+            if parent is None:
+                continue
+            parent_start, parent_end, _, _ = spans.span(parent)
+            assert parent_start <= start_byte and end_byte <= parent_end
+            if start_byte < end_byte:
+                found = spans.node_at(start_byte)
+                found_start, found_end, _, _ = spans.span(found)
+                assert found_start <= start_byte < found_end
+
+    # a compound command ends with its closing keyword, on a line of its own
+    source = b"if true\nthen echo 1\nfi\n"
+    spans = SpanIndex.from_bytes(source)
+    assert isinstance(spans.node_at(source.index(b"fi")), IfCom)
+    assert isinstance(spans.node_at(source.index(b"echo")), SimpleCom)
+    # commands on the same line can't be told apart, the list holding them is found
+    source = b"echo a; echo b\n"
+    spans = SpanIndex.from_bytes(source)
+    assert isinstance(spans.node_at(source.index(b"b")), Connection)
+
+    print(f"Span index tests passed on {len(test_files)} scripts!")
+
+
+def test_ast_bytes():
+    """
+    This test serializes the ASTs of the test files into the binary format, in
+    memory and through a memory mapped file, and makes sure they read back into
+    equal ASTs. It also makes sure data that isn't a whole serialized AST, such
+    as truncated data or garbage, is rejected with a ValueError.
+    """
+    TMP_FILE = "/tmp/libbash_ast.bin"
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file)
+        except RuntimeError:
+            continue
+
+        data = ast_to_bytes(ast)
+        assert bytes_to_ast(data) == ast
+        ast_to_bytes_file(ast, TMP_FILE)
+        assert bytes_file_to_ast(TMP_FILE) == ast
+    os.remove(TMP_FILE)
+
+    # a bad magic or version, truncated data, trailing bytes and garbage
+    invalid = [b"", b"not an ast", data[:5] + b"\x7f" + data[6:], data + b"\x00"]
+    invalid += [data[:i] for i in range(0, len(data), max(len(data) // 256, 1))]
+    invalid += [data[:6] + b"\xff" * 64, data[:6] + b"\x01\x05ab"]
+    for data in invalid:
+        try:
+            bytes_to_ast(data)
+            assert False, "invalid data was read as an AST"
+        except ValueError:
+            pass
+
+    print(f"Binary AST tests passed on {len(test_files)} scripts!")
+
+
+def test_word_table():
+    """
+    This test parses the test files twice and makes sure the equal words of the
+    two ASTs share one bytes object from the word table, and that the ids of the
+    words give the words back. It also makes sure a full table evicts the least
+    recently used word, and that the ids of words evicted or cleared are never
+    given another word.
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file)
+            ast2 = bash_to_ast(test_file)
+        except RuntimeError:
+            continue
+
+        words: list[bytes] = []
+        words2: list[bytes] = []
+        for nodes, word_list in ((ast, words), (ast2, words2)):
+            stack: list = list(nodes)
+            while stack:
+                node = stack.pop()
+                if node is None:
+                    continue
+                if isinstance(node, WordDesc):
+                    word_list.append(node.word)
+                for name, kind, _ in _SCHEMA[type(node)]:
+                    if kind == _NODE:
+                        stack.append(getattr(node, name))
+                    elif kind == _LIST:
+                        stack.extend(getattr(node, name))
+        assert words == words2
+        for word, word2 in zip(words, words2):
+            # a word may have been evicted and interned again in between
+            if word_table.intern(word) is word:
+                assert word is word2
+                assert word_table.word(word_table.word_id(word)) is word
+
+    # the least recently used word is evicted, and its id is never reused
+    table = WordTable(max_words=2, max_length=8)
+    echo_id = table.word_id(b"echo")
+    assert table.intern(bytes(bytearray(b"echo"))) is table.word(echo_id)
+    cat_id = table.word_id(b"cat")
+    table.intern(b"echo")
+    ls_id = table.word_id(b"ls")
+    assert b"cat" not in table and table.evictions == 1
+    assert table.word(echo_id) == b"echo" and table.word(ls_id) == b"ls"
+    assert table.word_id(b"cat") not in (cat_id, echo_id, ls_id)
+    for stale_id in (cat_id, ls_id + 100):
+        try:
+            table.word(stale_id)
+            assert False, "a stale id gave a word back"
+        except KeyError:
+            pass
+    word = b"too long a word"
+    assert table.word_id(word) is None and table.intern(word) is word
+    table.clear()
+    assert len(table) == 0 and table.word_id(b"echo") not in (echo_id, ls_id)
+
+    print(f"Word table tests passed on {len(test_files)} scripts!")
+
+
+def test_parse_many():
+    """
+    This test makes sure that parsing the test files on a pool of worker processes
+    gives the same ASTs, and the same failures, as parsing them one at a time.
+    """
+    test_files = get_test_files()
+    for test_file, result in parse_many(test_files, workers=4):
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file)
+        except RuntimeError as e:
+            assert isinstance(result, RuntimeError)
+            assert str(result) == str(e)
+            continue
+
+        assert ast == result
+
+    print(f"Parallel parsing tests passed on {len(test_files)} scripts!")
+
+
+def test_parse_cache():
+    """
+    This test parses every test file twice through a ParseCache, and makes sure
+    that the second pass is answered from the cache with the same ASTs. It also
+    makes sure corrupt entries are parsed again, and that the least recently used
+    entries are evicted once the cache grows past its cap.
+    """
+    CACHE_DIR = "/tmp/libbash_cache"
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    cache = ParseCache(CACHE_DIR)
+
+    test_files = get_test_files()
+    parsed = 0
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = cache.bash_to_ast(test_file, with_linno_info=True)
+        except RuntimeError:
+            continue
+        parsed += 1
+
+        assert cache.bash_to_ast(test_file, with_linno_info=True) == ast
+        assert cache.hits == parsed
+
+    # a truncated or corrupt entry is a miss, the script is parsed again
+    source = b"echo hello > out\n"
+    ast = cache.bash_to_ast_from_bytes(source)
+    entry_path = cache._path(cache.key(source))
+    for corrupt in (b"", b"\xff" * 8, open(entry_path, "rb").read()[:-3]):
+        with open(entry_path, "wb") as f:
+            f.write(corrupt)
+        misses = cache.misses
+        assert cache.bash_to_ast_from_bytes(source) == ast
+        assert cache.misses == misses + 1
+        assert cache.bash_to_ast_from_bytes(source) == ast
+        assert cache.misses == misses + 1
+    shutil.rmtree(CACHE_DIR)
+
+    # writing over an entry doesn't count its size twice, and the least
+    # recently used entries are evicted to stay under max_bytes
+    cache = ParseCache(CACHE_DIR, max_bytes=1000)
+    for _ in range(20):
+        cache.put(cache.key(b"same"), b"x" * 100)
+    assert cache.evictions == 0
+    for i in range(20):
+        cache.put(cache.key(b"%d" % i), b"x" * 100)
+        # the entries are written faster than modification times tick
+        os.utime(cache._path(cache.key(b"%d" % i)), (i + 1, i + 1))
+    assert cache.evictions > 0
+    assert sum(os.path.getsize(path) for path, _ in cache._entries()) <= 1000
+    assert cache.get(cache.key(b"19")) is not None
+    assert cache.get(cache.key(b"0")) is None
+    shutil.rmtree(CACHE_DIR)
+
+    print(f"Parse cache tests passed on {len(test_files)} scripts!")
+
+
+def test_memory_cache():
+    """
+    This test parses every test file twice through a MemoryCache, and makes sure
+    that the second pass is answered from the cache with the same ASTs. It also
+    makes sure entries are evicted by count and by size, that misses are looked up
+    in the disk cache, and that changing an AST a hit returned doesn't change the
+    next hit.
+    """
+    CACHE_DIR = "/tmp/libbash_cache"
+    cache = MemoryCache()
+
+    test_files = get_test_files()
+    parsed = 0
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = cache.bash_to_ast(test_file, with_linno_info=True)
+        except RuntimeError:
+            continue
+        parsed += 1
+
+        assert cache.bash_to_ast(test_file, with_linno_info=True) == ast
+        assert cache.hits == parsed
+        assert cache.misses == parsed
+
+    # the least recently used entries are evicted past max_entries
+    sources = [b"echo %d\n" % i for i in range(4)]
+    cache = MemoryCache(max_entries=2)
+    for source in sources:
+        cache.bash_to_ast_from_bytes(source)
+    assert len(cache) == 2 and cache.evictions == 2
+    cache.bash_to_ast_from_bytes(sources[3])
+    assert cache.hits == 1
+    cache.bash_to_ast_from_bytes(sources[0])
+    assert cache.misses == 5
+
+    # and past max_bytes
+    entry_size = cache.bytes_held // len(cache)
+    cache = MemoryCache(max_bytes=entry_size * 2)
+    for source in sources:
+        cache.bash_to_ast_from_bytes(source)
+        assert cache.bytes_held <= entry_size * 2
+    assert len(cache) == 2 and cache.evictions == 2
+    cache.clear()
+    assert len(cache) == 0 and cache.bytes_held == 0
+
+    # misses go to the disk cache, which a new memory cache is answered from
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    disk_cache = ParseCache(CACHE_DIR)
+    ast = MemoryCache(disk_cache=disk_cache).bash_to_ast_from_bytes(sources[0])
+    assert disk_cache.misses == 1
+    assert MemoryCache(disk_cache=disk_cache).bash_to_ast_from_bytes(sources[0]) == ast
+    assert disk_cache.hits == 1
+    shutil.rmtree(CACHE_DIR)
+
+    # every hit is a fresh copy, changing it doesn't change the cached AST
+    cache = MemoryCache()
+    ast = cache.bash_to_ast_from_bytes(sources[0])
+    hit = cache.bash_to_ast_from_bytes(sources[0])
+    assert hit == ast and hit[0] is not ast[0]
+    hit[0].value.simple_com.words[0].word = b"changed"
+    hit.clear()
+    assert cache.bash_to_ast_from_bytes(sources[0]) == ast
+
+    print(f"Memory cache tests passed on {len(test_files)} scripts!")
+
+
+def test_ast_hashing():
+    """
+    This test makes sure that ASTs parsed twice from the same file are equal and
+    hash the same, with the same fingerprints, also when the order of the words
+    in a command doesn't match, that hashed nodes can't be changed, and that
+    changing a word of a copy makes it differ.
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file)
+        except RuntimeError:
+            continue
+
+        ast2 = bash_to_ast(test_file)
+        # the words are reversed before the commands are hashed, which freezes them
+        for command2 in ast2:
+            if command2.type == CommandType.CM_SIMPLE:
+                command2.value.simple_com.words.reverse()
+        for command, command2 in zip(ast, ast2):
+            assert command == command2
+            assert hash(command) == hash(command2)
+            assert command.fingerprint() == command2.fingerprint()
+        assert len(set(ast) | set(ast2)) == len(set(ast))
+
+        # hashed nodes are frozen, their copies can be changed
+        for command in ast:
+            if command.type != CommandType.CM_SIMPLE or not command.value.node.words:
+                continue
+            word = command.value.node.words[0]
+            try:
+                word.word += b"-"
+                assert False, "a hashed node was changed"
+            except AttributeError:
+                pass
+            try:
+                command.value.node.words.append(word)
+                assert False, "the list of a hashed node was changed"
+            except TypeError:
+                pass
+
+            command2 = copy.deepcopy(command)
+            word2 = command2.value.node.words[0]
+            word2.word += b"-"
+            assert command != command2
+            word2.word = word.word
+            assert command == command2
+            command2.value.node.words.append(word2)
+            assert command != command2
+            del command2.value.node.words[-1]
+            assert command == command2
+            if WordDescFlag.W_QUOTED not in word2.flag_bits:
+                word2.flags = word2.flags + [WordDescFlag.W_QUOTED]
+                assert command != command2
+                assert hash(command) != hash(command2)
+
+    # the words of a long command are compared in any order in linear time, and
+    # comparing them doesn't freeze them
+    words = [b"w%d" % i for i in range(20000)]
+    ast = bash_to_ast_from_bytes(b" ".join(words) + b"\n")
+    ast2 = bash_to_ast_from_bytes(b" ".join(reversed(words)) + b"\n")
+    assert ast == ast2
+    ast2[0].value.node.words[0].word = b"changed"
+    assert ast != ast2
+
+    print(f"AST hashing tests passed on {len(test_files)} scripts!")
+
+
+def test_deep_commands(statements: int = 5000):
+    """
+    This test parses group commands of thousands of statements, which bash turns
+    into connections nested as deep as there are statements, and makes sure they
+    can be compared, converted and printed without raising the recursion limit.
+    :param statements: the number of statements in each group command
+    """
+    for connector in (b"; ", b" && ", b" | ", b"\n"):
+        bash = (
+            b"{ "
+            + connector.join(b"echo %d" % i for i in range(statements))
+            + b"\n}\n"
+        )
+        ast = bash_to_ast_from_bytes(bash)
+        assert ast == bash_to_ast_from_bytes(bash)
+        assert hash(ast[0]) == hash(bash_to_ast_from_bytes(bash)[0])
+        ast_to_json(ast)
+        printed = ast_to_bash_string(ast)
+        assert ast_to_bash_string(ast, backend="python") == printed
+        assert bash_to_ast_from_bytes(printed) == ast
+
+    print(f"Deep command tests passed on {statements} statements!")
+
+
+def test_flatten_connections(statements: int = 5000):
+    """
+    This test flattens every connection of the ASTs of the test files, and makes
+    sure nesting the sequences back into connections gives equal connections.
+    It also makes sure long lists and pipelines flatten into one sequence each.
+    :param statements: the number of statements in the long lists and pipelines
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file)
+        except RuntimeError:
+            continue
+
+        stack: list = list(ast)
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if isinstance(node, Connection):
+                sequence = node.flatten()
+                assert sequence.to_connection() == node
+                assert len(sequence.connectors) in (len(sequence), len(sequence) - 1)
+            for name, kind, _ in _SCHEMA[type(node)]:
+                if kind == _NODE:
+                    stack.append(getattr(node, name))
+                elif kind == _LIST:
+                    stack.extend(getattr(node, name))
+        ast_to_json(ast, flatten_connections=True)
+
+    for connector in (b"; ", b" && ", b" | "):
+        bash = connector.join(b"echo %d" % i for i in range(statements)) + b"\n"
+        ast = bash_to_ast_from_bytes(bash)
+        sequence = ast[0].value.connection.flatten()
+        assert len(sequence) == statements
+        assert sequence.to_command() == ast[0]
+        json = ast_to_json(ast, flatten_connections=True)
+        assert len(json[0]["value"]["commands"]) == statements
+
+    print(f"Connection flattening tests passed on {len(test_files)} scripts!")
+
+
+def test_json_stream():
+    """
+    This test writes the ASTs of the test files as JSON text with iter_ast_to_json,
+    and makes sure it is the same as json.dumps of the output of ast_to_json, with
+    and without flattening connections and with flags as names and as ints, as a
+    list and as newline delimited JSON.
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file)
+        except RuntimeError:
+            continue
+
+        for flatten_connections, flags_as_int in itertools.product(
+            (False, True), repeat=2
+        ):
+            expected = ast_to_json(ast, flatten_connections, flags_as_int)
+            text = "".join(
+                iter_ast_to_json(ast, flatten_connections, flags_as_int=flags_as_int)
+            )
+            assert text == json.dumps(expected)
+            # every set of flags is written as names unless asked for ints
+            if flags_as_int:
+                assert '"flags": [' not in text
+            else:
+                assert re.search(r'"r?flags": \d', text) is None
+            lines = "".join(
+                iter_ast_to_json(
+                    ast, flatten_connections, ndjson=True, flags_as_int=flags_as_int
+                )
+            )
+            assert lines == "".join(json.dumps(x) + "\n" for x in expected)
+
+    print(f"JSON stream tests passed on {len(test_files)} scripts!")
+
+
+def test_json_to_ast():
+    """
+    This test converts the ASTs of the test files to JSON and back, through
+    json.dumps and json.loads too, with and without flattening connections and
+    with flags as names and as ints, and makes sure the ASTs are equal to the ones
+    parsed. Words that aren't valid utf-8 are written with replacement characters,
+    those ASTs only have to convert to the same JSON again.
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file)
+        except RuntimeError:
+            continue
+
+        for flatten_connections, flags_as_int in itertools.product(
+            (False, True), repeat=2
+        ):
+            expected = ast_to_json(ast, flatten_connections, flags_as_int)
+            text = json.dumps(expected)
+            for loaded in (json_to_ast(expected), json_to_ast(json.loads(text))):
+                again = ast_to_json(loaded, flatten_connections, flags_as_int)
+                assert again == expected
+                if "\\ufffd" not in text:
+                    assert loaded == ast
+
+    print(f"JSON to AST tests passed on {len(test_files)} scripts!")
+
+
+def test_lazy_ast():
+    """
+    This test makes sure that lazily parsed ASTs are equal to the ASTs parsed
+    right away, and that the commands not read before a lazy AST is closed
+    can't be read afterwards.
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file, with_linno_info=True)
+        except RuntimeError:
+            continue
+
+        with bash_to_ast(test_file, with_linno_info=True, lazy=True) as lazy_ast:
+            assert lazy_ast == ast
+        with bash_to_ast(test_file, lazy=True) as lazy_ast:
+            assert ast_to_bash_string(lazy_ast) == ast_to_bash_string(
+                [command for command, _, _, _ in ast]
+            )
+
+    lazy_ast = bash_to_ast_from_bytes(b"{ echo 0; }\n", lazy=True)
+    assert lazy_ast[0].type == CommandType.CM_GROUP
+    lazy_ast.close()
+    try:
+        lazy_ast[0].value
+        assert False
+    except RuntimeError:
+        pass
+
+    print(f"Lazy parsing tests passed on {len(test_files)} scripts!")
+
+
+def test_parse_session():
+    """
+    This test makes sure that the read-only views of a parse session copy into the
+    same ASTs as parsing the test files right away, and that they can't be read
+    once the session is over.
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file)
+        except RuntimeError:
+            continue
+
+        with parse_session(test_file) as views:
+            assert [view.type for view in views] == [command.type for command in ast]
+            assert [view.to_node() for view in views] == ast
+        with parse_session(read_from_file(test_file)) as views:
+            assert [view.to_node() for view in views] == ast
+
+    with parse_session(b"echo 0 1 2\n") as views:
+        words = views[0].value.simple_com.words
+        assert [word.word for word in words] == [b"echo", b"0", b"1", b"2"]
+    try:
+        words[0]
+        assert False
+    except RuntimeError:
+        pass
+
+    print(f"Parse session tests passed on {len(test_files)} scripts!")
+
+
+def test_iter_bash_to_ast():
+    """
+    This test makes sure that iterating over the commands of the test files gives
+    the same commands and line information as parsing them all at once, and that
+    no other script can be parsed while an iterator is halfway through.
+    """
+    test_files = get_test_files()
+    for test_file in test_files:
+        print(f"Testing {test_file}")
+
+        try:
+            ast = bash_to_ast(test_file, with_linno_info=True)
+        except RuntimeError as e:
+            try:
+                list(iter_bash_to_ast(test_file, with_linno_info=True))
+                assert False
+            except RuntimeError as e2:
+                assert str(e2) == str(e)
+            continue
+
+        assert list(iter_bash_to_ast(test_file, with_linno_info=True)) == ast
+        source = read_from_file(test_file)
+        assert list(iter_bash_to_ast(source, with_linno_info=True)) == ast
+
+    commands = iter_bash_to_ast(b"echo 0\necho 1\n")
+    assert next(commands) == bash_to_ast_from_bytes(b"echo 0\n")[0]
+    try:
+        bash_to_ast_from_bytes(b"echo 2\n")
+        assert False
+    except RuntimeError:
+        pass
+    commands.close()
+    assert len(bash_to_ast_from_bytes(b"echo 2\n")) == 1
+
+    print(f"Iterative parsing tests passed on {len(test_files)} scripts!")
+
+
 def run_tests():
     """
     Runs all the tests in this file
@@ -183,6 +913,23 @@ def run_tests():
     print("Running tests...")
     try:
         test_bash_and_ast_consistency()
+        test_bash_to_ast_from_bytes()
+        test_consecutive_files()
+        test_source_as_memoryview()
+        test_span_index()
+        test_ast_bytes()
+        test_word_table()
+        test_parse_many()
+        test_parse_cache()
+        test_memory_cache()
+        test_ast_hashing()
+        test_deep_commands()
+        test_flatten_connections()
+        test_json_stream()
+        test_json_to_ast()
+        test_lazy_ast()
+        test_parse_session()
+        test_iter_bash_to_ast()
     except AssertionError:
         print("Test failed!")
         sys.exit(1)